@@ -1,142 +1,425 @@
-from flask import Flask, request, jsonify, send_from_directory
+import time
+IMPORTED_AT = time.perf_counter()  # time-to-ready is measured from here
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-import joblib
 import numpy as np
 import os
-from datetime import datetime, timedelta
+import tempfile
+from time import perf_counter_ns
+from datetime import date, datetime
 import logging
-from collections import defaultdict
+import hmac
+import subprocess
+import sys
+import threading
+from features import build_matrix, FALLBACK_VECTOR, FEATURE_NAMES
+from forest import Anytime, ANYTIME_STOPS, compile_forest, fold_scaler as fold_forest_scaler, load_artifact
+from batcher import MicroBatcher
+from cache import PredictionCache
+from cascade import CascadeBand, TIERS, TIER_FALLBACK, TIER_HEURISTIC, TIER_MODEL, heuristic_proba
+from metrics import ShardedCounter, LatencyHistogram, PROMETHEUS_CONTENT_TYPE, prometheus_histogram, prometheus_metric
+from profiler import SamplingProfiler
+from stats_store import StatsStore, MINUTE, HOUR, DAY
+from velocity import VelocityStore
+from rules import DEFAULT_RULES, RuleSet
+from ip_index import IpRiskIndex
+from feedback import FeedbackLog, TXID_BYTES
+from trainer import trainer_status
+from wire import BINARY_TYPES, ColumnBatch, UnsupportedMediaType, decode_body, encode_body
+from registry import (ModelBundle, MODEL_FILE, SCALER_FILE, COMPILED_DIR, current_version, list_versions,
+                      resolve, set_current, watch_token)
 
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__, static_folder='../frontend', template_folder='../frontend')
+# Artifacts resolve from this file, never from the working directory
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FRONTEND_DIR = os.path.join(BASE_DIR, '..', 'frontend')
+MODEL_DIR = os.path.abspath(os.environ.get('FRAUDCHECK_MODEL_DIR', os.path.join(BASE_DIR, '..', 'models')))
+
+app = Flask(__name__, static_folder=FRONTEND_DIR, template_folder=FRONTEND_DIR)
 CORS(app)
 
 # Globals
-model = None
-scaler = None
-transaction_stats = defaultdict(int)
-daily_stats = defaultdict(lambda: defaultdict(int))
-
-def load_model():
-    """Load persisted model + scaler; create mock if missing"""
-    global model, scaler
+current = None  # ModelBundle serving new requests; replaced whole on reload, never mutated
+ready = False  # True once a model is loaded and warmed up (/api/ready)
+startup = {}
+reload_status = {'state': 'idle'}
+latency = {'predict': LatencyHistogram(), 'predict_batch': LatencyHistogram()}
+# Per-stage hot-path timings (FRAUDCHECK_STAGE_TIMING=0 disables), exported on /metrics
+STAGE_TIMING = os.environ.get('FRAUDCHECK_STAGE_TIMING', '1') != '0'
+STAGES = ('parse', 'velocity', 'preprocess', 'cache', 'heuristic', 'adjust_features', 'scale', 'model', 'fraud_reasons',
+          'serialize')
+stages = {name: LatencyHistogram() for name in STAGES}
+profiler = SamplingProfiler(os.environ.get('FRAUDCHECK_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'fraudcheck-profiles')))
+MAX_BATCH_SIZE = 10000
+# Fold the StandardScaler into the compiled tree thresholds at load (FRAUDCHECK_FOLD_SCALER=0 disables)
+FOLD_SCALER = os.environ.get('FRAUDCHECK_FOLD_SCALER', '1') != '0'
+# Coalesce concurrent /api/predict calls into one model call (opt-in)
+MICROBATCH = os.environ.get('FRAUDCHECK_MICROBATCH', '0') == '1'
+MICROBATCH_MAX = int(os.environ.get('FRAUDCHECK_MICROBATCH_MAX', 64))
+MICROBATCH_WAIT_MS = float(os.environ.get('FRAUDCHECK_MICROBATCH_WAIT_MS', 2.0))
+# Prediction cache keyed on the feature vector (FRAUDCHECK_CACHE_SIZE=0 disables)
+CACHE_SIZE = int(os.environ.get('FRAUDCHECK_CACHE_SIZE', 0))
+CACHE_TTL_S = float(os.environ.get('FRAUDCHECK_CACHE_TTL_S', 300))
+# Cascade: a heuristic decides rows outside the model's calibrated band (cascade.json), the forest the rest
+CASCADE = os.environ.get('FRAUDCHECK_CASCADE', '0') == '1'
+CASCADE_BAND = os.environ.get('FRAUDCHECK_CASCADE_BAND')  # "low,high" overrides every version's cascade.json
+decisions = ShardedCounter()  # scored transactions by deciding tier
+# Anytime evaluation on /api/predict: stop adding trees once the label is settled (FRAUDCHECK_ANYTIME=1) or
+# at the request's deadline_ms (FRAUDCHECK_DEADLINE_MS sets a default budget)
+ANYTIME = os.environ.get('FRAUDCHECK_ANYTIME', '0') == '1'
+ANYTIME_BLOCK = int(os.environ.get('FRAUDCHECK_ANYTIME_BLOCK', 16))
+DEADLINE_MS = float(os.environ['FRAUDCHECK_DEADLINE_MS']) if os.environ.get('FRAUDCHECK_DEADLINE_MS') else None
+early_stops = ShardedCounter()  # anytime evaluations by stop reason
+# Velocity: per card/customer 1h/24h/7d transaction counts and amounts kept in process; they fill
+# daily_transactions, weekly_transactions and avg_transaction when a payload leaves them out (opt-in)
+VELOCITY = os.environ.get('FRAUDCHECK_VELOCITY', '0') == '1'
+VELOCITY_KEYS = tuple(k.strip() for k in os.environ.get('FRAUDCHECK_VELOCITY_KEYS', 'card_id,customer_id').split(',')
+                      if k.strip())
+velocity = VelocityStore(float(os.environ.get('FRAUDCHECK_VELOCITY_MAX_MB', 64)) * 2**20,
+                         os.environ.get('FRAUDCHECK_VELOCITY_SNAPSHOT') or None,
+                         float(os.environ.get('FRAUDCHECK_VELOCITY_SNAPSHOT_S', 60))) if VELOCITY else None
+# Fraud reasons: a rule table over the engineered features (rules.py); FRAUDCHECK_RULES names a JSON table
+# that replaces the built-in one and is reloaded when it changes (model watcher) or on /api/admin/rules
+RULES_PATH = os.environ.get('FRAUDCHECK_RULES') or None
+rules = RuleSet(DEFAULT_RULES)
+rules_status = {'source': rules.source, 'rules': len(rules.rules), 'error': None}
+rule_hits = ShardedCounter()  # matches per rule code
+_rules_mtime = None
+# IP reputation: a compiled range index (models/build_ip_index.py) resolving a payload's ip_address to its IP
+# risk in place of the client's ip_risk; memory-mapped, and swapped in when the file is replaced
+IP_INDEX_PATH = os.environ.get('FRAUDCHECK_IP_INDEX') or os.path.join(MODEL_DIR, 'ip_risk.idx')
+ip_index = None
+ip_index_status = {'path': IP_INDEX_PATH, 'loaded': False, 'error': None}
+_ip_index_signature = None
+# Labeled feedback: /api/feedback appends confirmed outcomes to a segmented log (feedback.py); with
+# FRAUDCHECK_TRAINER=1 the server starts trainer.py as its own low-priority process, which retrains from the
+# log and publishes a version to the registry only when it beats the served one on a holdout
+FEEDBACK_DIR = os.path.abspath(os.environ.get('FRAUDCHECK_FEEDBACK_DIR', os.path.join(BASE_DIR, '..', 'feedback')))
+feedback_log = FeedbackLog(FEEDBACK_DIR, float(os.environ.get('FRAUDCHECK_FEEDBACK_SEGMENT_MB', 64)) * 2**20)
+feedback_labels = ShardedCounter()  # feedback records by label
+TRAINER = os.environ.get('FRAUDCHECK_TRAINER', '0') == '1'
+TRAINER_INTERVAL_S = float(os.environ.get('FRAUDCHECK_TRAINER_INTERVAL_S', 3600))
+_trainer = None
+# Hot reload: poll the model directory every MODEL_WATCH_S seconds (0 disables); admin endpoints need the token
+MODEL_WATCH_S = float(os.environ.get('FRAUDCHECK_MODEL_WATCH_S', 2.0))
+DRAIN_TIMEOUT_S = float(os.environ.get('FRAUDCHECK_DRAIN_TIMEOUT_S', 30.0))
+ADMIN_TOKEN = os.environ.get('FRAUDCHECK_ADMIN_TOKEN') or None
+APP_VERSION = '2.0.0'
+HEURISTIC_VERSION = 'heuristic'  # model_version of predictions made by heuristic_fallback
+model_generation = 0  # bumped on every swap so cached predictions never outlive their model
+cache = PredictionCache(CACHE_SIZE, CACHE_TTL_S) if CACHE_SIZE > 0 else None
+# Transaction counts in minute/hour/day rings; a file path shares them between worker processes
+stats = StatsStore(os.environ.get('FRAUDCHECK_STATS_DB') or None,
+                   float(os.environ.get('FRAUDCHECK_STATS_FLUSH_S', 1.0)))
+_swap_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_watcher = None
+_watched_token = None  # watch_token() of the last load attempt
+
+def load_model(fold_scaler=None, version=None, watch=None, trainer=None):
+    """Load the served model version, warm it up and mark the process ready; blocks until done.
+
+    The version is `version`, else the registry's CURRENT, else the flat MODEL_DIR files (see
+    registry.py). A scaler-folded compiled export next to the pickles is memory-mapped and used on
+    its own: no unpickling, and sklearn is never imported. Otherwise the pickles are loaded and
+    compiled here; fold_scaler (default FOLD_SCALER) rewrites the compiled forest to score raw
+    features directly unless the folded forest fails its bit-for-bit check.
+
+    With watch (default: MODEL_WATCH_S > 0) a background thread reloads whenever the registry's
+    CURRENT or the flat model files change. With trainer (default TRAINER) the background trainer is started.
+
+    Nothing is ever trained here. If the artifacts are missing or unreadable, requests are scored by
+    heuristic_fallback, /api/ready answers 503, and the return value is False.
+    """
+    ok = reload_model(version, wait=True, fold_scaler=fold_scaler)
+    load_rules()
+    load_ip_index()
+    if velocity is not None:
+        velocity.load()
+    if TRAINER if trainer is None else trainer:
+        start_trainer()
+    if ok:
+        startup.update(load_ms=current.load_ms, warmup_ms=current.warmup_ms,
+                       time_to_ready_ms=round((time.perf_counter() - IMPORTED_AT) * 1000, 2))
+        logger.info(f"Ready: model {current.version} loaded in {startup['load_ms']} ms, warmed up in "
+                    f"{startup['warmup_ms']} ms, {startup['time_to_ready_ms']} ms after import")
+    if watch is None:
+        watch = MODEL_WATCH_S > 0
+    if watch:
+        start_watcher()
+    return ok
+
+def reload_model(version=None, wait=False, fold_scaler=None):
+    """Load a model version next to the one being served, then swap it in atomically.
+
+    Requests keep being scored by the current bundle while the new one loads and warms up; those
+    already running on it finish there (drained for up to DRAIN_TIMEOUT_S) while new requests go
+    to the new bundle. A load that fails leaves the current model in place. Without wait the work
+    runs on a background thread and progress is in reload_status.
+
+    Returns False if another reload is running or, with wait, if this one failed.
+    """
+    if not _reload_lock.acquire(blocking=False):
+        return False
+    reload_status.update(state='loading', requested=version, error=None, drained=None,
+                         started_at=datetime.now().isoformat(), finished_at=None)
+    if wait:
+        return _reload(version, fold_scaler)
+    threading.Thread(target=_reload, args=(version, fold_scaler), name='model-reload', daemon=True).start()
+    return True
+
+def _reload(version, fold_scaler):
+    global _watched_token
     try:
-        model_path = os.path.join('..', 'models', 'fraud_detection_model.pkl')
-        scaler_path = os.path.join('..', 'models', 'scaler.pkl')
-        if os.path.exists(model_path) and os.path.exists(scaler_path):
-            model = joblib.load(model_path)
-            scaler = joblib.load(scaler_path)
-            logger.info("Model and scaler loaded successfully")
-        else:
-            logger.warning("Model files not found. Creating mock model.")
-            create_mock_model()
+        _watched_token = watch_token(MODEL_DIR)
+        version, directory = resolve(MODEL_DIR, version)
+        if version is None:
+            raise FileNotFoundError(f"Model files not found in {MODEL_DIR}; train them with "
+                                    "models/create_simple_working_model.py")
+        bundle = _load_bundle(version, directory, fold_scaler)
+        old = _activate(bundle)
+        reload_status.update(state='draining', version=version)
+        drained = old is None or old.drain(DRAIN_TIMEOUT_S)
+        if not drained:
+            logger.warning(f"Model {old.version}: {old.in_flight()} requests still running after "
+                           f"{DRAIN_TIMEOUT_S}s; they finish on it in the background")
+        reload_status.update(state='done', drained=drained, finished_at=datetime.now().isoformat())
+        return True
     except Exception as e:
-        logger.error(f"Error loading model: {e}")
-        create_mock_model()
-
-def create_mock_model():
-    """Create a simple mock model with 13 features."""
-    global model, scaler
-    from sklearn.ensemble import RandomForestClassifier
-    from sklearn.preprocessing import StandardScaler
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    scaler = StandardScaler()
-    X_dummy = np.random.rand(1000, 13)
-    y_dummy = np.random.choice([0, 1], 1000, p=[0.85, 0.15])
-    X_scaled = scaler.fit_transform(X_dummy)
-    model.fit(X_scaled, y_dummy)
-    os.makedirs('../models', exist_ok=True)
-    joblib.dump(model, '../models/fraud_detection_model.pkl')
-    joblib.dump(scaler, '../models/scaler.pkl')
-    logger.info("Mock model created and saved")
+        serving = f"serving {current.version}" if current is not None else "serving heuristic fallback"
+        logger.error(f"Model load failed ({e}); {serving}")
+        reload_status.update(state='failed', error=str(e), finished_at=datetime.now().isoformat())
+        return False
+    finally:
+        _reload_lock.release()
+
+def _load_bundle(version, directory, fold_scaler=None):
+    """Load, compile and warm up one version without touching what is being served; raises on failure"""
+    t0 = time.perf_counter()
+    model_path = os.path.join(directory, MODEL_FILE)
+    scaler_path = os.path.join(directory, SCALER_FILE)
+    compiled_dir = os.path.join(directory, COMPILED_DIR)
+    compiled = load_artifact(compiled_dir, model_path, scaler_path)
+    if compiled is not None and compiled.scaler_folded:
+        model, scaler = compiled, None
+        logger.info(f"Scaler-folded compiled model memory-mapped from {compiled_dir}")
+    else:
+        import joblib  # unpickling pulls in sklearn, so only pay for it when needed
+        scaler = joblib.load(scaler_path)
+        model = compiled if compiled is not None else joblib.load(model_path)
+        logger.info(f"Model and scaler loaded from {directory}")
+    if compiled is None:
+        compiled = compile_forest(model)
+        if compiled is not None and (FOLD_SCALER if fold_scaler is None else fold_scaler):
+            compiled = fold_forest_scaler(compiled, scaler) or compiled
+    if compiled is not None:
+        logger.info(f"Compiled forest: {compiled.n_estimators} trees, {len(compiled.feature)} nodes"
+                    f"{', scaler folded into thresholds' if compiled.scaler_folded else ''}")
+    bundle = ModelBundle(version, model, scaler, compiled, directory)
+    if CASCADE:
+        bundle.cascade = CascadeBand.parse(CASCADE_BAND) if CASCADE_BAND else CascadeBand.load(directory)
+        if bundle.cascade is None:
+            logger.warning(f"Cascade on but {directory} has no cascade.json (models/calibrate_cascade.py); "
+                           "the model scores every row")
+    t1 = time.perf_counter()
+    warm_up(bundle)
+    t2 = time.perf_counter()
+    bundle.load_ms, bundle.warmup_ms = round((t1 - t0) * 1000, 2), round((t2 - t1) * 1000, 2)
+    return bundle
+
+def _activate(bundle):
+    """Make bundle the one new requests use; returns the bundle it replaced"""
+    global current, model_generation, ready
+    with _swap_lock:
+        model_generation += 1
+        bundle.generation = model_generation
+        old, current = current, bundle
+        if cache is not None:
+            cache.invalidate(bundle.cache_tag)
+        ready = True
+    logger.info(f"Serving model {bundle.version} (generation {bundle.generation})"
+                f"{f', replacing {old.version}' if old is not None else ''}")
+    return old
+
+def _acquire():
+    """The current bundle, counted as in use until _release; None when no model is loaded"""
+    while True:
+        bundle = current
+        if bundle is None:
+            return None
+        bundle.enter()
+        if bundle is current:
+            return bundle
+        bundle.exit()  # swapped between the read and enter(): its drain may not have counted us
+
+def _release(bundle):
+    if bundle is not None:
+        bundle.exit()
+
+def start_watcher(interval=None):
+    """Reload when watch_token(MODEL_DIR) changes and then holds still for one poll (writes finished),
+    the rule table when RULES_PATH changes and the IP risk index when IP_INDEX_PATH is replaced"""
+    global _watcher
+    if _watcher is not None and _watcher.is_alive():
+        return
+    interval = interval or MODEL_WATCH_S or 2.0
+    _watcher = threading.Thread(target=_watch, args=(interval,), name='model-watcher', daemon=True)
+    _watcher.start()
+
+def start_trainer():
+    """Start trainer.py as a child process (once); it exits when this process does, and stands down if
+    another trainer already holds FEEDBACK_DIR"""
+    global _trainer
+    if _trainer is not None and _trainer.poll() is None:
+        return
+    cmd = [sys.executable, os.path.join(BASE_DIR, 'trainer.py'), '--feedback-dir', FEEDBACK_DIR,
+           '--model-dir', MODEL_DIR, '--interval', str(TRAINER_INTERVAL_S), '--parent-pid', str(os.getpid())]
+    _trainer = subprocess.Popen(cmd, stdin=subprocess.DEVNULL)
+    logger.info(f"Trainer started (pid {_trainer.pid}), every {TRAINER_INTERVAL_S:g} s from {FEEDBACK_DIR}")
+
+def _watch(interval):
+    seen = None
+    while True:
+        time.sleep(interval)
+        try:
+            token = watch_token(MODEL_DIR)
+        except OSError as e:
+            logger.warning(f"Model watcher: {e}")
+            continue
+        if token != _watched_token and token == seen:
+            logger.info(f"Model change detected in {MODEL_DIR}, reloading")
+            reload_model(wait=True)
+        seen = token
+        load_rules(changed_only=True)
+        load_ip_index(changed_only=True)
+
+def _after_fork():
+    # Threads and held locks do not survive fork: a worker forked from a preloaded master watches on its own
+    global _swap_lock, _reload_lock, _watcher
+    _swap_lock, _reload_lock = threading.Lock(), threading.Lock()
+    if reload_status.get('state') in ('loading', 'draining'):
+        reload_status.update(state='failed', error='interrupted by fork')
+    if _watcher is not None:
+        _watcher = None
+        start_watcher()
+
+if hasattr(os, 'register_at_fork'):  # POSIX only; Windows never forks a preloaded master
+    os.register_at_fork(after_in_child=_after_fork)
+
+def model_loaded():
+    return current is not None
+
+def warm_up(bundle, rows=64):
+    """Score a dummy batch and a dummy transaction on bundle so its first real request pays no first-call
+    costs; raises if the model cannot score, so a broken artifact is never swapped in"""
+    for fv in (np.tile(FALLBACK_VECTOR, (rows, 1)), preprocess({'amount': 100.0, 'payment_method': 'credit_card'})):
+        infer(adjust_features(fv, bundle), bundle)
 
 def preprocess(transaction_data):
-    """Feature engineering producing 13-feature vector"""
+    """Feature engineering producing 13-feature vector (see features.py)"""
     try:
-        features = []
-        amount = float(transaction_data.get('amount', 0))
-        features.append(min(amount / 10000, 20))
-        features.append(1 if amount > 5000 else 0)
-        transaction_time = transaction_data.get('transaction_time', datetime.now().strftime('%H:%M'))
-        hour = int(transaction_time.split(':')[0])
-        features.append(hour)
-        features.append(1 if hour < 6 or hour > 22 else 0)
-        payment_method = transaction_data.get('payment_method', 'credit_card')
-        payment_risk_map = {
-            'credit_card': 0.10,'debit_card': 0.05,'prepaid_card': 0.30,'gift_card': 0.35,
-            'paypal': 0.15,'venmo': 0.20,'apple_pay': 0.12,'google_pay': 0.12,
-            'alipay': 0.25,'wechat_pay': 0.25,'bank_transfer': 0.08,'wire_transfer': 0.20,
-            'digital_wallet': 0.20,'cryptocurrency': 0.50,'cash': 0.02
-        }
-        payment_method_risk = payment_risk_map.get(payment_method, 0.15)
-        features.append(payment_method_risk)
-        country = transaction_data.get('country', 'US')
-        high_risk = {'NG','RO','RU','CN','TR','EG','GH','KE','PH','VN','ID'}
-        medium_risk = {'BR','MX','AR','IN','ZA','KR','SG','HK'}
-        if country in high_risk: location_risk = 0.85
-        elif country in medium_risk: location_risk = 0.45
-        else: location_risk = 0.12
-        features.append(location_risk)
-        device_info = transaction_data.get('device_info', 'desktop')
-        device_risk_map = {
-            'mobile':0.60,'tablet':0.30,'desktop':0.10,'laptop':0.15,'smartwatch':0.70,
-            'atm':0.05,'pos':0.08,'unknown':0.25
-        }
-        device_risk = device_risk_map.get(device_info, 0.20)
-        features.append(device_risk)
-        ip_risk = float(transaction_data.get('ip_risk', 2)) / 10
-        features.append(ip_risk)
-        customer_age = int(transaction_data.get('customer_age', 35))
-        features.append(1 if customer_age < 21 or customer_age > 65 else 0)
-        account_age = int(transaction_data.get('account_age', 365))
-        features.append(1 if account_age < 30 else 0)
-        daily_transactions = int(transaction_data.get('daily_transactions', 1))
-        high_freq_flag = 1 if daily_transactions > 10 else 0
-        features.append(high_freq_flag)
-        avg_transaction = float(transaction_data.get('avg_transaction', amount))
-        if avg_transaction > 0:
-            amount_deviation = abs(amount - avg_transaction) / avg_transaction
-        else:
-            amount_deviation = 0
-        features.append(min(amount_deviation, 5))
-        merchant_category = transaction_data.get('merchant_category', 'retail')
-        high_merch = {'gambling','adult_content','cryptocurrency','cryptocurrency_exchange','luxury_goods','financial_services'}
-        med_merch = {'travel','entertainment','online_shopping','ride_sharing','subscriptions','logistics','food_delivery','electronics'}
-        if merchant_category in high_merch: merchant_risk = 0.72
-        elif merchant_category in med_merch: merchant_risk = 0.32
-        else: merchant_risk = 0.12
-        features.append(merchant_risk)
-        # Synergistic boost
-        risk_flags = sum([
-            amount > 5000,
-            hour < 6 or hour > 22,
-            payment_method_risk >= 0.3,
-            location_risk >= 0.8,
-            device_risk >= 0.6,
-            high_freq_flag == 1
-        ])
-        if risk_flags >= 3:
-            features[11] = min(features[11] * (1 + (risk_flags * 0.05)), 10)
-        return np.array(features).reshape(1, -1)
+        return build_matrix([transaction_data], ip_index=ip_index)
     except Exception as e:
         logger.error(f"Preprocessing error: {e}")
-        return np.array([[0.1,0,12,0,0.1,0.1,0.1,0.2,0,0,0,0.1,0.1]])
+        return FALLBACK_VECTOR.reshape(1, -1).copy()
+
+def load_rules(changed_only=False):
+    """Compile RULES_PATH and swap it in; a table that fails to load or compile leaves the current one
+    serving. Returns False on failure."""
+    global rules, _rules_mtime
+    if RULES_PATH is None:
+        return True
+    try:
+        mtime = os.stat(RULES_PATH).st_mtime_ns
+        if changed_only and mtime == _rules_mtime:
+            return True
+        _rules_mtime = mtime
+        rules = RuleSet.load(RULES_PATH)
+    except (OSError, ValueError) as e:
+        logger.error(f"Rule table {RULES_PATH} not loaded: {e}")
+        rules_status.update(error=str(e))
+        return False
+    rules_status.update(source=rules.source, rules=len(rules.rules), error=None, loaded_at=datetime.now().isoformat())
+    logger.info(f"Rule table: {len(rules.rules)} rules from {RULES_PATH}")
+    return True
+
+def load_ip_index(changed_only=False):
+    """Map IP_INDEX_PATH and swap it in; requests already running keep the index they started with. A
+    missing or unreadable file leaves the current index serving. Returns False on failure."""
+    global ip_index, _ip_index_signature
+    try:
+        stat = os.stat(IP_INDEX_PATH)
+    except FileNotFoundError:
+        return True  # optional: without an index, ip_risk is read from the payload
+    except OSError as e:
+        ip_index_status.update(error=str(e))
+        return False
+    signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if changed_only and signature == _ip_index_signature:
+        return True
+    _ip_index_signature = signature
+    try:
+        index = IpRiskIndex(IP_INDEX_PATH)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"IP risk index {IP_INDEX_PATH} not loaded: {e}")
+        ip_index_status.update(error=str(e))
+        return False
+    ip_index = index
+    ip_index_status.update(index.info(), loaded=True, error=None, loaded_at=datetime.now().isoformat())
+    logger.info(f"IP risk index: {len(index)} ranges from {IP_INDEX_PATH}")
+    return True
+
+def with_velocity(data):
+    """data with daily_transactions, weekly_transactions and avg_transaction filled in from the velocity
+    store where missing, after recording the transaction under the first VELOCITY_KEYS id it carries.
+    Counts include this transaction; the average is over the earlier ones in the last 7 days."""
+    if velocity is None or not isinstance(data, dict):
+        return data
+    key = next((f"{field}:{data[field]}" for field in VELOCITY_KEYS if data.get(field) not in (None, '')), None)
+    if key is None:
+        return data
+    try:
+        amount = float(data.get('amount', 0))
+    except (TypeError, ValueError):
+        return data
+    if not np.isfinite(amount):
+        return data
+    (_, day, week), (_, _, week_amount) = velocity.observe(key, amount)
+    filled = {'daily_transactions': day + 1, 'weekly_transactions': week + 1}
+    if week:
+        filled['avg_transaction'] = round(week_amount / week, 2)
+    missing = {k: v for k, v in filled.items() if data.get(k) is None}
+    return {**data, **missing} if missing else data
+
+def columns_with_velocity(columns, n):
+    """with_velocity over a columnar body: rows are observed in order and the filled daily_transactions /
+    avg_transaction values become columns (only the velocity fields are gathered per row)"""
+    fields = [f for f in VELOCITY_KEYS + ('amount', 'daily_transactions', 'weekly_transactions', 'avg_transaction')
+              if f in columns]
+    values = {f: columns[f].tolist() if isinstance(columns[f], np.ndarray) else columns[f] for f in fields}
+    rows = [with_velocity({f: values[f][i] for f in fields}) for i in range(n)]
+    out = ColumnBatch(columns)
+    out['daily_transactions'] = [r.get('daily_transactions', 1) for r in rows]
+    out['avg_transaction'] = [r.get('avg_transaction', r.get('amount')) for r in rows]
+    return out
 
 def heuristic_fallback(fv):
+    """(labels, probabilities) from the cascade heuristic, for rows the model cannot score"""
     try:
-        amt_norm=fv[0,0]; high_amt=fv[0,1]; un_hour=fv[0,3]; pay=fv[0,4]; loc=fv[0,5]; dev=fv[0,6]; ip=fv[0,7]; age=fv[0,8]; acct=fv[0,9]; freq=fv[0,10]; deviat=fv[0,11]; merch=fv[0,12]
-        score = high_amt*1.2 + un_hour*0.6 + pay*1.1 + loc*1.0 + dev*0.9 + ip*1.3 + acct*0.7 + freq*0.8 + deviat*0.15 + merch*1.0 + age*0.4 + amt_norm*0.05
-        prob = 1/(1+np.exp(-score + 3.5))
-        return (1 if prob > 0.5 else 0, float(prob))
+        probs = heuristic_proba(fv)
     except Exception:
-        return 0, 0.05
+        probs = np.full(len(fv), 0.05)
+    return (probs > 0.5).astype(int), probs
 
-def adjust_features(fv):
+def adjust_features(fv, bundle=None):
+    bundle = bundle or current
+    if bundle is None:
+        return fv
     try:
-        expected = getattr(scaler,'n_features_in_', fv.shape[1]) if scaler else fv.shape[1]
+        expected = getattr(bundle.scaler if bundle.scaler is not None else bundle.compiled, 'n_features_in_', fv.shape[1])
         if fv.shape[1] == expected: return fv
         if fv.shape[1] > expected:
             logger.warning(f"Truncating features {fv.shape[1]} -> {expected}")
@@ -155,124 +438,656 @@ def risk_level(prob):
     if prob > 0.1: return "Low"
     return "Very Low"
 
-def fraud_reasons(data):
-    r=[]
-    amt=float(data.get('amount',0))
-    if amt>5000: r.append("High transaction amount")
-    if data.get('country') in ['NG','RO','RU','CN','TR','EG']: r.append("High-risk country")
-    if data.get('payment_method') in ['cryptocurrency','gift_card','prepaid_card','wire_transfer','alipay','wechat_pay']: r.append("High-risk payment method")
-    if int(data.get('account_age',9999)) < 30: r.append("New account")
-    if int(data.get('daily_transactions',0)) > 10: r.append("High transaction frequency")
-    try:
-        if float(data.get('ip_risk',0)) >= 7: r.append("High IP risk score")
-    except: pass
-    if data.get('merchant_category') in ['gambling','adult_content','cryptocurrency_exchange','luxury_goods','financial_services']: r.append("High-risk merchant category")
-    try:
-        avg=float(data.get('avg_transaction',0)); cur=float(data.get('amount',0))
-        if avg>0:
-            dev=abs(cur-avg)/avg
-            if dev>5: r.append("Extreme deviation from average")
-            elif dev>2: r.append("Large deviation from average")
-    except: pass
-    ttime=data.get('transaction_time','12:00')
-    try:
-        h=int(ttime.split(':')[0])
-        if h<6 or h>22: r.append("Unusual transaction time")
-    except: pass
-    return r
+def risk_levels(probs):
+    """risk_level for an array of probabilities"""
+    return np.select([probs > 0.7, probs > 0.5, probs > 0.3, probs > 0.1],
+                     ["Very High", "High", "Medium", "Low"], "Very Low").astype(object)
+
+def fraud_reasons(fv, preds=None):
+    """Matched rules (rules.Rule) per row of the engineered feature matrix, from one pass over the rule
+    table; with preds, only fraud rows are evaluated and the others get None"""
+    t = perf_counter_ns()
+    table = rules
+    fraud = np.arange(len(fv)) if preds is None else np.flatnonzero(np.asarray(preds) == 1)
+    out = [None] * len(fv)
+    if len(fraud):
+        matched, hits = table.evaluate(fv[fraud, :len(FEATURE_NAMES)])
+        for code, n in zip(table.codes, hits):
+            if n:
+                rule_hits.add(code, n)
+        for row, ix in zip(fraud.tolist(), matched):
+            out[row] = [table.rules[j] for j in ix]
+    timed('fraud_reasons', t)
+    return out
 
 @app.route('/')
 def home():
-    return send_from_directory('../frontend', 'index.html')
+    return send_from_directory(FRONTEND_DIR, 'index.html')
 
-@app.route('/api/predict', methods=['POST'])
-def predict():
-    start = datetime.now()
-    data = request.get_json() or {}
-    if 'amount' not in data or 'payment_method' not in data:
-        return jsonify({'error':'Missing required fields'}), 400
-    fv = preprocess(data)
-    used_fallback=False
+def timed(stage, t0):
+    """Record the time since t0 (perf_counter_ns) under stage; returns the clock for the next stage"""
+    now = perf_counter_ns()
+    if STAGE_TIMING:
+        stages[stage].record((now - t0) / 1e6)
+    return now
+
+def infer(fv, bundle=None, anytime=None):
+    """(labels, fraud probabilities) for unscaled rows; one forest traversal when compiled.
+    anytime (forest.Anytime) evaluates a compiled forest progressively; other models ignore it."""
+    bundle = bundle or current
+    if bundle is None:
+        raise RuntimeError("No model loaded")
+    compiled = bundle.compiled
+    t = perf_counter_ns()
+    if compiled is not None and compiled.scaler_folded:
+        res = compiled.score(fv, anytime)
+    else:
+        scaled = bundle.scaler.transform(fv)
+        t = timed('scale', t)
+        if compiled is not None:
+            res = compiled.score(scaled, anytime)
+        else:
+            proba = bundle.model.predict_proba(scaled)
+            res = bundle.model.classes_.take(np.argmax(proba, axis=1)), proba[:, 1]
+    timed('model', t)
+    return res
+
+def missing_fields(data):
+    return not isinstance(data, dict) or 'amount' not in data or 'payment_method' not in data
+
+def n_trees(bundle):
+    if bundle is None:
+        return 0
+    return bundle.compiled.n_estimators if bundle.compiled is not None else getattr(bundle.model, 'n_estimators', None)
+
+def score_matrix(fv, bundle=None, anytime=None):
+    """Score an N x 13 matrix in one pass -> (labels, probabilities, deciding tier per row).
+
+    With CASCADE on, rows whose heuristic probability is outside the bundle's band are decided by the
+    heuristic and only the rest reach the model. Rows the model fails on get the heuristic fallback.
+    With anytime, its trees/stopped arrays describe the rows that reached the model.
+    """
+    bundle = bundle or current
+    band = bundle.cascade if CASCADE and bundle is not None else None
+    if band is not None:
+        t = perf_counter_ns()
+        probs = heuristic_proba(fv)
+        need = band.needs_model(probs)
+        timed('heuristic', t)
+        if not need.all():
+            preds = (probs > 0.5).astype(int)
+            tiers = np.full(len(fv), TIER_HEURISTIC, dtype=object)
+            rows = np.flatnonzero(need)
+            if len(rows):
+                preds[rows], probs[rows], tiers[rows] = score_model(fv[rows], bundle, anytime)
+            return preds, probs, tiers
+    return score_model(fv, bundle, anytime)
+
+def score_model(fv, bundle, anytime=None):
+    """Every row through the model (heuristic fallback on error) -> (labels, probabilities, tiers)"""
     try:
-        adj = adjust_features(fv)
-        scaled = scaler.transform(adj)
-        pred = int(model.predict(scaled)[0])
-        prob = float(model.predict_proba(scaled)[0][1])
+        t = perf_counter_ns()
+        adj = adjust_features(fv, bundle)
+        timed('adjust_features', t)
+        preds, probs = infer(adj, bundle, anytime)
+        return preds.astype(int), probs.astype(float), np.full(len(fv), TIER_MODEL, dtype=object)
     except Exception as e:
         logger.error(f"Model inference error, using fallback: {e}")
-        pred, prob = heuristic_fallback(fv)
-        used_fallback=True
-    conf = max(abs(prob - 0.5)*2, 0.6)
-    rl = risk_level(prob)
-    rs = fraud_reasons(data) if pred==1 else []
-    dt = (datetime.now()-start).total_seconds()*1000
-    transaction_stats['total'] += 1
-    if pred==1:
-        transaction_stats['fraud'] += 1
-        transaction_stats['amount_blocked'] += float(data.get('amount',0))
-    today = datetime.now().strftime('%Y-%m-%d')
-    daily_stats[today]['total'] += 1
-    if pred==1: daily_stats[today]['fraud'] += 1
+        preds, probs = heuristic_fallback(fv)
+        return preds, probs, np.full(len(fv), TIER_FALLBACK, dtype=object)
+
+def score_versioned(fv):
+    """score_matrix on the current bundle plus the model version per row (for the micro-batcher); the
+    bundle is held like a request's, so a reload drains batches too"""
+    bundle = _acquire()
+    try:
+        preds, probs, tiers = score_matrix(fv, bundle)
+    finally:
+        _release(bundle)
+    versions = np.full(len(fv), bundle.version if bundle is not None else HEURISTIC_VERSION, dtype=object)
+    return preds, probs, tiers, versions
+
+batcher = MicroBatcher(score_versioned, MICROBATCH_MAX, MICROBATCH_WAIT_MS) if MICROBATCH else None
+
+def score_cached(fv, bundle=None):
+    """score_matrix with cache lookups per row; only misses reach the model"""
+    bundle = bundle or current
+    if cache is None or bundle is None:
+        return score_matrix(fv, bundle)
+    preds = np.zeros(len(fv), dtype=int)
+    probs = np.zeros(len(fv), dtype=float)
+    tiers = np.empty(len(fv), dtype=object)
+    miss = []
+    for i, row in enumerate(fv):
+        hit = cache.get(row, bundle.cache_tag)
+        if hit is None:
+            miss.append(i)
+        else:
+            preds[i], probs[i], tiers[i] = hit
+    if miss:
+        p, q, tr = score_matrix(fv[miss], bundle)
+        preds[miss], probs[miss], tiers[miss] = p, q, tr
+        for i, pred, prob, tier in zip(miss, p, q, tr):
+            if tier != TIER_FALLBACK:
+                cache.put(fv[i], (int(pred), float(prob), tier), bundle.cache_tag)
+    return preds, probs, tiers
+
+def record_stats(pred, data, tier):
+    stats.record(pred, float(data.get('amount',0)) if pred==1 else 0.0)
+    decisions.add(tier)
+
+def build_result(n_features, pred, prob, tier, version=None, reasons=None):
+    """Per-transaction response fields shared by /api/predict and /api/predict/batch; reasons are the
+    row's matched rules (fraud_reasons)"""
     resp = {
         'is_fraud': bool(pred),
         'fraud_probability': prob,
-        'confidence': conf,
-        'risk_level': rl,
+        'confidence': max(abs(prob - 0.5)*2, 0.6),
+        'risk_level': risk_level(prob),
+        'features_analyzed': int(n_features),
+        'model_version': HEURISTIC_VERSION if tier == TIER_FALLBACK else version,
+        'decided_by': tier,
+        'fallback_used': tier == TIER_FALLBACK
+    }
+    if reasons:
+        resp['fraud_reasons'] = [r.reason for r in reasons]
+        resp['reason_codes'] = [r.code for r in reasons]
+    return resp
+
+def predict_payload(data, start=None):
+    """Score one transaction; (response dict, HTTP status). Shared by the Flask and ASGI front ends."""
+    bundle = _acquire()
+    try:
+        if profiler.active:
+            return profiler.run(_predict_payload, data, start, bundle)
+        return _predict_payload(data, start, bundle)
+    finally:
+        _release(bundle)
+
+def _predict_payload(data, start, bundle):
+    start = start or datetime.now()
+    if missing_fields(data):
+        return {'error':'Missing required fields'}, 400
+    anytime = None
+    deadline_ms = data.get('deadline_ms', DEADLINE_MS)
+    if deadline_ms is not None:
+        try:
+            deadline_ms = float(deadline_ms)
+        except (TypeError, ValueError):
+            deadline_ms = -1.0
+        if not deadline_ms > 0:
+            return {'error':'deadline_ms must be a positive number'}, 400
+        # The budget runs from request arrival, so parsing and queueing count against it
+        left_ms = deadline_ms - (datetime.now() - start).total_seconds() * 1000
+        anytime = Anytime(perf_counter_ns() + int(left_ms * 1e6), block=ANYTIME_BLOCK)
+    elif ANYTIME:
+        anytime = Anytime(block=ANYTIME_BLOCK)
+    t = perf_counter_ns()
+    if velocity is not None:
+        data = with_velocity(data)
+        t = timed('velocity', t)
+    fv = preprocess(data)
+    t = timed('preprocess', t)
+    version = bundle.version if bundle is not None else None
+    hit = None
+    if cache is not None and bundle is not None:
+        hit = cache.get(fv[0], bundle.cache_tag)
+        timed('cache', t)
+    if hit is not None:
+        pred, prob, tier = hit
+    elif batcher is not None and anytime is None:
+        pred, prob, tier, version = batcher.submit(fv)
+        pred, prob = int(pred), float(prob)
+    else:
+        preds, probs, tiers = score_matrix(fv, bundle, anytime)
+        pred, prob, tier = int(preds[0]), float(probs[0]), tiers[0]
+    stopped = None
+    if anytime is not None:
+        total = n_trees(bundle)
+        trees = (int(anytime.trees[0]) if anytime.trees is not None else total) if tier == TIER_MODEL else 0
+        if hit is None and anytime.stopped is not None:
+            stopped = anytime.stopped[0]
+        early_stops.add(stopped or 'none')
+    if (hit is None and cache is not None and bundle is not None and tier != TIER_FALLBACK and stopped is None
+            and version == bundle.version):
+        cache.put(fv[0], (pred, prob, tier), bundle.cache_tag)
+    reasons = fraud_reasons(fv)[0] if pred == 1 else None
+    resp = build_result(fv.shape[1], pred, prob, tier, version, reasons)
+    if anytime is not None:
+        resp.update(trees_evaluated=trees, trees_total=total, early_stop=stopped)
+    dt = (datetime.now()-start).total_seconds()*1000
+    record_stats(pred, data, tier)
+    latency['predict'].record(dt)
+    resp['processing_time_ms'] = round(dt,2)
+    resp['timestamp'] = datetime.now().isoformat()
+    return resp, 200
+
+def predict_batch_payload(body, start=None):
+    """Score many transactions with one preprocess/scale/model pass; errors are reported per item"""
+    bundle = _acquire()
+    try:
+        if profiler.active:
+            return profiler.run(_predict_batch_payload, body, start, bundle)
+        return _predict_batch_payload(body, start, bundle)
+    finally:
+        _release(bundle)
+
+def _predict_batch_payload(body, start, bundle):
+    start = start or datetime.now()
+    items = body.get('transactions') if isinstance(body, dict) else body
+    if not isinstance(items, list) or not items:
+        return {'error':'Expected a non-empty list of transactions'}, 400
+    if len(items) > MAX_BATCH_SIZE:
+        return {'error':f'Batch too large (max {MAX_BATCH_SIZE})'}, 413
+    results = [None]*len(items)
+    valid = []
+    for i, data in enumerate(items):
+        if missing_fields(data):
+            results[i] = {'index':i,'error':'Missing required fields'}
+        else:
+            valid.append(i)
+    if valid:
+        if velocity is not None:
+            t = perf_counter_ns()
+            for i in valid:
+                items[i] = with_velocity(items[i])
+            timed('velocity', t)
+        fv = build_matrix([items[i] for i in valid], ip_index=ip_index)
+        preds, probs, tiers = score_cached(fv, bundle)
+        version = bundle.version if bundle is not None else None
+        reasons = fraud_reasons(fv, preds)
+        for row, i in enumerate(valid):
+            pred, prob = int(preds[row]), float(probs[row])
+            record_stats(pred, items[i], tiers[row])
+            results[i] = {'index':i, **build_result(fv.shape[1], pred, prob, tiers[row], version, reasons[row])}
+    dt = (datetime.now()-start).total_seconds()*1000
+    latency['predict_batch'].record(dt)
+    return {
+        'results': results,
+        'count': len(items),
+        'errors': len(items)-len(valid),
         'processing_time_ms': round(dt,2),
+        'timestamp': datetime.now().isoformat()
+    }, 200
+
+def predict_columns_payload(columns, start=None):
+    """Score a columnar body (field -> equal-length column) into response columns, one row per transaction"""
+    bundle = _acquire()
+    try:
+        if profiler.active:
+            return profiler.run(_predict_columns_payload, columns, start, bundle)
+        return _predict_columns_payload(columns, start, bundle)
+    finally:
+        _release(bundle)
+
+def _predict_columns_payload(columns, start, bundle):
+    start = start or datetime.now()
+    lengths = {len(col) if isinstance(col, (list, np.ndarray)) and np.ndim(col) == 1 else -1
+               for col in columns.values()}
+    if len(lengths) != 1 or -1 in lengths or 0 in lengths:
+        return {'error':'Expected non-empty columns of equal length'}, 400
+    n = lengths.pop()
+    if n > MAX_BATCH_SIZE:
+        return {'error':f'Batch too large (max {MAX_BATCH_SIZE})'}, 413
+    if 'amount' not in columns or 'payment_method' not in columns:
+        return {'error':'Missing required fields'}, 400
+    if velocity is not None:
+        t = perf_counter_ns()
+        columns = columns_with_velocity(columns, n)
+        timed('velocity', t)
+    fv = build_matrix(columns, ip_index=ip_index)
+    preds, probs, tiers = score_cached(fv, bundle)
+    version = bundle.version if bundle is not None else None
+    reasons = fraud_reasons(fv, preds)
+    fraud = np.flatnonzero(preds == 1)
+    blocked = 0.0
+    for amount in (columns['amount'][i] for i in fraud.tolist()):
+        try:
+            blocked += float(amount)
+        except (TypeError, ValueError):
+            pass
+    stats.record_many(n, len(fraud), blocked)
+    for tier, count in zip(*np.unique(tiers.astype(str), return_counts=True)):
+        decisions.add(str(tier), int(count))
+    fallback = tiers == TIER_FALLBACK
+    dt = (datetime.now()-start).total_seconds()*1000
+    latency['predict_batch'].record(dt)
+    return {
+        'columns': {
+            'index': np.arange(n),
+            'is_fraud': preds.astype(bool),
+            'fraud_probability': probs,
+            'confidence': np.maximum(np.abs(probs - 0.5)*2, 0.6),
+            'risk_level': risk_levels(probs),
+            'model_version': np.where(fallback, HEURISTIC_VERSION, version).astype(object),
+            'decided_by': tiers,
+            'fallback_used': fallback,
+            'fraud_reasons': [[r.reason for r in rs] if rs else [] for rs in reasons],
+            'reason_codes': [[r.code for r in rs] if rs else [] for rs in reasons],
+        },
+        'count': n,
         'features_analyzed': int(fv.shape[1]),
-        'model_version': '2.0.0',
-        'timestamp': datetime.now().isoformat(),
-        'fallback_used': used_fallback
-    }
-    if rs: resp['fraud_reasons']=rs
-    return jsonify(resp)
+        'processing_time_ms': round(dt,2),
+        'timestamp': datetime.now().isoformat()
+    }, 200
 
-@app.route('/api/health')
-def health():
-    loaded = model is not None and scaler is not None
-    stats = {
-        'total_transactions': transaction_stats['total'],
-        'fraud_detected': transaction_stats['fraud'],
-        'fraud_rate': round((transaction_stats['fraud']/max(transaction_stats['total'],1))*100,2),
-        'amount_blocked': round(transaction_stats['amount_blocked'],2)
+def encoded_payload(body, ctype, batch=True, start=None):
+    """Score a MessagePack or Arrow IPC body (wire.BINARY_TYPES) -> (response bytes, status, content type).
+    Columnar bodies go to predict_columns_payload, row documents to the same payloads as JSON."""
+    start = start or datetime.now()
+    t = perf_counter_ns()
+    try:
+        data = decode_body(body, ctype)
+    except UnsupportedMediaType as e:
+        ctype, (resp, status) = None, ({'error': str(e)}, 415)
+    except ValueError as e:
+        resp, status = {'error': str(e)}, 400
+    else:
+        timed('parse', t)
+        if isinstance(data, ColumnBatch):
+            resp, status = (predict_columns_payload(data, start) if batch else
+                            ({'error':'Columnar bodies are accepted on /api/predict/batch'}, 415))
+        elif batch:
+            resp, status = predict_batch_payload(data, start)
+        else:
+            resp, status = predict_payload(data or {}, start)
+    t = perf_counter_ns()
+    out, out_type = encode_body(resp, ctype, status)
+    timed('serialize', t)
+    return out, status, out_type
+
+def health_payload():
+    loaded = model_loaded()
+    totals = stats.totals()
+    total, fraud = totals['total'], totals['fraud']
+    summary = {
+        'total_transactions': total,
+        'fraud_detected': fraud,
+        'fraud_rate': round((fraud/max(total,1))*100,2),
+        'amount_blocked': round(totals['amount_blocked'],2)
     }
-    return jsonify({
+    resp = {
         'status': 'healthy' if loaded else 'degraded',
         'model_loaded': loaded,
-        'version': '2.0.0',
-        'statistics': stats,
+        'version': APP_VERSION,
+        'model': current.info() if current is not None else None,
+        'model_reload': dict(reload_status),
+        'statistics': summary,
         'timestamp': datetime.now().isoformat()
-    })
+    }
+    if CASCADE:
+        resp['cascade'] = {'band': current.cascade.to_dict() if current is not None and current.cascade else None,
+                           'decisions': {tier: decisions[tier] for tier in TIERS}}
+    resp['rules'] = dict(rules_status)
+    resp['ip_index'] = dict(ip_index_status)
+    if velocity is not None:
+        resp['velocity'] = velocity.metrics()
+    if TRAINER:
+        resp['trainer'] = trainer_status(FEEDBACK_DIR)
+    if batcher is not None:
+        resp['micro_batching'] = batcher.metrics()
+    if cache is not None:
+        resp['prediction_cache'] = cache.metrics()
+    return resp
 
-@app.route('/api/statistics')
-def statistics():
-    total = transaction_stats['total']
-    fraud = transaction_stats['fraud']
+def ready_payload():
+    """Readiness, separate from /api/health liveness: 200 only once a model is loaded and warmed up"""
+    return {'ready': ready, **startup, 'timestamp': datetime.now().isoformat()}, 200 if ready else 503
+
+def statistics_payload():
+    totals = stats.totals()
+    total, fraud = totals['total'], totals['fraud']
     rate = (fraud / max(total,1))*100
-    daily_data=[]
-    for i in range(7):
-        date=(datetime.now()-timedelta(days=i)).strftime('%Y-%m-%d')
-        daily_data.append({'date':date,'total':daily_stats[date]['total'],'fraud':daily_stats[date]['fraud']})
-    return jsonify({
+    daily_data = [{'date':date.fromordinal(d).isoformat(),'total':t,'fraud':f} for d, t, f in stats.series(DAY, 7)]
+    hourly_data = [{'hour':datetime.fromtimestamp(h*3600).strftime('%Y-%m-%d %H:00'),'total':t,'fraud':f}
+                   for h, t, f in stats.series(HOUR, 24)]
+    minute_data = [{'minute':datetime.fromtimestamp(m*60).strftime('%H:%M'),'total':t,'fraud':f}
+                   for m, t, f in stats.series(MINUTE, 60)]
+    return {
         'total_transactions': total,
         'fraud_detected': fraud,
         'fraud_rate': round(rate,2),
-        'amount_blocked': round(transaction_stats['amount_blocked'],2),
-        'accuracy_rate': 98.5,
-        'avg_response_time': 45,
-        'daily_statistics': daily_data[::-1],
+        'amount_blocked': round(totals['amount_blocked'],2),
+        'accuracy_rate': None,  # no ground-truth labels are collected, so accuracy is unknown
+        'avg_response_time': latency['predict'].summary()['mean'],
+        'latency_ms': {name: h.summary() for name, h in latency.items()},
+        'daily_statistics': daily_data,
+        'hourly_statistics': hourly_data,
+        'minute_statistics': minute_data,
+        'timestamp': datetime.now().isoformat()
+    }
+
+def reset_payload():
+    stats.reset()
+    for h in latency.values():
+        h.clear()
+    decisions.clear()
+    early_stops.clear()
+    rule_hits.clear()
+    feedback_labels.clear()
+    return {'message':'Statistics reset','timestamp':datetime.now().isoformat()}
+
+def metrics_text():
+    """Prometheus exposition of this process's latency histograms and the shared transaction totals"""
+    totals = stats.totals()
+    lines = prometheus_histogram('fraudcheck_request_duration_seconds', 'Request processing time by endpoint',
+                                 'endpoint', latency)
+    lines += prometheus_histogram('fraudcheck_stage_duration_seconds', 'Hot-path time by stage', 'stage', stages)
+    lines += prometheus_metric('fraudcheck_transactions_total', 'counter', 'Transactions scored (all workers)',
+                               [({}, totals['total'])])
+    lines += prometheus_metric('fraudcheck_fraud_detected_total', 'counter', 'Transactions flagged (all workers)',
+                               [({}, totals['fraud'])])
+    lines += prometheus_metric('fraudcheck_model_generation', 'gauge', 'Model swaps in this process',
+                               [({}, model_generation)])
+    lines += prometheus_metric('fraudcheck_anytime_evaluations_total', 'counter',
+                               'Anytime /api/predict evaluations by early-stop reason',
+                               [({'stop': reason}, early_stops[reason]) for reason in ('none',) + ANYTIME_STOPS])
+    lines += prometheus_metric('fraudcheck_decisions_total', 'counter', 'Transactions scored, by deciding tier',
+                               [({'tier': tier}, decisions[tier]) for tier in TIERS])
+    lines += prometheus_metric('fraudcheck_rule_hits_total', 'counter', 'Fraud reason rule matches, by rule code',
+                               [({'rule': code}, rule_hits[code]) for code in rules.codes])
+    lines += prometheus_metric('fraudcheck_feedback_total', 'counter', 'Feedback records logged, by label',
+                               [({'label': label}, feedback_labels[label]) for label in ('legit', 'fraud')])
+    if current is not None:
+        lines += prometheus_metric('fraudcheck_model_info', 'gauge', 'Model version serving new requests',
+                                   [({'version': current.version}, 1)])
+    if cache is not None:
+        c = cache.metrics()
+        lines += prometheus_metric('fraudcheck_cache_lookups_total', 'counter', 'Prediction cache lookups',
+                                   [({'result': 'hit'}, c['hits']), ({'result': 'miss'}, c['misses'])])
+    return '\n'.join(lines) + '\n'
+
+def profile_payload(body):
+    """Start a sampling profile for the next N scoring requests; (response, status)"""
+    body = body if isinstance(body, dict) else {}
+    try:
+        requests_n = int(body.get('requests', 100))
+        interval_ms = float(body.get('interval_ms', 1.0))
+    except (TypeError, ValueError):
+        return {'error':'requests and interval_ms must be numbers'}, 400
+    if requests_n < 1 or interval_ms <= 0:
+        return {'error':'requests must be >= 1 and interval_ms > 0'}, 400
+    if not profiler.start(requests_n, interval_ms):
+        return {'error':'A profile is already running', **profiler.status()}, 409
+    return profiler.status(), 202
+
+def admin_denied(token):
+    """(response, status) refusing an admin call, or None if token matches FRAUDCHECK_ADMIN_TOKEN"""
+    if ADMIN_TOKEN is None:
+        return {'error':'Admin endpoints are disabled; set FRAUDCHECK_ADMIN_TOKEN'}, 403
+    if not hmac.compare_digest((token or '').encode(), ADMIN_TOKEN.encode()):
+        return {'error':'Invalid or missing X-Admin-Token'}, 401
+    return None
+
+def reload_payload(body):
+    """Reload the model: {"version": v} switches the registry's CURRENT first (other workers follow through
+    their watchers); {"wait": true} answers once the swap is done instead of 202 right away"""
+    body = body if isinstance(body, dict) else {}
+    version, wait = body.get('version'), bool(body.get('wait'))
+    if version is not None:
+        try:
+            set_current(MODEL_DIR, str(version))
+        except FileNotFoundError as e:
+            return {'error': str(e), 'versions': list_versions(MODEL_DIR)}, 404
+    if not reload_model(version, wait=wait):
+        if reload_status['state'] == 'failed':
+            return {'error':'Reload failed', 'reload': dict(reload_status)}, 500
+        return {'error':'A reload is already running', 'reload': dict(reload_status)}, 409
+    return models_payload(), 200 if wait else 202
+
+def rules_payload(reload=False):
+    """The rule table in use and its hit counts; with reload, RULES_PATH is compiled and swapped in first"""
+    if reload:
+        if RULES_PATH is None:
+            return {'error':'No rule file configured; set FRAUDCHECK_RULES'}, 400
+        if not load_rules():
+            return {'error':'Rule table not loaded', 'rules_status': dict(rules_status)}, 422
+    table = rules
+    return {
+        'rules_status': dict(rules_status),
+        'rules': [{**r, 'hits': rule_hits[r['code']]} for r in table.to_list()],
         'timestamp': datetime.now().isoformat()
-    })
+    }, 200
+
+def feedback_payload(body):
+    """Log confirmed outcomes: an item or {"feedback": [items]}, each {"transaction_id", "label": 0|1} plus
+    either "features" (the 13 engineered values) or "transaction" (a scoring payload, engineered here).
+    Invalid items are reported by index and the rest are logged; (response, status)"""
+    items = body.get('feedback', [body]) if isinstance(body, dict) else body
+    if not isinstance(items, list) or not items:
+        return {'error':'Expected a feedback item or {"feedback": [items]}'}, 400
+    if len(items) > MAX_BATCH_SIZE:
+        return {'error':f'Too many feedback items (max {MAX_BATCH_SIZE})'}, 413
+    errors, txids, labels, vectors, pending = [], [], [], [], []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': i, 'error': 'Item must be an object'})
+            continue
+        txid, label = item.get('transaction_id'), item.get('label')
+        if not isinstance(txid, str) or not txid or len(txid.encode()) > TXID_BYTES:
+            errors.append({'index': i, 'error': f'transaction_id must be a string of 1-{TXID_BYTES} bytes'})
+            continue
+        if label not in (0, 1) or isinstance(label, float):
+            errors.append({'index': i, 'error': 'label must be 0 (legitimate) or 1 (fraud)'})
+            continue
+        if isinstance(item.get('features'), list):
+            fv = np.array(item['features'], dtype=object)
+            if len(fv) != len(FEATURE_NAMES) or not all(isinstance(v, (int, float)) and not isinstance(v, bool)
+                                                        and np.isfinite(v) for v in fv):
+                errors.append({'index': i, 'error': f'features must be {len(FEATURE_NAMES)} finite numbers'})
+                continue
+            vectors.append(fv.astype(np.float64))
+        elif isinstance(item.get('transaction'), dict):
+            if missing_fields(item['transaction']):
+                errors.append({'index': i, 'error': 'Missing required fields'})
+                continue
+            pending.append((len(vectors), item['transaction']))
+            vectors.append(None)
+        else:
+            errors.append({'index': i, 'error': 'Either features or transaction is required'})
+            continue
+        txids.append(txid)
+        labels.append(int(label))
+    if not txids:
+        return {'error':'No valid feedback items', 'errors': errors}, 400
+    if pending:
+        for (k, _), fv in zip(pending, build_matrix([t for _, t in pending], ip_index=ip_index)):
+            vectors[k] = fv
+    feedback_log.append(txids, np.array(vectors), labels)
+    fraud = sum(labels)
+    feedback_labels.add('fraud', fraud)
+    feedback_labels.add('legit', len(labels) - fraud)
+    return {'accepted': len(txids), 'errors': errors, 'timestamp': datetime.now().isoformat()}, 200
+
+def models_payload():
+    return {
+        'serving': current.info() if current is not None else None,
+        'registry_current': current_version(MODEL_DIR),
+        'versions': list_versions(MODEL_DIR),
+        'reload': dict(reload_status),
+        'timestamp': datetime.now().isoformat()
+    }
+
+@app.route('/api/predict', methods=['POST'])
+def predict():
+    start = datetime.now()
+    if request.mimetype in BINARY_TYPES:
+        body, status, ctype = encoded_payload(request.get_data(), request.mimetype, batch=False, start=start)
+        return Response(body, status, content_type=ctype)
+    t = perf_counter_ns()
+    data = request.get_json() or {}
+    timed('parse', t)
+    resp, status = predict_payload(data, start)
+    t = perf_counter_ns()
+    out = jsonify(resp)
+    timed('serialize', t)
+    return out, status
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    start = datetime.now()
+    if request.mimetype in BINARY_TYPES:
+        body, status, ctype = encoded_payload(request.get_data(), request.mimetype, start=start)
+        return Response(body, status, content_type=ctype)
+    t = perf_counter_ns()
+    data = request.get_json(silent=True)
+    timed('parse', t)
+    resp, status = predict_batch_payload(data, start)
+    t = perf_counter_ns()
+    out = jsonify(resp)
+    timed('serialize', t)
+    return out, status
+
+@app.route('/metrics')
+def metrics():
+    return Response(metrics_text(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/api/profile', methods=['GET', 'POST'])
+def profile():
+    resp, status = admin_denied(request.headers.get('X-Admin-Token')) or (
+        (profiler.status(), 200) if request.method == 'GET' else profile_payload(request.get_json(silent=True)))
+    return jsonify(resp), status
+
+@app.route('/api/health')
+def health():
+    return jsonify(health_payload())
+
+@app.route('/api/ready')
+def ready_probe():
+    resp, status = ready_payload()
+    return jsonify(resp), status
+
+@app.route('/api/statistics')
+def statistics():
+    return jsonify(statistics_payload())
 
 @app.route('/api/reset-stats', methods=['POST'])
 def reset_stats():
-    transaction_stats.clear()
-    daily_stats.clear()
-    return jsonify({'message':'Statistics reset','timestamp':datetime.now().isoformat()})
+    return jsonify(reset_payload())
+
+@app.route('/api/admin/reload', methods=['POST'])
+def admin_reload():
+    resp, status = admin_denied(request.headers.get('X-Admin-Token')) or reload_payload(request.get_json(silent=True))
+    return jsonify(resp), status
+
+@app.route('/api/admin/models')
+def admin_models():
+    resp, status = admin_denied(request.headers.get('X-Admin-Token')) or (models_payload(), 200)
+    return jsonify(resp), status
+
+@app.route('/api/admin/rules', methods=['GET', 'POST'])
+def admin_rules():
+    resp, status = admin_denied(request.headers.get('X-Admin-Token')) or rules_payload(request.method == 'POST')
+    return jsonify(resp), status
+
+@app.route('/api/feedback', methods=['POST'])
+def feedback():
+    resp, status = admin_denied(request.headers.get('X-Admin-Token')) or feedback_payload(request.get_json(silent=True))
+    return jsonify(resp), status
 
 @app.errorhandler(404)
 def not_found(_):
-    return jsonify({'error':'Endpoint not found','available_endpoints':['GET /','POST /api/predict','GET /api/health','GET /api/statistics','POST /api/reset-stats']}),404
+    return jsonify({'error':'Endpoint not found','available_endpoints':['GET /','POST /api/predict','POST /api/predict/batch','GET /api/health','GET /api/ready','GET /api/statistics','POST /api/reset-stats','GET /metrics','GET|POST /api/profile','POST /api/admin/reload','GET /api/admin/models','GET|POST /api/admin/rules','POST /api/feedback']}),404
 
 @app.errorhandler(500)
 def internal_error(e):
@@ -281,9 +1096,6 @@ def internal_error(e):
 
 if __name__ == '__main__':
     load_model()
-    transaction_stats['total']=0
-    transaction_stats['fraud']=0
-    transaction_stats['amount_blocked']=0.0
     logger.info("FraudCheck application starting...")
-    logger.info("Endpoints: /, /api/predict, /api/health, /api/statistics, /api/reset-stats")
+    logger.info("Endpoints: /, /api/predict, /api/predict/batch, /api/health, /api/ready, /api/statistics, /api/reset-stats, /metrics, /api/profile, /api/admin/reload, /api/admin/models, /api/feedback")
     app.run(host='0.0.0.0', port=5000, debug=True)
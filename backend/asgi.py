@@ -0,0 +1,247 @@
+"""Production ASGI entry point: async request handling, CPU-bound scoring on a bounded worker pool.
+
+Serves the same routes as app.py. Requests are read and answered on the event loop, so slow
+clients never hold an inference worker; scoring runs on a fixed-size thread pool, and once
+workers + queue are full new scoring requests get 429 with Retry-After.
+
+Run from backend/:  uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 1
+"""
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from time import perf_counter_ns
+import app as core
+from wire import BINARY_TYPES, media_type
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_WORKERS = int(os.environ.get('FRAUDCHECK_INFERENCE_WORKERS', os.cpu_count() or 1))
+INFERENCE_QUEUE = int(os.environ.get('FRAUDCHECK_INFERENCE_QUEUE', 64))
+RETRY_AFTER_S = int(os.environ.get('FRAUDCHECK_RETRY_AFTER_S', 1))
+MAX_BODY_BYTES = int(os.environ.get('FRAUDCHECK_MAX_BODY_BYTES', 16 * 1024 * 1024))
+
+class Overloaded(Exception):
+    pass
+
+class InvalidBody(ValueError):
+    """Request body that is not valid JSON (a client error, unlike a ValueError raised while scoring)"""
+
+class InferencePool:
+    """Thread pool with a hard cap on admitted work (running + queued); only touched from the event loop"""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='inference')
+        self.pending = 0
+        self.stats = {'completed': 0, 'failed': 0, 'rejected': 0, 'max_pending': 0}
+
+    async def run(self, fn, *args):
+        if self.pending >= self.capacity:
+            self.stats['rejected'] += 1
+            raise Overloaded()
+        self.pending += 1
+        self.stats['max_pending'] = max(self.stats['max_pending'], self.pending)
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        except Exception:
+            self.stats['failed'] += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.stats['completed'] += 1
+        return result
+
+    def metrics(self):
+        return {'workers': self.workers, 'capacity': self.capacity, 'in_flight': self.pending, **self.stats}
+
+pool = InferencePool(INFERENCE_WORKERS, INFERENCE_QUEUE)
+
+def _json_body(body):
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError as e:  # JSONDecodeError, or bytes that are not UTF-8
+        raise InvalidBody(str(e)) from None
+
+async def predict(body):
+    start = datetime.now()
+    t = perf_counter_ns()
+    data = _json_body(body) or {}
+    core.timed('parse', t)
+    return await pool.run(core.predict_payload, data, start)
+
+async def predict_batch(body):
+    start = datetime.now()
+    t = perf_counter_ns()
+    try:
+        data = _json_body(body)
+    except ValueError:
+        data = None
+    core.timed('parse', t)
+    return await pool.run(core.predict_batch_payload, data, start)
+
+async def predict_encoded(body, ctype, batch):
+    """MessagePack / Arrow IPC body -> (response bytes, status, content type)"""
+    return await pool.run(core.encoded_payload, body, ctype, batch, datetime.now())
+
+async def health(_):
+    resp = core.health_payload()
+    resp['inference_pool'] = pool.metrics()
+    return resp, 200
+
+async def ready(_):
+    return core.ready_payload()
+
+async def statistics(_):
+    return core.statistics_payload(), 200
+
+async def reset_stats(_):
+    return core.reset_payload(), 200
+
+async def metrics(_):
+    return core.metrics_text(), 200
+
+async def profile_status(_):
+    return core.profiler.status(), 200
+
+async def profile_start(body):
+    try:
+        data = _json_body(body)
+    except ValueError:
+        data = None
+    return core.profile_payload(data)
+
+async def admin_reload(body):
+    try:
+        data = _json_body(body)
+    except ValueError:
+        data = None
+    # {"wait": true} blocks until the swap, so keep it off the loop and out of the inference pool
+    return await asyncio.get_running_loop().run_in_executor(None, core.reload_payload, data)
+
+async def admin_models(_):
+    return core.models_payload(), 200
+
+async def admin_rules(_):
+    return core.rules_payload()
+
+async def admin_rules_reload(_):
+    return core.rules_payload(reload=True)
+
+async def feedback(body):
+    data = _json_body(body)
+    # off the loop, and out of the inference pool so logging feedback never holds up scoring
+    return await asyncio.get_running_loop().run_in_executor(None, core.feedback_payload, data)
+
+ROUTES = {
+    ('POST', '/api/predict'): predict,
+    ('POST', '/api/predict/batch'): predict_batch,
+    ('GET', '/api/health'): health,
+    ('GET', '/api/ready'): ready,
+    ('GET', '/api/statistics'): statistics,
+    ('POST', '/api/reset-stats'): reset_stats,
+    ('GET', '/metrics'): metrics,
+    ('GET', '/api/profile'): profile_status,
+    ('POST', '/api/profile'): profile_start,
+    ('POST', '/api/admin/reload'): admin_reload,
+    ('GET', '/api/admin/models'): admin_models,
+    ('GET', '/api/admin/rules'): admin_rules,
+    ('POST', '/api/admin/rules'): admin_rules_reload,
+    ('POST', '/api/feedback'): feedback,
+}
+PATHS = {path for _, path in ROUTES}
+# Paths outside /api/admin/ that also need the admin token
+TOKEN_PATHS = {'/api/feedback', '/api/profile'}
+# Routes that also take binary bodies (wire.BINARY_TYPES), answered in the request's encoding
+ENCODED_ROUTES = {('POST', '/api/predict'): False, ('POST', '/api/predict/batch'): True}
+
+async def _send(send, status, payload, headers=(), ctype=None):
+    if ctype is not None:
+        body, ctype = payload, ctype.encode()
+    elif isinstance(payload, bytes):
+        body, ctype = payload, b'text/html; charset=utf-8'
+    elif isinstance(payload, str):
+        body, ctype = payload.encode(), core.PROMETHEUS_CONTENT_TYPE.encode()
+    else:
+        t = perf_counter_ns()
+        body, ctype = json.dumps(payload).encode(), b'application/json'
+        core.timed('serialize', t)
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', ctype), (b'content-length', str(len(body)).encode()), *headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def _read_body(receive):
+    chunks, size = [], 0
+    while True:
+        msg = await receive()
+        if msg['type'] == 'http.disconnect':
+            return None
+        chunk = msg.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise ValueError('body too large')
+        chunks.append(chunk)
+        if not msg.get('more_body'):
+            return b''.join(chunks)
+
+async def _lifespan(receive, send):
+    while True:
+        msg = await receive()
+        if msg['type'] == 'lifespan.startup':
+            if not core.ready:
+                await asyncio.get_running_loop().run_in_executor(None, core.load_model)
+            logger.info(f"ASGI ready: {pool.workers} inference workers, capacity {pool.capacity}")
+            await send({'type': 'lifespan.startup.complete'})
+        elif msg['type'] == 'lifespan.shutdown':
+            pool.executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    path, method = scope['path'], scope['method']
+    if path == '/' and method == 'GET':
+        with open(os.path.join(core.FRONTEND_DIR, 'index.html'), 'rb') as f:
+            return await _send(send, 200, f.read())
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        if path in PATHS:
+            return await _send(send, 405, {'error':'Method not allowed'})
+        return await _send(send, 404, {'error':'Endpoint not found','available_endpoints':[
+            'GET /'] + [f'{m} {p}' for m, p in ROUTES]})
+    if path.startswith('/api/admin/') or path in TOKEN_PATHS:
+        token = dict(scope['headers']).get(b'x-admin-token', b'').decode('latin-1')
+        denied = core.admin_denied(token)
+        if denied is not None:
+            return await _send(send, denied[1], denied[0])
+    try:
+        body = await _read_body(receive)
+    except ValueError:
+        return await _send(send, 413, {'error':'Request body too large'})
+    if body is None:
+        return
+    ctype = None
+    if (method, path) in ENCODED_ROUTES:
+        ctype = media_type(dict(scope['headers']).get(b'content-type'))
+    try:
+        if ctype in BINARY_TYPES:
+            payload, status, ctype = await predict_encoded(body, ctype, ENCODED_ROUTES[(method, path)])
+        else:
+            (payload, status), ctype = await handler(body), None
+    except Overloaded:
+        return await _send(send, 429, {'error':'Server busy, retry later'},
+                           [(b'retry-after', str(RETRY_AFTER_S).encode())])
+    except InvalidBody:
+        return await _send(send, 400, {'error':'Invalid JSON body'})
+    except Exception as e:
+        logger.error(f"Internal server error: {e}")
+        return await _send(send, 500, {'error':'Internal server error','message':'Check server logs'})
+    await _send(send, status, payload, ctype=ctype)
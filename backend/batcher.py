@@ -0,0 +1,144 @@
+"""Adaptive micro-batching: coalesce concurrent single-row predictions into one model call"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # queued by close(): rows ahead of it are still scored
+
+class MicroBatcher:
+    """Queue rows from request threads and flush them to score_fn as one matrix.
+
+    A flush happens when max_batch rows are queued or the batching window ends. The
+    window adapts to load: when requests arrive further apart than max_wait_ms (light
+    traffic) a lone row is flushed immediately instead of waiting for company.
+    score_fn(matrix) must return a tuple of per-row arrays; row i of each is sent back
+    to the caller that submitted row i, and an exception is raised to every caller of the batch.
+    """
+
+    def __init__(self, score_fn, max_batch=64, max_wait_ms=2.0, ewma_alpha=0.1):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.alpha = ewma_alpha
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_arrival = 0.0
+        self._gap_ewma = float('inf')
+        self._closed = False
+        self._stats = {'requests': 0, 'batches': 0, 'max_batch_size': 0, 'immediate_flushes': 0,
+                       'total_wait_ms': 0.0, 'max_wait_ms': 0.0}
+
+    def submit(self, row):
+        """Score one 1 x F row; blocks until its batch has been scored"""
+        fut = Future()
+        now = time.perf_counter()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Micro-batcher is closed")
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+            if self._last_arrival:
+                gap = now - self._last_arrival
+                self._gap_ewma = gap if self._gap_ewma == float('inf') else \
+                    self.alpha * gap + (1 - self.alpha) * self._gap_ewma
+            self._last_arrival = now
+            self._queue.put((np.asarray(row).reshape(1, -1), now, fut))
+        return fut.result()
+
+    def close(self, timeout=None):
+        """Refuse new rows, score the queued ones and stop the flush thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def window(self):
+        """Current batching window in seconds: 0 under light load, up to max_wait when busy"""
+        gap = self._gap_ewma
+        if gap >= self.max_wait:
+            return 0.0
+        # Wait roughly as long as it takes to fill a batch at the observed arrival rate
+        return min(self.max_wait, gap * (self.max_batch - 1))
+
+    def _collect(self):
+        """(rows to flush, whether the window was 0, whether close() was reached)"""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True, True
+        batch = [first]
+        window = self.window()
+        deadline = time.perf_counter() + window
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                return batch, window == 0.0, True
+            batch.append(item)
+        return batch, window == 0.0, False
+
+    def _run(self):
+        while True:
+            batch, immediate, stop = self._collect()
+            if batch:
+                self._flush(batch, immediate)
+            if stop:
+                return
+
+    def _flush(self, batch, immediate):
+        flushed = time.perf_counter()
+        try:
+            results = self.score_fn(np.vstack([row for row, _, _ in batch]))
+            for i, (_, _, fut) in enumerate(batch):
+                fut.set_result(tuple(r[i] for r in results))
+        except Exception as e:
+            logger.error(f"Micro-batch scoring failed: {e}")
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        waits = [(flushed - arrived) * 1000 for _, arrived, _ in batch]
+        with self._lock:
+            st = self._stats
+            st['requests'] += len(batch)
+            st['batches'] += 1
+            st['max_batch_size'] = max(st['max_batch_size'], len(batch))
+            st['immediate_flushes'] += immediate
+            st['total_wait_ms'] += sum(waits)
+            st['max_wait_ms'] = max(st['max_wait_ms'], max(waits))
+
+    def metrics(self):
+        with self._lock:
+            st = dict(self._stats)
+            window = self.window()
+        batches = max(st['batches'], 1)
+        return {
+            'queue_depth': self._queue.qsize(),
+            'requests': st['requests'],
+            'batches': st['batches'],
+            'avg_batch_size': round(st['requests'] / batches, 2),
+            'max_batch_size': st['max_batch_size'],
+            'immediate_flushes': st['immediate_flushes'],
+            'avg_wait_ms': round(st['total_wait_ms'] / max(st['requests'], 1), 3),
+            'max_wait_ms': round(st['max_wait_ms'], 3),
+            'current_window_ms': round(window * 1000, 3),
+            'max_batch': self.max_batch,
+            'max_window_ms': self.max_wait * 1000,
+        }
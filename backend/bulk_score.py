@@ -0,0 +1,212 @@
+"""Offline bulk scoring: stream JSONL/CSV transactions through the serving model in fixed-size chunks.
+
+Memory stays bounded by chunk size x in-flight chunks, whatever the input size. Chunks are scored on a
+process pool and written in input order. A checkpoint (input byte offset, output byte offset, row count)
+is saved after every chunk written, so an interrupted run continues with --resume.
+
+Usage:
+    python backend/bulk_score.py transactions.jsonl -o scores.jsonl [--chunk-size 10000] [--workers 4] [--resume]
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+logger = logging.getLogger(__name__)
+
+_core = None
+
+def _init_worker():
+    """Load the serving model once per process, without the server's background state"""
+    global _core
+    sys.path.insert(0, BACKEND_DIR)
+    logging.getLogger().setLevel(logging.WARNING)
+    # Offline scores must not feed (or read) live velocity counts or the shared request statistics
+    os.environ['FRAUDCHECK_VELOCITY'] = '0'
+    os.environ.pop('FRAUDCHECK_STATS_DB', None)
+    import app
+    app.load_model(watch=False, trainer=False)  # one version for the whole run, and no trainer per worker
+    _core = app
+
+def score_chunk(first_row, rows, raw_json=False):
+    """Score rows (dicts, or raw JSON lines when raw_json); returns JSONL text"""
+    core = _core
+    if raw_json:
+        rows = [_parse_json(line) for line in rows]
+    results = [None] * len(rows)
+    valid = []
+    for i, data in enumerate(rows):
+        if isinstance(data, ParseError):
+            results[i] = {'error': str(data)}
+        elif core.missing_fields(data):
+            results[i] = {'error': 'Missing required fields'}
+        else:
+            valid.append(i)
+    if valid:
+        from features import build_matrix
+        fv, ok = build_matrix([rows[i] for i in valid], ip_index=core.ip_index, return_ok=True)
+        for i in (valid[row] for row in np.flatnonzero(~ok)):
+            results[i] = {'error': 'Unparseable transaction fields'}
+        valid, fv = [i for i, good in zip(valid, ok) if good], fv[ok]
+    if valid:
+        bundle = core.current
+        preds, probs, tiers = core.score_matrix(fv, bundle)
+        version = bundle.version if bundle is not None else None
+        reasons = core.fraud_reasons(fv, preds)
+        for row, i in enumerate(valid):
+            results[i] = core.build_result(fv.shape[1], int(preds[row]), float(probs[row]), tiers[row], version,
+                                           reasons[row])
+    out = io.StringIO()
+    for i, res in enumerate(results):
+        data = rows[i]
+        txid = data.get('transaction_id') if isinstance(data, dict) else None
+        head = {'row': first_row + i}
+        if txid is not None:
+            head['transaction_id'] = txid
+        out.write(json.dumps({**head, **res}) + '\n')
+    return out.getvalue()
+
+class ParseError(str):
+    pass
+
+def _parse_json(line):
+    try:
+        rec = json.loads(line)
+    except ValueError:
+        return ParseError('Invalid JSON')
+    return rec if isinstance(rec, dict) else ParseError('Expected a JSON object')
+
+class ChunkReader:
+    """Yield (rows, end_offset) chunks from a JSONL or CSV file starting at a byte offset.
+
+    JSONL chunks are raw lines, parsed by the scoring workers; CSV chunks are dicts without the empty
+    cells, so a blank field counts as missing rather than as an unparseable "".
+    """
+
+    def __init__(self, path, fmt, chunk_size, offset=0, header=None):
+        self.path, self.fmt, self.chunk_size = path, fmt, chunk_size
+        self.offset, self.header = offset, header
+
+    def _lines(self, f):
+        for line in iter(f.readline, b''):
+            self.offset += len(line)
+            yield line.decode('utf-8')
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            lines = self._lines(f)
+            if self.fmt == 'csv':
+                # csv.reader pulls lines lazily, so offset always sits at the end of the last whole record
+                reader = csv.reader(lines)
+                if self.header is None:
+                    self.header = next(reader, None)
+                    if self.header is None:
+                        return
+                records = ({k: v for k, v in zip(self.header, rec) if v != ''} for rec in reader if rec)
+            else:
+                records = (line for line in lines if line.strip())
+            chunk = []
+            for rec in records:
+                chunk.append(rec)
+                if len(chunk) >= self.chunk_size:
+                    yield chunk, self.offset
+                    chunk = []
+            if chunk:
+                yield chunk, self.offset
+
+def _save_checkpoint(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def run(input_path, output_path, fmt=None, chunk_size=10000, workers=None, resume=False,
+        checkpoint_path=None, progress_every=5.0):
+    """Score input_path into output_path; returns rows scored in this run"""
+    input_path, output_path = os.path.abspath(input_path), os.path.abspath(output_path)
+    fmt = fmt or ('csv' if input_path.lower().endswith('.csv') else 'jsonl')
+    checkpoint_path = os.path.abspath(checkpoint_path or output_path + '.ckpt')
+    state = {'input': os.path.abspath(input_path), 'format': fmt, 'input_offset': 0,
+             'output_offset': 0, 'rows': 0, 'header': None}
+    if resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            saved = json.load(f)
+        if saved.get('input') != state['input'] or saved.get('format') != fmt:
+            raise ValueError(f"Checkpoint {checkpoint_path} belongs to a different input")
+        state = saved
+        logger.info(f"Resuming at row {state['rows']} (input byte {state['input_offset']})")
+    out = open(output_path, 'r+b' if resume and os.path.exists(output_path) else 'wb')
+    out.seek(state['output_offset'])
+    out.truncate()
+
+    reader = ChunkReader(input_path, fmt, chunk_size, state['input_offset'], state['header'])
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker) if workers > 0 else None
+    if pool is None:
+        _init_worker()
+    max_in_flight = max(2 * workers, 1)
+    in_flight = deque()
+    start = last_report = time.perf_counter()
+    scored = 0
+    next_row = state['rows']
+
+    def drain_one():
+        nonlocal scored, last_report
+        fut, n, end_offset = in_flight.popleft()
+        text = fut.result() if pool is not None else fut
+        out.write(text.encode('utf-8'))
+        out.flush()
+        scored += n
+        state.update(input_offset=end_offset, output_offset=out.tell(), rows=state['rows'] + n,
+                     header=reader.header)
+        _save_checkpoint(checkpoint_path, state)
+        now = time.perf_counter()
+        if now - last_report >= progress_every:
+            last_report = now
+            print(f"{state['rows']} rows scored, {scored / (now - start):,.0f} rows/s", file=sys.stderr)
+
+    try:
+        for rows, end_offset in reader:
+            raw = fmt == 'jsonl'
+            job = pool.submit(score_chunk, next_row, rows, raw) if pool is not None else score_chunk(next_row, rows, raw)
+            in_flight.append((job, len(rows), end_offset))
+            next_row += len(rows)
+            while len(in_flight) >= max_in_flight:
+                drain_one()
+        while in_flight:
+            drain_one()
+    finally:
+        out.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    elapsed = time.perf_counter() - start
+    print(f"Done: {scored} rows in {elapsed:.1f}s ({scored / max(elapsed, 1e-9):,.0f} rows/s), "
+          f"{state['rows']} total -> {output_path}", file=sys.stderr)
+    return scored
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-score JSONL/CSV transactions offline")
+    parser.add_argument('input', help="JSONL (one transaction object per line) or CSV with a header row")
+    parser.add_argument('-o', '--output', required=True, help="JSONL results, one line per input row, in input order")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help="default: from the input extension")
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=None, help="scoring processes (0 = in-process)")
+    parser.add_argument('--resume', action='store_true', help="continue from the checkpoint next to the output")
+    parser.add_argument('--checkpoint', help="checkpoint path (default: <output>.ckpt)")
+    parser.add_argument('--progress-every', type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    run(args.input, args.output, args.format, args.chunk_size, args.workers, args.resume, args.checkpoint,
+        args.progress_every)
+
+if __name__ == '__main__':
+    main()
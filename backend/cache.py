@@ -0,0 +1,67 @@
+"""Bounded LRU + TTL prediction cache keyed on the engineered feature vector and model version"""
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+class PredictionCache:
+    """Thread-safe map of (model version, feature-vector bytes) -> (pred, prob).
+
+    Entries older than ttl_seconds are dropped on access; the least recently used
+    entry is evicted once max_size is reached. invalidate() empties the cache and
+    switches the version, so results from a previous model can never be served. Callers
+    that may still hold a previous model during a hot swap pass its version explicitly.
+    """
+
+    def __init__(self, max_size=10000, ttl_seconds=300.0, version=''):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.version = version
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def _key(self, row, version):
+        return (self.version if version is None else version, np.ascontiguousarray(row, dtype=np.float64).tobytes())
+
+    def get(self, row, version=None):
+        """Cached value for row under version (default: the version set by the last invalidate)"""
+        now = time.monotonic()
+        with self._lock:
+            key = self._key(row, version)
+            entry = self._data.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._data.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return entry[1]
+                del self._data[key]
+                self._counters['expirations'] += 1
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, row, value, version=None):
+        now = time.monotonic()
+        with self._lock:
+            key = self._key(row, version)
+            self._data[key] = (now, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def invalidate(self, version=None):
+        """Drop every entry (called on model reload)"""
+        with self._lock:
+            self._data.clear()
+            if version is not None:
+                self.version = version
+            self._counters['invalidations'] += 1
+
+    def metrics(self):
+        with self._lock:
+            c = dict(self._counters)
+            size = len(self._data)
+        lookups = c['hits'] + c['misses']
+        return {**c, 'size': size, 'max_size': self.max_size, 'ttl_seconds': self.ttl,
+                'hit_rate': round(c['hits'] / lookups, 4) if lookups else 0.0}
@@ -0,0 +1,99 @@
+"""Two-tier cascade scoring: a logistic heuristic over the feature vector decides the clear-cut rows,
+and only rows whose heuristic probability falls inside a calibrated band reach the forest.
+
+The band is calibrated offline per model (models/calibrate_cascade.py) and stored as cascade.json
+next to the model files, so it is swapped together with the model on reload.
+"""
+import json
+import os
+import numpy as np
+
+CASCADE_FILE = 'cascade.json'
+TIER_HEURISTIC = 'heuristic'
+TIER_MODEL = 'model'
+TIER_FALLBACK = 'fallback'
+TIERS = (TIER_HEURISTIC, TIER_MODEL, TIER_FALLBACK)
+# (feature column, weight) of the heuristic score, summed in this order
+HEURISTIC_WEIGHTS = ((1, 1.2), (3, 0.6), (4, 1.1), (5, 1.0), (6, 0.9), (7, 1.3), (9, 0.7), (10, 0.8),
+                     (11, 0.15), (12, 1.0), (8, 0.4), (0, 0.05))
+HEURISTIC_BIAS = 3.5
+
+def heuristic_proba(fv):
+    """Fraud probability from a dozen multiply-adds per row (N x 13 unscaled features)"""
+    score = fv[:, HEURISTIC_WEIGHTS[0][0]] * HEURISTIC_WEIGHTS[0][1]
+    for col, weight in HEURISTIC_WEIGHTS[1:]:
+        score = score + fv[:, col] * weight
+    return 1 / (1 + np.exp(-score + HEURISTIC_BIAS))
+
+class CascadeBand:
+    """Heuristic probability below low is decided safe and above high fraud by the heuristic alone;
+    rows with low <= p <= high go to the model. low <= 0.5 <= high keeps both decisions consistent
+    with the heuristic's own 0.5 cut."""
+
+    def __init__(self, low, high, **calibration):
+        low, high = float(low), float(high)
+        if not 0.0 <= low <= 0.5 <= high <= 1.0:
+            raise ValueError(f"Cascade band must satisfy 0 <= low <= 0.5 <= high <= 1, got [{low}, {high}]")
+        self.low, self.high = low, high
+        self.calibration = calibration
+
+    def needs_model(self, proba):
+        return (proba >= self.low) & (proba <= self.high)
+
+    def to_dict(self):
+        return {'low': self.low, 'high': self.high, **self.calibration}
+
+    @classmethod
+    def parse(cls, text):
+        """Band from "low,high" (the FRAUDCHECK_CASCADE_BAND format)"""
+        low, high = text.split(',')
+        return cls(low, high)
+
+    @classmethod
+    def load(cls, directory):
+        """The band calibrated for the model in directory, or None if there is none"""
+        try:
+            with open(os.path.join(directory, CASCADE_FILE)) as f:
+                return cls(**json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def save(self, directory):
+        path = os.path.join(directory, CASCADE_FILE)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+        return path
+
+def calibrate(heuristic, model_labels, target_agreement, max_candidates=512):
+    """Narrowest band whose cascade decisions agree with model_labels on at least target_agreement of rows.
+
+    Rows below low count as safe and rows above high as fraud; every (low, high) pair among the
+    heuristic's quantiles is scored at once from cumulative disagreement counts. Returns the band
+    with the smallest model share, or None if even sending everything to the model misses the target.
+    """
+    h = np.asarray(heuristic, dtype=np.float64)
+    y = np.asarray(model_labels).astype(bool)
+    n = len(h)
+    qs = np.unique(np.quantile(h, np.linspace(0, 1, max_candidates)))
+    lows = np.concatenate([[0.0], qs[qs <= 0.5], [0.5]])
+    highs = np.concatenate([[0.5], qs[qs >= 0.5], [1.0]])
+    order = np.argsort(h)
+    hs, ys = h[order], y[order]
+    # Rows strictly below each low (decided safe) and strictly above each high (decided fraud)
+    below = np.searchsorted(hs, lows, side='left')
+    above = n - np.searchsorted(hs, highs, side='right')
+    fraud_cum = np.concatenate([[0], np.cumsum(ys)])
+    safe_cum = np.concatenate([[0], np.cumsum(~ys)])
+    wrong_low = fraud_cum[below]                     # model says fraud, heuristic decided safe
+    wrong_high = safe_cum[n] - safe_cum[n - above]   # model says safe, heuristic decided fraud
+    agreement = 1 - (wrong_low[:, None] + wrong_high[None, :]) / max(n, 1)
+    model_share = 1 - (below[:, None] + above[None, :]) / max(n, 1)
+    ok = agreement >= target_agreement
+    if not ok.any():
+        return None
+    share = np.where(ok, model_share, np.inf)
+    i, j = np.unravel_index(np.argmin(share), share.shape)
+    return CascadeBand(lows[i], highs[j], target_agreement=target_agreement, agreement=round(float(agreement[i, j]), 6),
+                       model_share=round(float(model_share[i, j]), 6), calibration_rows=n)
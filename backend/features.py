@@ -0,0 +1,268 @@
+"""Shared 13-feature spec: vectorized transaction -> feature matrix for serving and training"""
+import logging
+import numpy as np
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+FEATURE_NAMES = [
+    'normalized_amount', 'high_amount_flag', 'hour_of_day', 'unusual_hour_flag',
+    'payment_method_risk', 'location_risk', 'device_risk', 'ip_risk',
+    'age_risk', 'account_age_risk', 'frequency', 'amount_deviation',
+    'merchant_risk'
+]
+N_FEATURES = len(FEATURE_NAMES)
+
+PAYMENT_RISK = {
+    'credit_card': 0.10,'debit_card': 0.05,'prepaid_card': 0.30,'gift_card': 0.35,
+    'paypal': 0.15,'venmo': 0.20,'apple_pay': 0.12,'google_pay': 0.12,
+    'alipay': 0.25,'wechat_pay': 0.25,'bank_transfer': 0.08,'wire_transfer': 0.20,
+    'digital_wallet': 0.20,'cryptocurrency': 0.50,'cash': 0.02
+}
+DEFAULT_PAYMENT_RISK = 0.15
+
+HIGH_RISK_COUNTRIES = {'NG','RO','RU','CN','TR','EG','GH','KE','PH','VN','ID'}
+MEDIUM_RISK_COUNTRIES = {'BR','MX','AR','IN','ZA','KR','SG','HK'}
+COUNTRY_RISK = {**{c: 0.45 for c in MEDIUM_RISK_COUNTRIES}, **{c: 0.85 for c in HIGH_RISK_COUNTRIES}}
+DEFAULT_COUNTRY_RISK = 0.12
+
+DEVICE_RISK = {
+    'mobile':0.60,'tablet':0.30,'desktop':0.10,'laptop':0.15,'smartwatch':0.70,
+    'atm':0.05,'pos':0.08,'unknown':0.25
+}
+DEFAULT_DEVICE_RISK = 0.20
+
+HIGH_RISK_MERCHANTS = {'gambling','adult_content','cryptocurrency','cryptocurrency_exchange','luxury_goods','financial_services'}
+MEDIUM_RISK_MERCHANTS = {'travel','entertainment','online_shopping','ride_sharing','subscriptions','logistics','food_delivery','electronics'}
+MERCHANT_RISK = {**{m: 0.32 for m in MEDIUM_RISK_MERCHANTS}, **{m: 0.72 for m in HIGH_RISK_MERCHANTS}}
+DEFAULT_MERCHANT_RISK = 0.12
+
+# Row used when a transaction cannot be parsed
+FALLBACK_VECTOR = np.array([0.1,0,12,0,0.1,0.1,0.1,0.2,0,0,0,0.1,0.1])
+
+_MISSING = object()
+_FIELDS = ('amount','transaction_time','payment_method','country','device_info','ip_risk',
+           'customer_age','account_age','daily_transactions','avg_transaction','merchant_category')
+_INT_CLAMP = 2**60
+_UNIQUE_MIN_ROWS = 64
+_ROW_PATH_MAX_ROWS = 4
+
+def _risk_flags(high_amount, unusual_hour, payment_risk, location_risk, device_risk, freq_flag):
+    return (high_amount.astype(np.int64) + unusual_hour + (payment_risk >= 0.3) +
+            (location_risk >= 0.8) + (device_risk >= 0.6) + (freq_flag == 1))
+
+def unboosted_deviation(fv):
+    """amount_deviation of an N x 13 matrix with the synergistic boost undone: min(|amount - avg| / avg, 5)"""
+    fv = np.atleast_2d(fv)
+    risk_flags = _risk_flags(fv[:, 1] == 1, fv[:, 3] == 1, fv[:, 4], fv[:, 5], fv[:, 6], fv[:, 10])
+    return np.where(risk_flags >= 3, fv[:, 11] / (1 + (risk_flags * 0.05)), fv[:, 11])
+
+def unboosted_deviation_row(x):
+    """unboosted_deviation of one feature row (a list), for the scalar paths"""
+    risk_flags = sum([x[1] == 1, x[3] == 1, x[4] >= 0.3, x[5] >= 0.8, x[6] >= 0.6, x[10] == 1])
+    return x[11] / (1 + (risk_flags * 0.05)) if risk_flags >= 3 else x[11]
+
+def assemble(amount, hour, payment_risk, location_risk, device_risk, ip_risk,
+             age_flag, account_flag, freq_flag, deviation, merchant_risk, dtype=np.float64):
+    """Stack raw per-column arrays into the N x 13 matrix (caps, flags, synergistic boost)"""
+    amount = np.asarray(amount, dtype=np.float64)
+    hour = np.asarray(hour, dtype=np.float64)
+    payment_risk = np.asarray(payment_risk, dtype=np.float64)
+    location_risk = np.asarray(location_risk, dtype=np.float64)
+    device_risk = np.asarray(device_risk, dtype=np.float64)
+    freq_flag = np.asarray(freq_flag, dtype=np.float64)
+    high_amount = amount > 5000
+    unusual_hour = (hour < 6) | (hour > 22)
+    out = np.empty((len(amount), N_FEATURES), dtype=np.float64)
+    out[:, 0] = np.minimum(amount / 10000, 20)
+    out[:, 1] = high_amount
+    out[:, 2] = hour
+    out[:, 3] = unusual_hour
+    out[:, 4] = payment_risk
+    out[:, 5] = location_risk
+    out[:, 6] = device_risk
+    out[:, 7] = ip_risk
+    out[:, 8] = age_flag
+    out[:, 9] = account_flag
+    out[:, 10] = freq_flag
+    out[:, 11] = np.minimum(deviation, 5)
+    out[:, 12] = merchant_risk
+    # Synergistic boost
+    risk_flags = _risk_flags(high_amount, unusual_hour, payment_risk, location_risk, device_risk, freq_flag)
+    boost = risk_flags >= 3
+    if boost.any():
+        out[boost, 11] = np.minimum(out[boost, 11] * (1 + (risk_flags[boost] * 0.05)), 10)
+    return out if dtype == np.float64 else out.astype(dtype)
+
+def _to_float(v):
+    return float(v)
+
+def _to_int(v):
+    return float(min(max(int(v), -_INT_CLAMP), _INT_CLAMP))
+
+def _to_hour(v):
+    return float(int(v.split(':')[0]))
+
+def _numeric(values, default, integer=False):
+    """Column -> (float64 values, ok mask); integer columns truncate like int()"""
+    arr = values if isinstance(values, np.ndarray) else np.asarray(values) if _plain(values) else None
+    if arr is not None and arr.ndim == 1 and arr.dtype.kind in 'biuf':
+        vals = arr.astype(np.float64)
+        if not integer:
+            return vals, np.ones(len(vals), dtype=bool)
+        ok = np.isfinite(vals)
+        return np.trunc(np.where(ok, vals, 0)), ok
+    conv = _to_int if integer else _to_float
+    n = len(values)
+    vals = np.zeros(n, dtype=np.float64)
+    ok = np.ones(n, dtype=bool)
+    for i, v in enumerate(values):
+        try:
+            vals[i] = conv(default if v is _MISSING else v)
+        except Exception:
+            ok[i] = False
+    return vals, ok
+
+def _plain(values):
+    return all(type(v) in (int, float, bool) for v in values)
+
+def _mapped(values, table, default, parse=None):
+    """Categorical column -> (float64 risk values, ok mask) via one lookup per distinct value"""
+    n = len(values)
+    arr = values if isinstance(values, np.ndarray) else None
+    # np.unique only pays off once there are repeats to share
+    if arr is None and n >= _UNIQUE_MIN_ROWS and all(type(v) is str for v in values):
+        arr = np.asarray(values, dtype=str)
+    if arr is not None and arr.ndim == 1 and arr.dtype.kind == 'U':
+        uniq, inv = np.unique(arr, return_inverse=True)
+        vals = np.zeros(len(uniq), dtype=np.float64)
+        ok = np.ones(len(uniq), dtype=bool)
+        for j, u in enumerate(uniq.tolist()):
+            try:
+                vals[j] = parse(u) if parse else table.get(u, default)
+            except Exception:
+                ok[j] = False
+        return vals[inv], ok[inv]
+    vals = np.zeros(n, dtype=np.float64)
+    ok = np.ones(n, dtype=bool)
+    for i, v in enumerate(values):
+        try:
+            vals[i] = parse(v) if parse else table.get(v, default)
+        except Exception:
+            ok[i] = False
+    return vals, ok
+
+def _row_vector(t, now, ip_index=None):
+    """Scalar path for tiny batches, where per-column NumPy overhead outweighs the work"""
+    amount = float(t.get('amount', 0))
+    hour = int(t.get('transaction_time', now).split(':')[0])
+    pay = PAYMENT_RISK.get(t.get('payment_method', 'credit_card'), DEFAULT_PAYMENT_RISK)
+    loc = COUNTRY_RISK.get(t.get('country', 'US'), DEFAULT_COUNTRY_RISK)
+    dev = DEVICE_RISK.get(t.get('device_info', 'desktop'), DEFAULT_DEVICE_RISK)
+    address = t.get('ip_address') if ip_index is not None else None
+    ip = (ip_index.lookup(address) if address is not None else float(t.get('ip_risk', 2))) / 10
+    age = int(t.get('customer_age', 35))
+    acct = int(t.get('account_age', 365))
+    freq = 1 if int(t.get('daily_transactions', 1)) > 10 else 0
+    avg = float(t.get('avg_transaction', amount))
+    deviation = min(abs(amount - avg) / avg if avg > 0 else 0, 5)
+    merch = MERCHANT_RISK.get(t.get('merchant_category', 'retail'), DEFAULT_MERCHANT_RISK)
+    unusual = hour < 6 or hour > 22
+    risk_flags = sum([amount > 5000, unusual, pay >= 0.3, loc >= 0.8, dev >= 0.6, freq == 1])
+    if risk_flags >= 3:
+        deviation = min(deviation * (1 + (risk_flags * 0.05)), 10)
+    return [min(amount / 10000, 20), 1 if amount > 5000 else 0, hour, 1 if unusual else 0, pay, loc, dev, ip,
+            1 if age < 21 or age > 65 else 0, 1 if acct < 30 else 0, freq, deviation, merch]
+
+def _resolve_ip(addresses, ip_index, ip, ok):
+    """Overwrite ip / ok in place for the rows that carry an address, one lookup per distinct address"""
+    if isinstance(addresses, np.ndarray):
+        have = np.ones(len(addresses), dtype=bool)
+    else:
+        have = np.fromiter((v is not _MISSING and v is not None for v in addresses), dtype=bool, count=len(addresses))
+        if not have.any():
+            return
+        addresses = [v for v, h in zip(addresses, have) if h]
+    ip[have], ok[have] = _mapped(addresses, None, None, parse=ip_index.lookup)
+
+def _columns_from_rows(rows, fields):
+    cols = {}
+    for key in fields:
+        cols[key] = [r.get(key, _MISSING) if isinstance(r, dict) else None for r in rows]
+    return cols
+
+def build_matrix(transactions, dtype=np.float64, ip_index=None, return_ok=False):
+    """Engineer the N x 13 feature matrix from a list of transaction dicts or a dict of columns.
+
+    Rows whose fields cannot be parsed get FALLBACK_VECTOR, as per-row preprocess always did; with
+    return_ok the result is (matrix, per-row bool mask of the rows that parsed).
+    With ip_index (ip_index.IpRiskIndex), rows carrying an ip_address take their IP risk from it instead
+    of ip_risk; an address that does not parse makes the row unparseable.
+    """
+    fields = _FIELDS + ('ip_address',) if ip_index is not None else _FIELDS
+    if isinstance(transactions, dict):
+        n = len(next(iter(transactions.values()))) if transactions else 0
+        cols = {k: transactions.get(k, [_MISSING]*n) for k in fields}
+    elif len(transactions) <= _ROW_PATH_MAX_ROWS:
+        now = datetime.now().strftime('%H:%M')
+        out = np.empty((len(transactions), N_FEATURES), dtype=np.float64)
+        ok = np.ones(len(transactions), dtype=bool)
+        for i, t in enumerate(transactions):
+            try:
+                out[i] = _row_vector(t, now, ip_index)
+            except Exception as e:
+                logger.error(f"Preprocessing error: {e}")
+                out[i], ok[i] = FALLBACK_VECTOR, False
+        out = out if dtype == np.float64 else out.astype(dtype)
+        return (out, ok) if return_ok else out
+    else:
+        n = len(transactions)
+        cols = _columns_from_rows(transactions, fields)
+        cols['_row_ok'] = [isinstance(r, dict) for r in transactions]
+    if n == 0:
+        out = np.empty((0, N_FEATURES), dtype=dtype)
+        return (out, np.ones(0, dtype=bool)) if return_ok else out
+    now = datetime.now().strftime('%H:%M')
+
+    def filled(key, default):
+        col = cols[key]
+        if isinstance(col, np.ndarray):
+            return col
+        return [default if v is _MISSING else v for v in col] if any(v is _MISSING for v in col) else col
+
+    amount, ok = _numeric(filled('amount', 0), 0)
+    hour, o = _mapped(filled('transaction_time', now), None, None, parse=_to_hour); ok &= o
+    pay, o = _mapped(filled('payment_method', 'credit_card'), PAYMENT_RISK, DEFAULT_PAYMENT_RISK); ok &= o
+    loc, o = _mapped(filled('country', 'US'), COUNTRY_RISK, DEFAULT_COUNTRY_RISK); ok &= o
+    dev, o = _mapped(filled('device_info', 'desktop'), DEVICE_RISK, DEFAULT_DEVICE_RISK); ok &= o
+    ip, o = _numeric(filled('ip_risk', 2), 2)
+    if ip_index is not None:
+        _resolve_ip(cols['ip_address'], ip_index, ip, o)
+    ok &= o
+    cust_age, o = _numeric(filled('customer_age', 35), 35, integer=True); ok &= o
+    acct_age, o = _numeric(filled('account_age', 365), 365, integer=True); ok &= o
+    daily, o = _numeric(filled('daily_transactions', 1), 1, integer=True); ok &= o
+    avg_col = cols['avg_transaction']
+    if isinstance(avg_col, np.ndarray):
+        avg, o = _numeric(avg_col, 0)
+    else:
+        missing = np.fromiter((v is _MISSING for v in avg_col), dtype=bool, count=n)
+        avg, o = _numeric(avg_col if not missing.any() else [0 if m else v for m, v in zip(missing, avg_col)], 0)
+        avg[missing] = amount[missing]
+        o[missing] = True
+    ok &= o
+    merch, o = _mapped(filled('merchant_category', 'retail'), MERCHANT_RISK, DEFAULT_MERCHANT_RISK); ok &= o
+    if '_row_ok' in cols:
+        ok &= np.asarray(cols['_row_ok'], dtype=bool)
+
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        positive = avg > 0
+        deviation = np.where(positive, np.abs(amount - avg) / np.where(positive, avg, 1), 0)
+        out = assemble(amount, hour, pay, loc, dev, ip / 10,
+                       (cust_age < 21) | (cust_age > 65), acct_age < 30, daily > 10,
+                       deviation, merch)
+    if not ok.all():
+        logger.error(f"Preprocessing error: {int((~ok).sum())} unparseable transaction(s), using fallback vector")
+        out[~ok] = FALLBACK_VECTOR
+    out = out if dtype == np.float64 else out.astype(dtype)
+    return (out, ok) if return_ok else out
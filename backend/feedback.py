@@ -0,0 +1,84 @@
+"""Labeled-feedback log: confirmed outcomes (transaction id, engineered feature vector, label) for retraining.
+
+The log is a directory of append-only segment files of fixed-size binary records (RECORD), so a reader loads
+a segment, or its tail past an offset, with one np.fromfile. Each process appends to its own segment and
+starts a new one once it reaches segment_bytes; segment names sort by creation time. A batch of records is
+one write(), so concurrent writers never interleave and a crash can cut at most the last record, which
+readers skip. The background trainer (trainer.py) reads segments past its saved offsets.
+"""
+import logging
+import os
+import threading
+import time
+import numpy as np
+from features import N_FEATURES
+
+logger = logging.getLogger(__name__)
+
+TXID_BYTES = 47
+RECORD = np.dtype([('ts', '<f8'), ('x', '<f8', (N_FEATURES,)), ('label', 'u1'), ('txid', f'S{TXID_BYTES}')])
+SEGMENT_SUFFIX = '.fbl'
+
+def segments(directory):
+    """Segment paths in creation order"""
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.endswith(SEGMENT_SUFFIX))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, n) for n in names]
+
+def read_segment(path, start=0):
+    """Records of a segment from record index start on (a trailing partial record is left out)"""
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return np.empty(0, dtype=RECORD)
+    count = size // RECORD.itemsize - start
+    if count <= 0:
+        return np.empty(0, dtype=RECORD)
+    with open(path, 'rb') as f:
+        f.seek(start * RECORD.itemsize)
+        return np.fromfile(f, dtype=RECORD, count=count)
+
+class FeedbackLog:
+    def __init__(self, directory, segment_bytes=64 * 2**20):
+        self.directory = directory
+        self.segment_bytes = max(int(segment_bytes), RECORD.itemsize)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._file = None
+        if hasattr(os, 'register_at_fork'):  # POSIX only; append() also checks the pid
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The parent's segment stays the parent's: a forked worker opens its own on first append
+        self._lock = threading.Lock()
+        self._pid = self._file = None
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"seg-{time.time_ns() // 1000:016d}-{os.getpid()}{SEGMENT_SUFFIX}"
+        self._file = open(os.path.join(self.directory, name), 'ab', buffering=0)
+        self._pid = os.getpid()
+        logger.info(f"Feedback log: new segment {name}")
+
+    def append(self, txids, features, labels, ts=None):
+        """Append one record per row of features (N x 13); returns the segment written to"""
+        records = np.zeros(len(labels), dtype=RECORD)
+        records['ts'] = time.time() if ts is None else ts
+        records['x'] = features
+        records['label'] = labels
+        records['txid'] = [t.encode() for t in txids]
+        with self._lock:
+            if self._file is None or self._pid != os.getpid() or self._file.tell() >= self.segment_bytes:
+                if self._file is not None and self._pid == os.getpid():
+                    self._file.close()
+                self._open_segment()
+            self._file.write(records.tobytes())
+            return os.path.basename(self._file.name)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = None
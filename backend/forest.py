@@ -0,0 +1,423 @@
+"""Array-backed RandomForest inference: flatten fitted sklearn trees once, score with NumPy traversal"""
+import hashlib
+import json
+import logging
+import os
+from time import perf_counter_ns
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows per traversal chunk; bounds the (n_trees x rows) working set on huge batches
+CHUNK_ROWS = 4096
+_SIGN = np.uint64(1 << 63)
+# On-disk compiled model: one .npy per node array (memory-mappable) + meta.json
+ARTIFACT_FORMAT = 1
+ARTIFACT_ARRAYS = ('feature', 'threshold', 'left', 'right', 'children', 'value', 'roots', 'nan_left')
+# Trees per step of anytime evaluation; the deadline and the stopping bound are checked between steps
+ANYTIME_BLOCK = 16
+ANYTIME_STOPS = ('bound', 'deadline', 'max_trees')
+# Up to this many rows anytime evaluation walks each row through the trees in Python, one tree at a time: a NumPy
+# pass per block costs more than that on a handful of rows, and would not let a single row stop early for less
+ANYTIME_SCALAR_ROWS = 4
+
+def _ordered(x):
+    """float64 -> uint64 whose integer order matches the float order"""
+    b = np.asarray(x, dtype=np.float64).view(np.uint64)
+    return np.where(b & _SIGN, ~b, b | _SIGN)
+
+def _unordered(k):
+    return np.where(k & _SIGN, k ^ _SIGN, ~k).view(np.float64)
+
+class Anytime:
+    """Options and outcome of one progressive evaluation (CompiledForest.score(X, anytime=...)).
+
+    Trees are evaluated `block` at a time. A row stops early once the bound shows its label can no longer
+    change whatever the remaining trees vote (its probability is then clamped into that bound), once
+    deadline_ns (perf_counter_ns) has passed, or after max_trees. After scoring, `trees` holds the trees
+    evaluated per row and `stopped` the reason per row ('bound', 'deadline', 'max_trees' or None).
+    """
+
+    def __init__(self, deadline_ns=None, bound=True, block=ANYTIME_BLOCK, max_trees=None):
+        self.deadline_ns = deadline_ns
+        self.bound = bound
+        self.block = max(int(block), 1)
+        self.max_trees = max_trees
+        self.trees = None
+        self.stopped = None
+
+class CompiledForest:
+    """Contiguous node arrays for every tree of a fitted binary RandomForestClassifier.
+
+    Splits compare float32-cast inputs against float64 thresholds and per-tree leaf
+    probabilities are accumulated in estimator order, exactly as sklearn does, so
+    predict_proba is bit-identical to model.predict_proba.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth, classes, n_features,
+                 nan_left=None, scaler_folded=False, children=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.nan_left = np.zeros(len(feature), dtype=bool) if nan_left is None else nan_left
+        self.left = left
+        self.right = right
+        # children[2*i] / children[2*i + 1] = left / right of node i: one gather per level
+        self.children = np.ascontiguousarray(np.stack([left, right], axis=1).ravel()) if children is None else children
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features)
+        self.n_estimators = len(roots)
+        # Folded forests take raw (unscaled) float64 features and compare them at full precision
+        self.scaler_folded = scaler_folded
+        self.input_dtype = np.float64 if scaler_folded else np.float32
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compile a fitted RandomForestClassifier (or raise ValueError if it cannot be)"""
+        estimators = getattr(model, 'estimators_', None)
+        if not estimators or not all(hasattr(e, 'tree_') for e in estimators):
+            raise ValueError(f"{type(model).__name__} is not a fitted tree ensemble")
+        if getattr(model, 'n_outputs_', 1) != 1 or len(model.classes_) != 2:
+            raise ValueError("Only single-output binary forests can be compiled")
+        features, thresholds, lefts, rights, values, roots, nan_lefts = [], [], [], [], [], [], []
+        offset = 0
+        for est in estimators:
+            t = est.tree_
+            idx = np.arange(t.node_count)
+            leaf = t.children_left == -1
+            features.append(np.where(leaf, 0, t.feature))
+            thresholds.append(t.threshold)
+            nan_lefts.append(np.asarray(getattr(t, 'missing_go_to_left', np.zeros(t.node_count)), dtype=bool))
+            # Leaves point at themselves so a fixed-depth traversal parks on them
+            lefts.append(np.where(leaf, idx, t.children_left) + offset)
+            rights.append(np.where(leaf, idx, t.children_right) + offset)
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            v = t.value[:, 0, :len(est.classes_)].astype(np.float64)
+            norm = v.sum(axis=1)
+            norm[norm == 0.0] = 1.0
+            values.append(v / norm[:, None])
+            roots.append(offset)
+            offset += t.node_count
+        return cls(
+            np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            np.asarray(roots, dtype=np.intp),
+            max(e.tree_.max_depth for e in estimators),
+            np.asarray(model.classes_),
+            model.n_features_in_,
+            np.concatenate(nan_lefts),
+        )
+
+    def fold_scaler(self, scaler):
+        """Copy of this forest whose thresholds live in raw feature space, so scaler.transform can be skipped.
+
+        For each split the largest raw x with float32((x - mean) / scale) <= threshold is found by
+        bisection over the ordered float64 values. Scaling and rounding are both monotone, so
+        raw <= folded threshold holds exactly when the scaled comparison does.
+        """
+        if self.scaler_folded:
+            raise ValueError("Scaler already folded")
+        if type(scaler).__name__ != 'StandardScaler':
+            raise ValueError(f"Cannot fold {type(scaler).__name__}")
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(self.n_features_in_)
+        scale = scaler.scale_ if scaler.with_std else np.ones(self.n_features_in_)
+        if len(mean) != self.n_features_in_ or not np.all(scale > 0):
+            raise ValueError("Scaler does not match forest inputs")
+        m, sc, thr = mean[self.feature], scale[self.feature], self.threshold
+
+        def passes(x):
+            with np.errstate(over='ignore', invalid='ignore'):
+                return ((x - m) / sc).astype(np.float32) <= thr
+
+        lo = np.full(len(thr), _ordered(-np.inf), dtype=np.uint64)
+        hi = np.full(len(thr), _ordered(np.inf), dtype=np.uint64)
+        all_pass = passes(np.full(len(thr), np.inf))
+        none_pass = ~passes(np.full(len(thr), -np.inf))
+        active = ~(all_pass | none_pass)
+        # Invariant on active nodes: passes(lo) and not passes(hi)
+        while True:
+            gap = hi - lo
+            active &= gap > 1
+            if not active.any():
+                break
+            mid = lo + gap // np.uint64(2)
+            ok = passes(_unordered(mid))
+            lo = np.where(active & ok, mid, lo)
+            hi = np.where(active & ~ok, mid, hi)
+        folded = _unordered(lo).copy()
+        folded[all_pass] = np.inf
+        folded[none_pass] = np.nan  # x <= nan is never true: always go right
+        return CompiledForest(self.feature, folded, self.left, self.right, self.value, self.roots,
+                              self.depth, self.classes_, self.n_features_in_, self.nan_left,
+                              scaler_folded=True)
+
+    def save(self, directory, **meta):
+        """Write the node arrays as .npy files plus meta.json; see load()"""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARTIFACT_ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+        meta = {'format': ARTIFACT_FORMAT, 'depth': self.depth, 'classes': self.classes_.tolist(),
+                'n_features': self.n_features_in_, 'scaler_folded': self.scaler_folded, **meta}
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load a saved forest; with mmap the node arrays are read-only views of the page cache,
+        so every process that loads (or forks after loading) the same files shares one copy."""
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported compiled model format {meta.get('format')}")
+        # np.asarray drops the np.memmap subclass (its __array_finalize__ runs on every slice) but keeps the mapping
+        arrays = {name: np.asarray(np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None))
+                  for name in ARTIFACT_ARRAYS}
+        forest = cls(arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'], arrays['value'],
+                     arrays['roots'], meta['depth'], np.asarray(meta['classes']), meta['n_features'],
+                     arrays['nan_left'], meta['scaler_folded'], arrays['children'])
+        forest.meta = meta
+        return forest
+
+    def apply(self, X, roots=None):
+        """Leaf node index per (tree, row), X cast to input_dtype; roots selects a subset of trees"""
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)
+        flat = X.ravel()
+        row_base = np.arange(len(X)) * X.shape[1]
+        node = np.repeat((self.roots if roots is None else roots)[:, None], len(X), axis=1)
+        has_nan = np.isnan(flat).any()
+        for _ in range(self.depth):
+            x = np.take(flat, row_base + np.take(self.feature, node))
+            go_right = ~(x <= np.take(self.threshold, node))
+            if has_nan:
+                missing = np.isnan(x)
+                go_right[missing] = ~np.take(self.nan_left, node[missing])
+            node = np.take(self.children, 2 * node + go_right)
+        return node
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected (n, {self.n_features_in_}) input, got {X.shape}")
+        out = np.empty((len(X), 2), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self.apply(X[start:start + CHUNK_ROWS])
+            # Reducing over the leading (tree) axis adds trees one after another,
+            # matching sklearn's accumulation order
+            out[start:start + CHUNK_ROWS] = np.add.reduce(np.take(self.value, leaves, axis=0), axis=0)
+        out /= self.n_estimators
+        return out
+
+    def score(self, X, anytime=None):
+        """(labels, fraud probabilities) from a single traversal, or progressively with an Anytime"""
+        proba = self.predict_proba(X) if anytime is None else self.predict_proba_anytime(X, anytime)
+        return self.classes_.take(np.argmax(proba, axis=1)), proba[:, 1]
+
+    def predict(self, X):
+        return self.score(X)[0]
+
+    def remaining_bounds(self):
+        """(lo, hi): least / greatest class-1 vote trees k.. can still add, per k (length n_estimators + 1)"""
+        if getattr(self, '_remaining', None) is None:
+            n_nodes = len(self.feature)
+            leaf = self.left == np.arange(n_nodes)
+            v = self.value[:, 1]
+            lo = np.minimum.reduceat(np.where(leaf, v, np.inf), self.roots)
+            hi = np.maximum.reduceat(np.where(leaf, v, -np.inf), self.roots)
+            self._remaining = (np.concatenate([np.cumsum(lo[::-1])[::-1], [0.0]]),
+                               np.concatenate([np.cumsum(hi[::-1])[::-1], [0.0]]))
+        return self._remaining
+
+    def _scalar_tables(self):
+        """Node arrays as Python lists for walking single rows (see _walk_anytime)"""
+        if getattr(self, '_tables', None) is None:
+            lo_rem, hi_rem = self.remaining_bounds()
+            self._tables = (self.feature.tolist(), self.threshold.tolist(), self.children.tolist(),
+                            self.nan_left.tolist(), self.value[:, 0].tolist(), self.value[:, 1].tolist(),
+                            self.roots.tolist(), lo_rem.tolist(), hi_rem.tolist())
+        return self._tables
+
+    def _walk_anytime(self, x, anytime, limit):
+        """One row (a list of floats) through the trees in order, checking the bound and deadline per block.
+
+        Returns (class-0 sum, class-1 sum, trees, stopped, (clamp_lo, clamp_hi) or None). Adding leaf values
+        one tree at a time in float64 gives the same sums as predict_proba's reduction over the tree axis.
+        """
+        feature, threshold, children, nan_left, v0, v1, roots, lo_rem, hi_rem = self._scalar_tables()
+        total = self.n_estimators
+        half, eps = total / 2, 1e-9 * total
+        s0 = s1 = 0.0
+        for start in range(0, limit, anytime.block):
+            stop = min(start + anytime.block, limit)
+            for node in roots[start:stop]:
+                while True:
+                    v = x[feature[node]]
+                    nxt = children[2 * node + (not v <= threshold[node] if v == v else not nan_left[node])]
+                    if nxt == node:
+                        break
+                    node = nxt
+                s0 += v0[node]
+                s1 += v1[node]
+            if stop == total:
+                break
+            if anytime.bound:
+                low, high = s1 + lo_rem[stop], s1 + hi_rem[stop]
+                if low > half + eps or high < half - eps:
+                    return s0, s1, stop, 'bound', (low / total, high / total)
+            if stop < limit and anytime.deadline_ns is not None and perf_counter_ns() >= anytime.deadline_ns:
+                return s0, s1, stop, 'deadline', None
+        return s0, s1, limit, 'max_trees' if limit < total else None, None
+
+    def predict_proba_anytime(self, X, anytime):
+        """predict_proba evaluating trees block by block and retiring rows early (see Anytime).
+
+        Rows that run through every tree get exactly predict_proba's result; the others get the mean
+        vote of the trees evaluated so far, clamped into the label-preserving bound when that stopped them.
+        Up to ANYTIME_SCALAR_ROWS rows are walked through the trees one at a time in Python, so a single
+        request stops as early as a batch would; larger inputs take one NumPy pass per block.
+        """
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected (n, {self.n_features_in_}) input, got {X.shape}")
+        n, total = len(X), self.n_estimators
+        limit = total if anytime.max_trees is None else min(max(int(anytime.max_trees), 1), total)
+        trees = np.full(n, limit, dtype=np.intp)
+        stopped = np.full(n, 'max_trees' if limit < total else None, dtype=object)
+        bounded = np.zeros(n, dtype=bool)
+        clamp_lo, clamp_hi = np.zeros(n), np.ones(n)
+        sums = np.zeros((n, 2))
+        if n <= ANYTIME_SCALAR_ROWS:
+            for i, x in enumerate(X.tolist()):
+                s0, s1, trees[i], stopped[i], clamp = self._walk_anytime(x, anytime, limit)
+                sums[i] = s0, s1
+                if clamp is not None:
+                    bounded[i] = True
+                    clamp_lo[i], clamp_hi[i] = clamp
+        else:
+            lo_rem, hi_rem = self.remaining_bounds()
+            half, eps = total / 2, 1e-9 * total  # eps keeps float rounding from deciding a tie
+            active = np.arange(n)
+            for start in range(0, limit, anytime.block):
+                stop = min(start + anytime.block, limit)
+                rows = X if len(active) == n else X[active]
+                leaves = self.apply(rows, self.roots[start:stop])
+                # Sequential accumulation in estimator order, as predict_proba does
+                sums[active] = np.add.reduce(np.concatenate([sums[active][None], np.take(self.value, leaves, axis=0)]),
+                                             axis=0)
+                if stop == total:
+                    break
+                done = np.zeros(len(active), dtype=bool)
+                if anytime.bound:
+                    s1 = sums[active, 1]
+                    low, high = s1 + lo_rem[stop], s1 + hi_rem[stop]
+                    done = (low > half + eps) | (high < half - eps)
+                    stopped[active[done]], bounded[active[done]] = 'bound', True
+                    clamp_lo[active[done]], clamp_hi[active[done]] = low[done] / total, high[done] / total
+                if stop < limit and anytime.deadline_ns is not None and perf_counter_ns() >= anytime.deadline_ns:
+                    stopped[active[~done]] = 'deadline'
+                    done[:] = True
+                trees[active[done]] = stop
+                active = active[~done]
+                if not len(active):
+                    break
+        proba = sums / trees[:, None]
+        if bounded.any():
+            p1 = np.clip(proba[bounded, 1], clamp_lo[bounded], clamp_hi[bounded])
+            proba[bounded, 1], proba[bounded, 0] = p1, 1 - p1
+        anytime.trees, anytime.stopped = trees, stopped
+        return proba
+
+def compile_forest(model, probe=None):
+    """Compile model and confirm it reproduces sklearn on probe rows; None if unsupported"""
+    try:
+        compiled = CompiledForest.from_sklearn(model)
+    except (ValueError, AttributeError) as e:
+        logger.info(f"Forest compilation skipped: {e}")
+        return None
+    if probe is None:
+        probe = np.random.default_rng(0).normal(size=(256, compiled.n_features_in_)) * 3
+    if not np.array_equal(compiled.predict_proba(probe), model.predict_proba(probe)):
+        logger.warning("Compiled forest disagrees with sklearn; using sklearn inference")
+        return None
+    return compiled
+
+def boundary_probe(forest, scaler, n_random=512, max_splits=2048, seed=0):
+    """Raw rows around folded splits (threshold and its float64 neighbours) plus random rows"""
+    rng = np.random.default_rng(seed)
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    mean = np.zeros(forest.n_features_in_) if mean is None else mean
+    scale = np.ones(forest.n_features_in_) if scale is None else scale
+    rows = [mean + rng.normal(size=(n_random, forest.n_features_in_)) * scale * 3]
+    internal = forest.left != np.arange(len(forest.left))
+    thr, feat = forest.threshold[internal], forest.feature[internal]
+    finite = np.isfinite(thr)
+    thr, feat = thr[finite], feat[finite]
+    if len(thr) > max_splits:
+        pick = rng.choice(len(thr), max_splits, replace=False)
+        thr, feat = thr[pick], feat[pick]
+    for edge in (thr, np.nextafter(thr, -np.inf), np.nextafter(thr, np.inf)):
+        block = np.repeat(mean[None, :], len(edge), axis=0)
+        block[np.arange(len(edge)), feat] = edge
+        rows.append(block)
+    return np.vstack(rows)
+
+def fold_scaler(compiled, scaler):
+    """Scaler-folded copy of compiled, verified bit-for-bit against the scaled path; None on failure"""
+    try:
+        folded = compiled.fold_scaler(scaler)
+    except (ValueError, AttributeError) as e:
+        logger.info(f"Scaler folding skipped: {e}")
+        return None
+    probe = boundary_probe(folded, scaler)
+    if not np.array_equal(folded.predict_proba(probe), compiled.predict_proba(scaler.transform(probe))):
+        logger.warning("Folded forest disagrees with scaled path; keeping scaler.transform")
+        return None
+    return folded
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def export_artifact(model, scaler, directory, source_path=None, fold=True, scaler_path=None):
+    """Compile (and optionally scaler-fold) model and save it; returns the exported forest or None"""
+    forest = compile_forest(model)
+    if forest is None:
+        return None
+    if fold:
+        forest = fold_scaler(forest, scaler) or forest
+    meta = {'source_sha256': file_digest(source_path)} if source_path else {}
+    if forest.scaler_folded and scaler_path:
+        meta['scaler_sha256'] = file_digest(scaler_path)
+    forest.save(directory, **meta)
+    return forest
+
+def load_artifact(directory, source_path=None, scaler_path=None):
+    """Memory-mapped compiled forest from directory, or None if absent, unreadable or stale.
+
+    When source_path (and, for a scaler-folded export, scaler_path) is given the artifact is only
+    used if it was exported from those exact files, so a retrained pickle is never shadowed by an
+    old export.
+    """
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        return None
+    try:
+        forest = CompiledForest.load(directory)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring compiled model at {directory}: {e}")
+        return None
+    checks = [(source_path, forest.meta.get('source_sha256'))]
+    if forest.scaler_folded:
+        checks.append((scaler_path, forest.meta.get('scaler_sha256')))
+    for path, expected in checks:
+        if path and expected and os.path.exists(path) and file_digest(path) != expected:
+            logger.warning(f"Compiled model at {directory} is stale for {path}; ignoring it")
+            return None
+    return forest
@@ -0,0 +1,47 @@
+"""Pre-fork multi-worker serving: the model is loaded (memory-mapped) once in the master before
+workers fork, so each worker starts scoring immediately and shares the model pages.
+
+Run from backend/:
+    gunicorn -c gunicorn.conf.py asgi:app                      # uvicorn workers (ASGI)
+    FRAUDCHECK_WORKER_CLASS=gthread gunicorn -c gunicorn.conf.py app:app   # threaded WSGI
+"""
+import os
+import tempfile
+import time
+
+bind = os.environ.get('FRAUDCHECK_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('FRAUDCHECK_WORKERS', os.cpu_count() or 1))
+worker_class = os.environ.get('FRAUDCHECK_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+threads = int(os.environ.get('FRAUDCHECK_THREADS', 4))
+preload_app = True
+
+# Workers aggregate /api/statistics through one SQLite file; per master unless set explicitly
+_own_stats_db = 'FRAUDCHECK_STATS_DB' not in os.environ
+if _own_stats_db:
+    os.environ['FRAUDCHECK_STATS_DB'] = os.path.join(tempfile.gettempdir(), f'fraudcheck-stats-{os.getpid()}.sqlite3')
+
+def when_ready(server):
+    # Runs in the master after the app module is preloaded and before any worker forks
+    import app
+    t0 = time.perf_counter()
+    # No watcher here: it would swap bundles in a process that serves nothing; each worker runs its own.
+    # A trainer (FRAUDCHECK_TRAINER=1) does start here, once for all workers.
+    app.load_model(watch=False)
+    server.log.info(f"Model loaded in master in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+def on_exit(server):
+    if _own_stats_db:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(os.environ['FRAUDCHECK_STATS_DB'] + suffix)
+            except OSError:
+                pass
+
+def pre_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+
+def post_worker_init(worker):
+    import app
+    if app.MODEL_WATCH_S > 0:
+        app.start_watcher()
+    worker.log.info(f"Worker {worker.pid} ready {(time.perf_counter() - worker.forked_at) * 1000:.1f} ms after fork")
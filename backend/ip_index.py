@@ -0,0 +1,208 @@
+"""IP reputation: a compiled, memory-mapped range index mapping IPv4/IPv6 addresses to a 0-10 risk score.
+
+A reputation CSV (network or start/end range, risk) is compiled by models/build_ip_index.py into one file of
+sorted, non-overlapping ranges: where source ranges overlap the narrowest one wins (as with longest-prefix
+match), and adjacent ranges with the same risk are merged. IPv4 keys are uint32 and IPv6 keys are split into
+uint64 high/low halves; IPv4-mapped IPv6 addresses (::ffff:a.b.c.d) are looked up as IPv4. A directory over
+the top 16 bits of each family narrows the binary search to the few ranges sharing the address's prefix.
+
+The file is mapped read-only, so every worker process shares the same page-cache pages, and a lookup is
+bisect over memoryviews of the mapping (no NumPy call per address). Addresses outside every range get the
+file's default risk. A rebuilt file replaces the old one with an atomic rename; IpRiskIndex objects keep
+the mapping they opened, so an index can be swapped in while requests still use the previous one.
+"""
+import csv
+import hashlib
+import heapq
+import ipaddress
+import json
+import os
+import socket
+import struct
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+import numpy as np
+
+MAGIC = b'FCIPRSK1'
+_ALIGN = 64
+_DIR_BITS = 16
+_MASK64 = 2**64 - 1
+DEFAULT_RISK = 2.0  # the ip_risk features.py assumes when a payload has none
+_pton, _AF_INET, _AF_INET6, _from_bytes = socket.inet_pton, socket.AF_INET, socket.AF_INET6, int.from_bytes
+_halves = struct.Struct('>QQ').unpack  # IPv6 bytes -> (high, low) uint64 keys, no 128-bit int
+
+def _range(fields):
+    """(version, first, last) of a CSV network: a CIDR / single address, or a start and end address"""
+    if len(fields) == 1:
+        net = ipaddress.ip_network(fields[0].strip(), strict=False)
+        first, last = int(net.network_address), int(net.broadcast_address)
+        version = net.version
+    else:
+        start, end = (ipaddress.ip_address(f.strip()) for f in fields)
+        if start.version != end.version or end < start:
+            raise ValueError(f"invalid range {fields[0]} - {fields[1]}")
+        first, last, version = int(start), int(end), start.version
+    if version == 6 and first >> 32 == 0xffff and last >> 32 == 0xffff:
+        return 4, first & 0xffffffff, last & 0xffffffff
+    return version, first, last
+
+def read_csv(path):
+    """{4: [(first, last, risk)], 6: [...]} from rows of "network,risk" or "start,end,risk"; a header row
+    and lines starting with # are skipped"""
+    ranges = {4: [], 6: []}
+    with open(path, newline='') as f:
+        for line_no, fields in enumerate(csv.reader(f), 1):
+            if not fields or not fields[0].strip() or fields[0].lstrip().startswith('#'):
+                continue
+            try:
+                risk = float(fields[-1])
+            except ValueError:
+                if line_no == 1:
+                    continue  # header
+                raise ValueError(f"{path}:{line_no}: risk {fields[-1]!r} is not a number") from None
+            if not 0 <= risk <= 10:
+                raise ValueError(f"{path}:{line_no}: risk {risk} is outside 0-10")
+            try:
+                version, first, last = _range(fields[:-1])
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_no}: {e}") from None
+            ranges[version].append((first, last, risk))
+    return ranges
+
+def flatten(ranges):
+    """Sorted, non-overlapping [(first, last, risk)] from possibly overlapping ranges: each address takes the
+    risk of the narrowest range containing it (the later row on ties); equal neighbours are merged"""
+    order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+    points = sorted({r[0] for r in ranges} | {r[1] + 1 for r in ranges})
+    out, active, k = [], [], 0
+    for seg_start, seg_next in zip(points, points[1:]):
+        while k < len(order) and ranges[order[k]][0] == seg_start:
+            first, last, risk = ranges[order[k]]
+            heapq.heappush(active, (last - first, -order[k], last, risk))
+            k += 1
+        while active and active[0][2] < seg_start:
+            heapq.heappop(active)
+        if not active:
+            continue
+        risk = active[0][3]
+        if out and out[-1][1] == seg_start - 1 and out[-1][2] == risk:
+            out[-1] = (out[-1][0], seg_next - 1, risk)
+        else:
+            out.append((seg_start, seg_next - 1, risk))
+    return out
+
+def _directory(top):
+    """Index of the first range per 16-bit prefix (plus a final end marker), from each range's prefix"""
+    return np.searchsorted(top.astype(np.int64), np.arange(2**_DIR_BITS + 1), side='left').astype(np.uint32)
+
+def compile_arrays(ranges):
+    """Flattened {4: [...], 6: [...]} ranges -> the named arrays of an index file"""
+    v4 = np.array([(a, b) for a, b, _ in ranges[4]], dtype=np.uint32).reshape(-1, 2)
+    v6 = ranges[6]
+    start6 = np.array([(a >> 64, a & _MASK64) for a, _, _ in v6], dtype=np.uint64).reshape(-1, 2)
+    end6 = np.array([(b >> 64, b & _MASK64) for _, b, _ in v6], dtype=np.uint64).reshape(-1, 2)
+    return {
+        'v4_start': v4[:, 0].copy(), 'v4_end': v4[:, 1].copy(),
+        'v4_risk': np.array([r for _, _, r in ranges[4]], dtype=np.float64),
+        'v4_dir': _directory(v4[:, 0] >> (32 - _DIR_BITS)),
+        'v6_start_hi': start6[:, 0].copy(), 'v6_start_lo': start6[:, 1].copy(),
+        'v6_end_hi': end6[:, 0].copy(), 'v6_end_lo': end6[:, 1].copy(),
+        'v6_risk': np.array([r for _, _, r in v6], dtype=np.float64),
+        'v6_dir': _directory(start6[:, 0] >> np.uint64(64 - _DIR_BITS)),
+    }
+
+def _data_start(header_len):
+    return -(-(len(MAGIC) + 4 + header_len) // _ALIGN) * _ALIGN
+
+def write_index(path, ranges, default_risk=DEFAULT_RISK, source=None):
+    """Flatten {4: [...], 6: [...]} ranges and write them to path via a temp file and rename; returns the
+    header (range counts, default risk, digest)"""
+    flat = {version: flatten(ranges[version]) for version in (4, 6)}
+    arrays = compile_arrays(flat)
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        layout[name] = [offset, arr.dtype.str, len(arr)]
+        offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+    digest = hashlib.sha256()
+    for arr in arrays.values():
+        digest.update(arr.tobytes())
+    header = {'format': 1, 'default_risk': float(default_risk), 'source': source,
+              'ranges_v4': len(flat[4]), 'ranges_v6': len(flat[6]), 'sha256': digest.hexdigest()[:16],
+              'built_at': datetime.now().isoformat(timespec='seconds'), 'arrays': layout}
+    blob = json.dumps(header).encode()
+    data_start = _data_start(len(blob))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(blob)) + blob)
+        for name, arr in arrays.items():
+            f.seek(data_start + layout[name][0])
+            f.write(arr.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+    return header
+
+class IpRiskIndex:
+    """Read-only view of an index file; lookup(address) -> risk 0-10"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            head = f.read(len(MAGIC) + 4)
+            if len(head) < len(MAGIC) + 4 or head[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not an IP risk index")
+            blob_len = struct.unpack('<I', head[len(MAGIC):])[0]
+            header = json.loads(f.read(blob_len))
+        data_start = _data_start(blob_len)
+        self.path, self.header = path, header
+        self.default_risk = header['default_risk']
+        mm = np.memmap(path, dtype=np.uint8, mode='r')
+        arrays = {}
+        for name, (offset, dtype, n) in header['arrays'].items():
+            start = data_start + offset
+            arrays[name] = mm[start:start + n * np.dtype(dtype).itemsize].view(dtype)
+        self.arrays = arrays
+        # bisect over memoryviews reads Python ints straight from the mapping
+        mv = {name: memoryview(arr) for name, arr in arrays.items()}
+        self._v4 = (mv['v4_start'], mv['v4_end'], mv['v4_risk'], mv['v4_dir'])
+        self._v6 = (mv['v6_start_hi'], mv['v6_start_lo'], mv['v6_end_hi'], mv['v6_end_lo'], mv['v6_risk'],
+                    mv['v6_dir'])
+        self._v4_shift, self._v6_shift = 32 - _DIR_BITS, 64 - _DIR_BITS
+
+    def __len__(self):
+        return self.header['ranges_v4'] + self.header['ranges_v6']
+
+    def lookup(self, address):
+        """Risk (0-10) of an IPv4/IPv6 address string; ValueError if it is not an address"""
+        try:
+            v6 = ':' in address
+            if v6:
+                hi, lo = _halves(_pton(_AF_INET6, address))
+                v6 = hi or lo >> 32 != 0xffff
+                n = lo & 0xffffffff  # used when IPv4-mapped
+            else:
+                n = _from_bytes(_pton(_AF_INET, address), 'big')
+        except (OSError, TypeError):
+            raise ValueError(f"invalid IP address {address!r}") from None
+        if v6:
+            start_hi, start_lo, end_hi, end_lo, risk, directory = self._v6
+            if not risk:
+                return self.default_risk
+            p = hi >> self._v6_shift
+            # Last range starting at or before the high half. Only when it shares the high half and starts
+            # after the address do the low halves of the ranges starting in that /64 need a second search
+            i = bisect_right(start_hi, hi, directory[p], directory[p + 1]) - 1
+            if i >= 0 and start_hi[i] == hi and start_lo[i] > lo:
+                i = bisect_right(start_lo, lo, bisect_left(start_hi, hi, directory[p], i), i) - 1
+            if i >= 0:
+                e = end_hi[i]
+                if e > hi or e == hi and end_lo[i] >= lo:
+                    return risk[i]
+            return self.default_risk
+        start, end, risk, directory = self._v4
+        if not risk:
+            return self.default_risk
+        p = n >> self._v4_shift
+        i = bisect_right(start, n, directory[p], directory[p + 1]) - 1
+        return risk[i] if i >= 0 and n <= end[i] else self.default_risk
+
+    def info(self):
+        return {'path': self.path, **{k: v for k, v in self.header.items() if k != 'arrays'}}
@@ -0,0 +1,199 @@
+"""Low-overhead, thread-safe metrics: per-thread sharded counters and fixed-bucket latency histograms.
+
+Each thread writes only to its own shard, so the hot path takes no lock; readers sum the shards.
+Shards of threads that have exited are folded into a retired shard, which keeps memory flat under
+thread-per-request servers.
+"""
+import math
+from math import frexp
+import threading
+import weakref
+
+class _Shards:
+    def __init__(self, factory, merge):
+        self._factory = factory
+        self._merge = merge
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live = []  # (weakref to owning thread, shard)
+        self._retired = factory()
+
+    def mine(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._factory()
+            with self._lock:
+                # Dead threads never write again, so their shards can be folded safely
+                alive = []
+                for ref, s in self._live:
+                    t = ref()
+                    if t is None or not t.is_alive():
+                        self._merge(self._retired, s)
+                    else:
+                        alive.append((ref, s))
+                alive.append((weakref.ref(threading.current_thread()), shard))
+                self._live = alive
+            self._local.shard = shard
+            return shard
+
+    def all(self):
+        with self._lock:
+            return [self._retired] + [s for _, s in self._live]
+
+def _merge_dicts(into, other):
+    for k, v in list(other.items()):
+        into[k] = into.get(k, 0) + v
+
+class ShardedCounter:
+    """Named counters; add() touches only the calling thread's dict"""
+
+    def __init__(self):
+        self._shards = _Shards(dict, _merge_dicts)
+        self._baseline = {}
+
+    def add(self, key, value=1):
+        shard = self._shards.mine()
+        shard[key] = shard.get(key, 0) + value
+
+    def snapshot(self):
+        total = {}
+        for shard in self._shards.all():
+            _merge_dicts(total, shard)
+        base = self._baseline
+        return {k: v - base.get(k, 0) for k, v in total.items()}
+
+    def __getitem__(self, key):
+        return self.snapshot().get(key, 0)
+
+    def clear(self):
+        """Reset to zero without touching other threads' shards (records a baseline instead)"""
+        total = {}
+        for shard in self._shards.all():
+            _merge_dicts(total, shard)
+        self._baseline = total
+
+# HDR-style buckets: each power of two from 1 us is split into 16 linear sub-buckets (<= 3.2% relative error)
+_SUB = 16
+_OCTAVES = 36  # 1 us .. ~19 hours
+_N = _SUB * _OCTAVES + 1
+_COUNT, _SUM, _MAX, _GEN = _N, _N + 1, _N + 2, _N + 3
+
+def _new_hist():
+    return [0] * _N + [0, 0.0, 0.0, 0]
+
+def _merge_hist(into, other):
+    snap = list(other)
+    for i in range(_N + 2):
+        into[i] += snap[i]
+    # max only counts for the newest reset generation
+    if snap[_GEN] > into[_GEN]:
+        into[_MAX], into[_GEN] = snap[_MAX], snap[_GEN]
+    elif snap[_GEN] == into[_GEN]:
+        into[_MAX] = max(into[_MAX], snap[_MAX])
+
+class LatencyHistogram:
+    """HDR-style fixed-bucket histogram of millisecond latencies"""
+
+    def __init__(self):
+        self._shards = _Shards(_new_hist, _merge_hist)
+        self._baseline = _new_hist()
+        self._gen = 0
+
+    def record(self, ms):
+        m, e = frexp(ms * 1000.0)  # us = m * 2**e, 0.5 <= m < 1
+        idx = 0 if e < 1 else min((e - 1) * _SUB + int(m * 2 * _SUB) - _SUB + 1, _N - 1)
+        shard = self._shards.mine()
+        shard[idx] += 1
+        shard[_COUNT] += 1
+        shard[_SUM] += ms
+        if shard[_GEN] != self._gen:
+            shard[_MAX], shard[_GEN] = 0.0, self._gen
+        if ms > shard[_MAX]:
+            shard[_MAX] = ms
+
+    def _total(self):
+        total = _new_hist()
+        for shard in self._shards.all():
+            _merge_hist(total, shard)
+        return total
+
+    def _merged(self):
+        h = self._total()
+        base = self._baseline
+        for i in range(_N + 2):
+            h[i] -= base[i]
+        if h[_GEN] != self._gen:
+            h[_MAX] = 0.0
+        return h
+
+    @staticmethod
+    def _bucket_ms(idx):
+        if idx == 0:
+            return 0.0005
+        e, j = divmod(idx - 1, _SUB)
+        return 2 ** e * (1 + (j + 0.5) / _SUB) / 1000.0
+
+    def summary(self, quantiles=(0.5, 0.95, 0.99)):
+        h = self._merged()
+        count = h[_COUNT]
+        out = {'count': count, 'mean': round(h[_SUM] / count, 3) if count else 0.0,
+               'max': round(h[_MAX], 3) if count else 0.0}
+        for q in quantiles:
+            out[f'p{q * 100:g}'.replace('.', '')] = round(self._quantile(h, q), 3) if count else 0.0
+        return out
+
+    def _quantile(self, h, q):
+        target = max(1, math.ceil(q * h[_COUNT]))
+        seen = 0
+        for idx in range(_N):
+            seen += h[idx]
+            if seen >= target:
+                return min(self._bucket_ms(idx), h[_MAX]) if h[_MAX] else self._bucket_ms(idx)
+        return h[_MAX]
+
+    def clear(self):
+        """Reset counts (baseline) and start a new max generation"""
+        self._gen += 1
+        self._baseline = self._total()
+
+    def distribution(self):
+        """([(bucket value ms, count)] for non-empty buckets in order, count, sum ms)"""
+        h = self._merged()
+        return [(self._bucket_ms(i), h[i]) for i in range(_N) if h[i]], h[_COUNT], h[_SUM]
+
+# Prometheus text exposition (format 0.0.4)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PROMETHEUS_BUCKETS_S = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                        0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _label_value(v):
+    # Exposition format escapes: label values may come from user-supplied tables (rule codes)
+    return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_label_value(v)}"' for k, v in labels.items()) + '}'
+
+def prometheus_metric(name, kind, help_text, samples):
+    """Lines for a counter/gauge; samples is [(labels dict, value)]"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    lines += [f'{name}{_labels(labels)} {value}' for labels, value in samples]
+    return lines
+
+def prometheus_histogram(name, help_text, label, hists):
+    """Lines for {label value: LatencyHistogram} as a seconds histogram"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for value, hist in hists.items():
+        buckets, count, total_ms = hist.distribution()
+        cum, i = 0, 0
+        for le in PROMETHEUS_BUCKETS_S:
+            while i < len(buckets) and buckets[i][0] / 1000.0 <= le:
+                cum += buckets[i][1]
+                i += 1
+            lines.append(f'{name}_bucket{_labels({label: value, "le": le})} {cum}')
+        lines.append(f'{name}_bucket{_labels({label: value, "le": "+Inf"})} {count}')
+        lines.append(f'{name}_sum{_labels({label: value})} {total_ms / 1000.0}')
+        lines.append(f'{name}_count{_labels({label: value})} {count}')
+    return lines
@@ -0,0 +1,101 @@
+"""Opt-in sampling profiler for the request hot path, switched on at runtime for a fixed number of requests.
+
+While active, a sampler thread reads the stacks of threads currently inside a profiled request every
+interval_ms (sys._current_frames, so it works for the threaded and ASGI servers alike) and counts them
+as collapsed stacks. After the last request the counts are written in the folded format used by
+flamegraph.pl / speedscope:  frame;frame;frame <count>
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+class SamplingProfiler:
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.active = False
+        self._lock = threading.Lock()
+        self._threads = {}  # thread id -> nesting depth
+        self._status = {'last_output': None}
+        self._thread = None
+
+    def start(self, requests, interval_ms=1.0):
+        """Profile the next `requests` requests; False when a run is already in progress"""
+        with self._lock:
+            if self.active or (self._thread is not None and self._thread.is_alive()):
+                return False
+            self._remaining = requests
+            self._interval = interval_ms / 1000.0
+            self._stacks = Counter()
+            self._samples = 0
+            self._started = time.time()
+            self._status.update(requests=requests, interval_ms=interval_ms)
+            self.active = True
+            self._thread = threading.Thread(target=self._sample_loop, name='sampling-profiler', daemon=True)
+            self._thread.start()
+        logger.info(f"Sampling profiler on for {requests} requests every {interval_ms} ms")
+        return True
+
+    def run(self, fn, *args):
+        """Call fn(*args) with the calling thread sampled; counts as one profiled request"""
+        tid = threading.get_ident()
+        with self._lock:
+            if not self.active or self._remaining <= 0:
+                admitted = False
+            else:
+                admitted = True
+                self._remaining -= 1
+                self._threads[tid] = self._threads.get(tid, 0) + 1
+        if not admitted:
+            return fn(*args)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                depth = self._threads.pop(tid) - 1
+                if depth:
+                    self._threads[tid] = depth
+                if self._remaining <= 0 and not self._threads:
+                    self.active = False  # the sampler thread writes the profile and exits
+
+    def _sample_loop(self):
+        code = SamplingProfiler.run.__code__
+        while self.active:
+            time.sleep(self._interval)
+            with self._lock:
+                tids = list(self._threads)
+            if not tids:
+                continue
+            frames = sys._current_frames()
+            for tid in tids:
+                frame = frames.get(tid)
+                stack = []
+                while frame is not None and frame.f_code is not code:
+                    co = frame.f_code
+                    stack.append(f"{co.co_name} ({os.path.basename(co.co_filename)}:{co.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self._stacks[';'.join(reversed(stack))] += 1
+                    self._samples += 1
+        self._write()
+
+    def _write(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.folded")
+        with open(path, 'w') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self._status.update(last_output=path, samples=self._samples,
+                            duration_s=round(time.time() - self._started, 3))
+        logger.info(f"Sampling profile written to {path} ({self._samples} samples)")
+
+    def status(self):
+        with self._lock:
+            st = dict(self._status, active=self.active)
+            if self.active:
+                st['remaining'] = self._remaining
+        return st
@@ -0,0 +1,153 @@
+"""Versioned model registry and the loaded-model bundle the server swaps atomically on reload.
+
+Layout under the model directory:
+
+    registry/<version>/fraud_detection_model.pkl, scaler.pkl, compiled/, version.json
+    registry/CURRENT           name of the active version, replaced atomically
+
+Every serving process watches CURRENT, so writing it (publish(), set_current() or the admin
+reload endpoint) moves all workers to the same version. Without a registry the flat models/
+layout is served as a single version named after the model file's digest.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from forest import file_digest, export_artifact
+
+REGISTRY = 'registry'
+CURRENT = 'CURRENT'
+MODEL_FILE = 'fraud_detection_model.pkl'
+SCALER_FILE = 'scaler.pkl'
+COMPILED_DIR = 'compiled'
+
+class ModelBundle:
+    """One loaded model version. Never mutated after it is published to requests, so a request that
+    holds a bundle sees a consistent (model, scaler, version) even while a reload swaps in another."""
+
+    def __init__(self, version, model, scaler, compiled, directory):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.compiled = compiled
+        self.directory = directory
+        self.cascade = None  # CascadeBand when cascade scoring is on and calibrated for this version
+        self.generation = 0
+        self.loaded_at = datetime.now().isoformat()
+        self.load_ms = self.warmup_ms = 0.0
+        self._in_flight = 0
+        self._idle = threading.Condition()
+
+    @property
+    def cache_tag(self):
+        return f"{self.version}#{self.generation}"
+
+    def enter(self):
+        with self._idle:
+            self._in_flight += 1
+
+    def exit(self):
+        with self._idle:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.notify_all()
+
+    def in_flight(self):
+        return self._in_flight
+
+    def drain(self, timeout):
+        """Wait until no request is running on this bundle; False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._in_flight, timeout)
+
+    def info(self):
+        return {'version': self.version, 'generation': self.generation, 'loaded_at': self.loaded_at,
+                'directory': self.directory, 'load_ms': self.load_ms, 'warmup_ms': self.warmup_ms,
+                'compiled': self.compiled is not None,
+                'scaler_folded': bool(self.compiled is not None and self.compiled.scaler_folded),
+                'cascade_band': self.cascade.to_dict() if self.cascade is not None else None}
+
+def registry_dir(model_dir):
+    return os.path.join(model_dir, REGISTRY)
+
+def current_version(model_dir):
+    try:
+        with open(os.path.join(registry_dir(model_dir), CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def list_versions(model_dir):
+    root = registry_dir(model_dir)
+    if not os.path.isdir(root):
+        return []
+    return sorted(v for v in os.listdir(root) if os.path.isfile(os.path.join(root, v, MODEL_FILE)))
+
+def resolve(model_dir, version=None):
+    """(version, directory) to load: an explicit registry version, else CURRENT, else the flat layout"""
+    version = version or current_version(model_dir)
+    if version is not None:
+        directory = os.path.join(registry_dir(model_dir), version)
+        if not os.path.isfile(os.path.join(directory, MODEL_FILE)):
+            raise FileNotFoundError(f"Model version {version!r} not found in {registry_dir(model_dir)}")
+        return version, directory
+    model_path = os.path.join(model_dir, MODEL_FILE)
+    if not os.path.exists(model_path):
+        return None, model_dir
+    return f"sha-{file_digest(model_path)[:12]}", model_dir
+
+def set_current(model_dir, version):
+    """Point CURRENT at an existing version (atomic: readers see the old or the new name, never a mix)"""
+    if version not in list_versions(model_dir):
+        raise FileNotFoundError(f"Model version {version!r} not found in {registry_dir(model_dir)}")
+    path = os.path.join(registry_dir(model_dir), CURRENT)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp, path)
+
+def watch_token(model_dir):
+    """Cheap fingerprint of what resolve() would load; changes when CURRENT or the flat files change"""
+    version = current_version(model_dir)
+    if version is not None:
+        return ('registry', version)
+    stamps = []
+    for name in (MODEL_FILE, SCALER_FILE, os.path.join(COMPILED_DIR, 'meta.json')):
+        try:
+            st = os.stat(os.path.join(model_dir, name))
+            stamps.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamps.append(None)
+    return ('flat', tuple(stamps))
+
+def publish(model_path, scaler_path, model_dir, version=None, activate=True, fold=True, info=None):
+    """Copy a trained model + scaler into the registry as a new version with its compiled export.
+
+    The version directory is assembled under a temporary name and renamed into place, so a watcher
+    never sees a half-written version; with activate, CURRENT is switched to it afterwards.
+    """
+    import joblib
+    version = version or f"{time.strftime('%Y%m%d-%H%M%S')}-{file_digest(model_path)[:8]}"
+    root = registry_dir(model_dir)
+    final = os.path.join(root, version)
+    if os.path.exists(final):
+        raise FileExistsError(f"Model version {version!r} already exists")
+    tmp = os.path.join(root, f".{version}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    shutil.copyfile(model_path, os.path.join(tmp, MODEL_FILE))
+    shutil.copyfile(scaler_path, os.path.join(tmp, SCALER_FILE))
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    forest = export_artifact(model, scaler, os.path.join(tmp, COMPILED_DIR), os.path.join(tmp, MODEL_FILE),
+                             fold=fold, scaler_path=os.path.join(tmp, SCALER_FILE))
+    with open(os.path.join(tmp, 'version.json'), 'w') as f:
+        json.dump({'version': version, 'created_at': datetime.now().isoformat(),
+                   'model_sha256': file_digest(model_path), 'compiled': forest is not None,
+                   **(info or {})}, f, indent=2)
+    os.rename(tmp, final)
+    if activate:
+        set_current(model_dir, version)
+    return version
@@ -0,0 +1,125 @@
+"""Declarative fraud-reason rules, compiled into vectorized masks over the engineered feature matrix.
+
+A rule table is a JSON list of {"code", "reason", "when": [[feature, op, value], ...]}: a row matches a
+rule when all of its conditions hold, features are named as in features.FEATURE_NAMES (or DERIVED_FEATURES)
+and op is one of > >= < <= == !=. Rules read the same 13 features the model scores, so reasons never disagree
+with preprocess. The built-in table is DEFAULT_RULES; `python backend/rules.py > rules.json` writes it out
+as a starting point for FRAUDCHECK_RULES.
+"""
+import json
+import operator
+import numpy as np
+from features import FEATURE_NAMES, unboosted_deviation, unboosted_deviation_row
+
+# Columns computed from the 13 features for rules only, as (matrix, row) functions: the amount deviation
+# before the synergistic boost
+DERIVED_FEATURES = {'base_amount_deviation': (unboosted_deviation, unboosted_deviation_row)}
+RULE_FEATURES = FEATURE_NAMES + list(DERIVED_FEATURES)
+
+DEFAULT_RULES = [
+    {'code': 'HIGH_AMOUNT', 'reason': 'High transaction amount', 'when': [['high_amount_flag', '==', 1]]},
+    {'code': 'HIGH_RISK_COUNTRY', 'reason': 'High-risk country', 'when': [['location_risk', '>=', 0.8]]},
+    {'code': 'HIGH_RISK_PAYMENT', 'reason': 'High-risk payment method', 'when': [['payment_method_risk', '>=', 0.25]]},
+    {'code': 'NEW_ACCOUNT', 'reason': 'New account', 'when': [['account_age_risk', '==', 1]]},
+    {'code': 'HIGH_FREQUENCY', 'reason': 'High transaction frequency', 'when': [['frequency', '==', 1]]},
+    {'code': 'HIGH_IP_RISK', 'reason': 'High IP risk score', 'when': [['ip_risk', '>=', 0.7]]},
+    {'code': 'HIGH_RISK_MERCHANT', 'reason': 'High-risk merchant category', 'when': [['merchant_risk', '>=', 0.7]]},
+    {'code': 'EXTREME_DEVIATION', 'reason': 'Extreme deviation from average',
+     'when': [['base_amount_deviation', '>=', 5]]},
+    {'code': 'LARGE_DEVIATION', 'reason': 'Large deviation from average',
+     'when': [['base_amount_deviation', '>', 2], ['base_amount_deviation', '<', 5]]},
+    {'code': 'UNUSUAL_HOUR', 'reason': 'Unusual transaction time', 'when': [['unusual_hour_flag', '==', 1]]},
+]
+
+OPS = {'>': (np.greater, operator.gt), '>=': (np.greater_equal, operator.ge), '<': (np.less, operator.lt),
+       '<=': (np.less_equal, operator.le), '==': (np.equal, operator.eq), '!=': (np.not_equal, operator.ne)}
+_ROW_PATH_MAX_ROWS = 4
+
+class Rule:
+    def __init__(self, code, reason, when):
+        self.code, self.reason, self.when = code, reason, when
+
+class RuleSet:
+    """A rule table compiled once: every condition of every rule is evaluated in one pass per operator"""
+
+    def __init__(self, table, source='builtin'):
+        if not isinstance(table, list):
+            raise ValueError("Rule table must be a list of rules")
+        self.rules, self.source = [], source
+        cols, values, ops, starts = [], [], [], []
+        for i, spec in enumerate(table):
+            try:
+                code, reason, when = str(spec['code']), str(spec['reason']), spec['when']
+                if not isinstance(when, list) or not when:
+                    raise ValueError("'when' needs at least one [feature, op, value] condition")
+                starts.append(len(cols))
+                for feature, op, value in when:
+                    if feature not in RULE_FEATURES:
+                        raise ValueError(f"unknown feature {feature!r}")
+                    if op not in OPS:
+                        raise ValueError(f"unknown operator {op!r}")
+                    cols.append(RULE_FEATURES.index(feature))
+                    ops.append(op)
+                    values.append(float(value))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Rule {i} ({spec.get('code') if isinstance(spec, dict) else spec!r}): {e}") from None
+            if any(rule.code == code for rule in self.rules):
+                raise ValueError(f"Rule {i}: duplicate code {code!r}")
+            self.rules.append(Rule(code, reason, [list(c) for c in when]))
+        self.codes = [rule.code for rule in self.rules]
+        self._derived = any(c >= len(FEATURE_NAMES) for c in cols)
+        self._cols = np.array(cols, dtype=np.intp)
+        self._values = np.array(values)
+        self._starts = np.array(starts, dtype=np.intp)
+        self._by_op = [(OPS[op][0], np.array([k for k, o in enumerate(ops) if o == op], dtype=np.intp))
+                       for op in sorted(set(ops))]
+        # Scalar path: every (col, op, value) condition, then each rule's [start, end) slice of them
+        self._row_conds = [(c, OPS[op][1], v) for c, op, v in zip(cols, ops, values)]
+        self._spans = list(zip(starts, starts[1:] + [len(cols)]))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            table = json.load(f)
+        return cls(table.get('rules') if isinstance(table, dict) else table, source=path)
+
+    def to_list(self):
+        return [{'code': r.code, 'reason': r.reason, 'when': r.when} for r in self.rules]
+
+    def match(self, fv):
+        """N x rules boolean mask of the rules each row of the feature matrix matches"""
+        fv = np.atleast_2d(fv)
+        if not self.rules:
+            return np.zeros((len(fv), 0), dtype=bool)
+        if self._derived:
+            fv = np.column_stack([fv[:, :len(FEATURE_NAMES)]] + [f(fv) for f, _ in DERIVED_FEATURES.values()])
+        x = fv[:, self._cols]
+        cond = np.empty(x.shape, dtype=bool)
+        for ufunc, idx in self._by_op:
+            cond[:, idx] = ufunc(x[:, idx], self._values[idx])
+        return np.logical_and.reduceat(cond, self._starts, axis=1)
+
+    def evaluate(self, fv):
+        """([matched rule indices] per row, [hits] per rule) for the N x 13 feature matrix"""
+        fv = np.atleast_2d(fv)
+        if len(fv) <= _ROW_PATH_MAX_ROWS:
+            # Tiny batches: per-condition NumPy overhead outweighs the work
+            hits = [0] * len(self.rules)
+            matched = []
+            for row in fv.tolist():
+                if self._derived:
+                    row = row[:len(FEATURE_NAMES)] + [f(row) for _, f in DERIVED_FEATURES.values()]
+                ok = [op(row[c], v) for c, op, v in self._row_conds]
+                ix = [j for j, (start, end) in enumerate(self._spans) if False not in ok[start:end]]
+                for j in ix:
+                    hits[j] += 1
+                matched.append(ix)
+            return matched, hits
+        mask = self.match(fv)
+        matched = [[] for _ in range(len(fv))]
+        for row, j in zip(*(ix.tolist() for ix in np.nonzero(mask))):
+            matched[row].append(j)
+        return matched, mask.sum(axis=0).tolist()
+
+if __name__ == '__main__':
+    print(json.dumps(DEFAULT_RULES, indent=2))
@@ -0,0 +1,195 @@
+"""Transaction statistics in fixed-size rings of minute, hour and day buckets, shared across processes.
+
+Each process buffers counts in memory and a background thread flushes them in one SQLite (WAL)
+transaction every flush_interval seconds, so every gunicorn worker writes to the same file and
+readers see the aggregate. Memory and file size are constant: a bucket slot is reused once its
+ring wraps. Without a path the store is an in-memory database private to the process.
+
+A reset bumps a generation number in the database; buffered counts tagged with an older generation
+are dropped at flush, so a worker's pre-reset counts never reappear (counts it takes in the same
+flush interval as another worker's reset are dropped too).
+"""
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# Slots kept per resolution; day buckets follow the local calendar date
+MINUTE, HOUR, DAY = 'minute', 'hour', 'day'
+RINGS = {MINUTE: 120, HOUR: 48, DAY: 32}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    res TEXT NOT NULL, slot INTEGER NOT NULL, start INTEGER NOT NULL,
+    total INTEGER NOT NULL, fraud INTEGER NOT NULL, amount_blocked REAL NOT NULL,
+    PRIMARY KEY (res, slot));
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total INTEGER NOT NULL, fraud INTEGER NOT NULL, amount_blocked REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO totals VALUES (0, 0, 0, 0.0);
+INSERT OR IGNORE INTO meta VALUES ('generation', 0);
+"""
+
+# Add into the slot if it still holds the same bucket, otherwise recycle it; never overwrite a newer bucket
+_UPSERT = """
+INSERT INTO buckets VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (res, slot) DO UPDATE SET
+    total = CASE WHEN start = excluded.start THEN total + excluded.total ELSE excluded.total END,
+    fraud = CASE WHEN start = excluded.start THEN fraud + excluded.fraud ELSE excluded.fraud END,
+    amount_blocked = CASE WHEN start = excluded.start THEN amount_blocked + excluded.amount_blocked
+                          ELSE excluded.amount_blocked END,
+    start = excluded.start
+WHERE excluded.start >= start
+"""
+
+def bucket_start(res, minute):
+    """Bucket id containing epoch minute `minute`: epoch minute, epoch hour or local date ordinal"""
+    if res == MINUTE:
+        return minute
+    if res == HOUR:
+        return minute // 60
+    return date.fromtimestamp(minute * 60).toordinal()
+
+class StatsStore:
+    def __init__(self, path=None, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pid = None
+        self._init_lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):  # POSIX only; there is no fork to survive on Windows
+            os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.flush)
+
+    def _after_fork(self):
+        self._pid = None
+        self._init_lock = threading.Lock()
+
+    def _ensure_process(self):
+        # Connections, locks and the flusher thread must not be shared across fork
+        if self._pid == os.getpid():
+            return
+        with self._init_lock:
+            if self._pid == os.getpid():
+                return
+            self._lock = threading.Lock()
+            self._db_lock = threading.Lock()
+            self._pending = {}
+            self._db = sqlite3.connect(self.path or ':memory:', isolation_level=None, check_same_thread=False)
+            self._db.execute('PRAGMA busy_timeout = 5000')
+            if self.path:
+                self._db.execute('PRAGMA journal_mode = WAL')
+                self._db.execute('PRAGMA synchronous = NORMAL')
+            self._db.executescript(_SCHEMA)
+            self._gen = self._db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+            self._pid = os.getpid()  # published last: other threads skip init once they see it
+        threading.Thread(target=self._flush_loop, args=(self._pid,), name='stats-flusher', daemon=True).start()
+
+    def record(self, pred, amount=0.0):
+        """Count one scored transaction (hot path: one dict update under an uncontended lock)"""
+        if self._pid != os.getpid():
+            self._ensure_process()
+        key = (self._gen, int(time.time() // 60))
+        with self._lock:
+            acc = self._pending.get(key)
+            if acc is None:
+                acc = self._pending[key] = [0, 0, 0.0]
+            acc[0] += 1
+            if pred == 1:
+                acc[1] += 1
+                acc[2] += amount
+
+    def record_many(self, total, fraud=0, amount_blocked=0.0):
+        """Count total scored transactions at once, fraud of them flagged for amount_blocked in all"""
+        if self._pid != os.getpid():
+            self._ensure_process()
+        key = (self._gen, int(time.time() // 60))
+        with self._lock:
+            acc = self._pending.get(key)
+            if acc is None:
+                acc = self._pending[key] = [0, 0, 0.0]
+            acc[0] += total
+            acc[1] += fraud
+            acc[2] += amount_blocked
+
+    def _flush_loop(self, pid):
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error(f"Stats flush failed: {e}")
+
+    def flush(self):
+        """Write buffered counts in one transaction"""
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        with self._db_lock:
+            db = self._db
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                gen = db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+                rows, total = {}, [0, 0, 0.0]
+                for (key_gen, minute), (n, fraud, amount) in pending.items():
+                    if key_gen != gen:
+                        continue  # counted before a reset
+                    for i, v in enumerate((n, fraud, amount)):
+                        total[i] += v
+                    for res, slots in RINGS.items():
+                        start = bucket_start(res, minute)
+                        acc = rows.setdefault((res, start % slots, start), [0, 0, 0.0])
+                        for i, v in enumerate((n, fraud, amount)):
+                            acc[i] += v
+                if rows:
+                    db.executemany(_UPSERT, [(*k, *v) for k, v in rows.items()])
+                    db.execute('UPDATE totals SET total = total + ?, fraud = fraud + ?, '
+                               'amount_blocked = amount_blocked + ?', total)
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            self._gen = gen
+
+    def totals(self):
+        self._ensure_process()
+        self.flush()
+        with self._db_lock:
+            total, fraud, amount = self._db.execute('SELECT total, fraud, amount_blocked FROM totals').fetchone()
+        return {'total': total, 'fraud': fraud, 'amount_blocked': amount}
+
+    def series(self, res, n, now=None):
+        """[(bucket id, total, fraud)] for the last n buckets of a resolution, oldest first"""
+        if n > RINGS[res]:
+            raise ValueError(f"only {RINGS[res]} {res} buckets are kept")
+        self._ensure_process()
+        self.flush()
+        with self._db_lock:
+            rows = self._db.execute('SELECT slot, start, total, fraud FROM buckets WHERE res = ?', (res,)).fetchall()
+        by_slot = {slot: (start, total, fraud) for slot, start, total, fraud in rows}
+        last = bucket_start(res, int((time.time() if now is None else now) // 60))
+        out = []
+        for start in range(last - n + 1, last + 1):
+            hit = by_slot.get(start % RINGS[res])
+            out.append((start, *hit[1:]) if hit and hit[0] == start else (start, 0, 0))
+        return out
+
+    def reset(self):
+        """Zero the aggregate for every process sharing the store"""
+        self._ensure_process()
+        with self._lock:
+            self._pending = {}
+        with self._db_lock:
+            db = self._db
+            db.execute('BEGIN IMMEDIATE')
+            db.execute('DELETE FROM buckets')
+            db.execute('UPDATE totals SET total = 0, fraud = 0, amount_blocked = 0.0')
+            db.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+            self._gen = db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+            db.execute('COMMIT')
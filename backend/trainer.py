@@ -0,0 +1,284 @@
+"""Background incremental retraining from the labeled-feedback log (feedback.py).
+
+A round reads the feedback records appended since the last round (offsets per segment in
+<feedback dir>/trainer/state.json) and splits them into training and holdout rows by a hash of the
+transaction id, so every label for a transaction lands on the same side. The new training rows plus a
+reservoir sample of all earlier ones (Algorithm R, so history stays uniformly represented in bounded space)
+grow a copy of the served forest by --trees warm-started trees; past --max-trees the oldest trees are
+dropped, so the forest tracks recent outcomes. The candidate is published to the registry (registry.py),
+and every serving worker hot-swaps to it, only if it beats the served version's log loss on the holdout
+reservoir by --min-gain. Otherwise nothing changes except the reservoirs and offsets.
+
+Training never runs in a serving process: the server (FRAUDCHECK_TRAINER=1) or cron starts this as its
+own process, which lowers its priority, pins itself to FRAUDCHECK_TRAINER_CPUS, fits single-threaded and
+holds a lock in the feedback directory so only one trainer runs per log.
+
+Usage: python backend/trainer.py [--once] [--interval 3600] [--feedback-dir feedback] [--model-dir models]
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+import numpy as np
+from feedback import RECORD, read_segment, segments
+from registry import MODEL_FILE, SCALER_FILE, publish, resolve
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = 'trainer'
+STATE_FILE = 'state.json'
+
+def _state_dir(feedback_dir):
+    return os.path.join(feedback_dir, STATE_DIR)
+
+def trainer_status(feedback_dir):
+    """Saved trainer state (offsets left out), or None before the first round"""
+    try:
+        with open(os.path.join(_state_dir(feedback_dir), STATE_FILE)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return {k: v for k, v in state.items() if k != 'offsets'}
+
+def _load(feedback_dir):
+    d = _state_dir(feedback_dir)
+    try:
+        with open(os.path.join(d, STATE_FILE)) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        state = {}
+    state.setdefault('offsets', {})
+    state.setdefault('seen', {'train': 0, 'holdout': 0})
+    state.setdefault('rounds', 0)
+    state.setdefault('published', 0)
+    pools = {}
+    for name in ('train', 'holdout'):
+        try:
+            pools[name] = np.load(os.path.join(d, f'{name}.npy'))
+        except FileNotFoundError:
+            pools[name] = np.empty(0, dtype=RECORD)
+    return state, pools
+
+def _save(feedback_dir, state, pools=None):
+    d = _state_dir(feedback_dir)
+    os.makedirs(d, exist_ok=True)
+    # reservoirs first: a crash before the state is written re-reads the same records next round
+    for name, pool in (pools or {}).items():
+        tmp = os.path.join(d, f'.{name}.npy')
+        np.save(tmp, pool)
+        os.replace(tmp, os.path.join(d, f'{name}.npy'))
+    tmp = os.path.join(d, f'.{STATE_FILE}')
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, os.path.join(d, STATE_FILE))
+
+def read_new(feedback_dir, offsets):
+    """(records appended since offsets, offsets after them)"""
+    chunks, after = [], dict(offsets)
+    for path in segments(feedback_dir):
+        name = os.path.basename(path)
+        records = read_segment(path, offsets.get(name, 0))
+        if len(records):
+            chunks.append(records)
+            after[name] = offsets.get(name, 0) + len(records)
+    return (np.concatenate(chunks) if chunks else np.empty(0, dtype=RECORD)), after
+
+def holdout_mask(txids, fraction):
+    """True for records whose transaction id hashes into the holdout share"""
+    cut = int(fraction * 2**32)
+    return np.fromiter((zlib.crc32(t) < cut for t in txids), dtype=bool, count=len(txids))
+
+def reservoir_add(pool, records, seen, size, rng):
+    """Algorithm R over records following `seen` earlier ones: (pool, seen + len(records))"""
+    fill = max(0, min(size - len(pool), len(records)))
+    pool = np.concatenate([pool, records[:fill]])
+    rest = records[fill:]
+    if len(rest):
+        slot = rng.integers(0, seen + fill + np.arange(1, len(rest) + 1))
+        keep = slot < size
+        pool[slot[keep]] = rest[keep]  # in order, so a later record wins a contested slot as in the serial loop
+    return pool, seen + len(records)
+
+def log_loss(y, p):
+    p = np.clip(p, 1e-15, 1 - 1e-15)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+def _evaluate(model, X, y):
+    p = model.predict_proba(X)[:, 1]
+    return {'log_loss': round(log_loss(y, p), 6), 'accuracy': round(float(np.mean((p >= 0.5) == y)), 6)}
+
+def _prune(feedback_dir, offsets):
+    """Delete fully read segments that a later segment of the same writer has replaced"""
+    paths = segments(feedback_dir)
+    last = {}
+    for path in paths:
+        last[os.path.basename(path).rsplit('-', 1)[1]] = path
+    for path in paths:
+        name = os.path.basename(path)
+        if path not in last.values() and offsets.get(name, 0) * RECORD.itemsize >= os.path.getsize(path):
+            os.remove(path)
+            offsets.pop(name, None)
+
+def run_once(feedback_dir, model_dir, trees=20, max_trees=200, reservoir=50000, holdout=10000,
+             holdout_fraction=0.2, min_new=200, min_holdout=100, min_gain=0.0, n_jobs=1, prune=False):
+    """One retraining round; returns its result ({'status': 'published' | 'rejected' | 'skipped', ...}),
+    which is also saved as the state's last_result"""
+    import joblib
+    started = time.perf_counter()
+    state, pools = _load(feedback_dir)
+    new, offsets = read_new(feedback_dir, state['offsets'])
+    result = {'at': datetime.now().isoformat(timespec='seconds'), 'new_records': len(new)}
+
+    def finish(status, **extra):
+        result.update(status=status, **extra, seconds=round(time.perf_counter() - started, 3))
+        if status == 'skipped':  # nothing consumed: the records count towards the next round
+            _save(feedback_dir, {**state, 'last_result': result})
+        return result
+
+    if len(new) < min_new:
+        return finish('skipped', reason=f"{len(new)} new records, waiting for {min_new}")
+    held = holdout_mask(new['txid'], holdout_fraction)
+    train = np.concatenate([pools['train'], new[~held]])
+    test = np.concatenate([pools['holdout'], new[held]])
+    if len(np.unique(train['label'])) < 2:
+        return finish('skipped', reason="training rows hold a single class")
+    if len(test) < min_holdout or len(np.unique(test['label'])) < 2:
+        return finish('skipped', reason=f"holdout needs {min_holdout} rows of both classes, has {len(test)}")
+    version, directory = resolve(model_dir)
+    if version is None:
+        return finish('skipped', reason=f"no model in {model_dir}")
+    model = joblib.load(os.path.join(directory, MODEL_FILE))
+    scaler_path = os.path.join(directory, SCALER_FILE)
+    scaler = joblib.load(scaler_path)
+    if 'warm_start' not in model.get_params() or not hasattr(model, 'estimators_'):
+        return finish('skipped', reason=f"{type(model).__name__} cannot grow trees")
+
+    candidate = copy.deepcopy(model)
+    candidate.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees, n_jobs=n_jobs,
+                         random_state=state['rounds'])
+    if model.get_params().get('class_weight') == 'balanced':
+        # balanced over the rows the new trees see, fixed up front as warm-started fits need
+        counts = np.bincount(train['label'], minlength=2)
+        candidate.set_params(class_weight={c: len(train) / (2 * counts[c]) for c in (0, 1)})
+    X = scaler.transform(train['x'])
+    candidate.fit(X, train['label'])
+    if len(candidate.estimators_) > max_trees:
+        candidate.estimators_ = candidate.estimators_[-max_trees:]
+    candidate.set_params(warm_start=False, n_estimators=len(candidate.estimators_), n_jobs=model.n_jobs,
+                         class_weight=model.class_weight)
+
+    X_test, y_test = scaler.transform(test['x']), test['label'].astype(np.float64)
+    scores = {'rows': len(test), 'current': _evaluate(model, X_test, y_test),
+              'candidate': _evaluate(candidate, X_test, y_test)}
+    better = scores['candidate']['log_loss'] < scores['current']['log_loss'] - min_gain
+    result.update(parent=version, trained_rows=len(train), trees=len(candidate.estimators_), holdout=scores)
+    if better:
+        os.makedirs(_state_dir(feedback_dir), exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=_state_dir(feedback_dir)) as tmp:
+            model_path = os.path.join(tmp, MODEL_FILE)
+            joblib.dump(candidate, model_path)
+            result['version'] = publish(model_path, scaler_path, model_dir, info={
+                'trained_from': 'feedback', 'parent': version, 'trained_rows': len(train), 'holdout': scores})
+        state['published'] += 1
+        logger.info(f"Trainer: published {result['version']} (holdout log loss "
+                    f"{scores['current']['log_loss']} -> {scores['candidate']['log_loss']})")
+    else:
+        logger.info(f"Trainer: candidate rejected (holdout log loss {scores['current']['log_loss']} -> "
+                    f"{scores['candidate']['log_loss']})")
+
+    rng = np.random.default_rng(state['rounds'])
+    pools['train'], state['seen']['train'] = reservoir_add(pools['train'], new[~held], state['seen']['train'],
+                                                           reservoir, rng)
+    pools['holdout'], state['seen']['holdout'] = reservoir_add(pools['holdout'], new[held],
+                                                               state['seen']['holdout'], holdout, rng)
+    if prune:
+        _prune(feedback_dir, offsets)
+    finish('published' if better else 'rejected')
+    state.update(offsets=offsets, rounds=state['rounds'] + 1, last_result=result)
+    _save(feedback_dir, state, pools)
+    return result
+
+def limit_resources(nice=10, cpus=None):
+    """Lower this process's priority and pin it to cpus (Linux); a failure is logged, not fatal"""
+    try:
+        if nice and hasattr(os, 'nice'):
+            os.nice(nice)
+        if cpus and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cpus)
+    except OSError as e:
+        logger.warning(f"Trainer: resource limits not applied: {e}")
+
+def _lock(feedback_dir):
+    """Exclusive lock on the trainer state, or None if another trainer holds it; released when the
+    process exits, however it exits"""
+    os.makedirs(_state_dir(feedback_dir), exist_ok=True)
+    f = open(os.path.join(_state_dir(feedback_dir), 'lock'), 'a+')
+    try:
+        try:
+            import fcntl
+        except ImportError:  # Windows
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Retrain the fraud model from labeled feedback")
+    parser.add_argument('--feedback-dir', default=os.environ.get('FRAUDCHECK_FEEDBACK_DIR')
+                        or os.path.join(here, '..', 'feedback'))
+    parser.add_argument('--model-dir', default=os.environ.get('FRAUDCHECK_MODEL_DIR')
+                        or os.path.join(here, '..', 'models'))
+    parser.add_argument('--once', action='store_true', help="run one round and exit")
+    parser.add_argument('--interval', type=float, default=3600, help="seconds between rounds")
+    parser.add_argument('--trees', type=int, default=20, help="trees added per round")
+    parser.add_argument('--max-trees', type=int, default=200, help="the oldest trees are dropped past this")
+    parser.add_argument('--reservoir', type=int, default=50000, help="training rows kept from earlier rounds")
+    parser.add_argument('--holdout', type=int, default=10000, help="holdout rows kept")
+    parser.add_argument('--holdout-fraction', type=float, default=0.2)
+    parser.add_argument('--min-new', type=int, default=200, help="new records needed for a round")
+    parser.add_argument('--min-gain', type=float, default=0.0, help="holdout log-loss improvement to publish")
+    parser.add_argument('--prune', action='store_true', help="delete segments once read and rotated")
+    parser.add_argument('--nice', type=int, default=10)
+    parser.add_argument('--cpus', default=os.environ.get('FRAUDCHECK_TRAINER_CPUS'),
+                        help="comma-separated CPU ids to pin to")
+    parser.add_argument('--parent-pid', type=int, help="exit when this process is gone")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    lock = _lock(args.feedback_dir)
+    if lock is None:
+        logger.info(f"Trainer: another trainer holds {args.feedback_dir}, exiting")
+        return
+    limit_resources(args.nice, {int(c) for c in args.cpus.split(',')} if args.cpus else None)
+    options = dict(trees=args.trees, max_trees=args.max_trees, reservoir=args.reservoir, holdout=args.holdout,
+                   holdout_fraction=args.holdout_fraction, min_new=args.min_new, min_gain=args.min_gain,
+                   prune=args.prune)
+    while True:
+        try:
+            result = run_once(args.feedback_dir, args.model_dir, **options)
+            logger.info(f"Trainer: {result['status']} {result.get('reason') or ''}")
+        except Exception as e:
+            logger.exception(f"Trainer round failed: {e}")
+        if args.once:
+            return
+        deadline = time.monotonic() + args.interval
+        while time.monotonic() < deadline:
+            if args.parent_pid and os.getppid() != args.parent_pid:
+                logger.info("Trainer: server exited, stopping")
+                return
+            time.sleep(min(1.0, args.interval))
+
+if __name__ == '__main__':
+    sys.exit(main())
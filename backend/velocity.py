@@ -0,0 +1,210 @@
+"""Per-customer transaction velocity: counts and amount sums over 1h / 24h / 7d sliding windows.
+
+Every key (card or customer id) owns one row of fixed-size NumPy arrays holding a ring of buckets per
+window (12 x 5 min, 24 x 1 h, 28 x 6 h). A bucket slot is recycled when its ring wraps, so recording a
+transaction and reading the three windows touch a constant 64 buckets whatever the key's history. A
+window covers its last n buckets, i.e. between (n-1)/n of its span and all of it.
+
+Keys idle for longer than the widest window are evicted, and once the memory cap is reached the
+least recently seen key makes room. The store is per process; with a snapshot path it is written
+there (atomically) periodically and at exit, and read back at startup so a restart stays warm.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (window, bucket width in seconds, buckets)
+WINDOWS = (('1h', 300, 12), ('24h', 3600, 24), ('7d', 21600, 28))
+_STARTS = np.cumsum([0] + [n for _, _, n in WINDOWS[:-1]])
+_RINGS = [(int(start), width, n) for start, (_, width, n) in zip(_STARTS, WINDOWS)]
+_WIDTHS = np.repeat([float(width) for _, width, _ in WINDOWS], [n for _, _, n in WINDOWS])
+_SPANS = np.repeat([n for _, _, n in WINDOWS], [n for _, _, n in WINDOWS])
+N_BUCKETS = len(_WIDTHS)
+IDLE_S = max(width * n for _, width, n in WINDOWS)
+# bucket ids (int32) + counts (int32) + amount sums (float64) + last seen (float64)
+BYTES_PER_KEY = N_BUCKETS * (4 + 4 + 8) + 8
+_INITIAL_KEYS = 1024
+
+class VelocityStore:
+    def __init__(self, max_bytes=64 * 2**20, snapshot_path=None, snapshot_interval=60.0, idle_s=IDLE_S):
+        self.max_keys = max(int(max_bytes // BYTES_PER_KEY), 1)
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.idle_s = idle_s
+        self._lock = threading.Lock()
+        self._pid = None
+        self.clear()
+        if hasattr(os, 'register_at_fork'):  # POSIX only; there is no fork to survive on Windows
+            os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self._at_exit)
+
+    def clear(self):
+        with self._lock:
+            self._index = OrderedDict()  # key -> row, least recently seen first
+            self._free = []
+            self._last = np.zeros(0)
+            self._allocate(min(_INITIAL_KEYS, self.max_keys))
+            self.evicted_idle = 0
+            self.evicted_capacity = 0
+
+    def _allocate(self, capacity):
+        """Grow the arrays to capacity rows, keeping existing rows"""
+        old = len(self._last)
+        ids = np.full((capacity, N_BUCKETS), -1, dtype=np.int32)
+        cnt = np.zeros((capacity, N_BUCKETS), dtype=np.int32)
+        amt = np.zeros((capacity, N_BUCKETS), dtype=np.float64)
+        last = np.zeros(capacity, dtype=np.float64)
+        if old:
+            ids[:old], cnt[:old], amt[:old], last[:old] = self._ids, self._cnt, self._amt, self._last
+        self._ids, self._cnt, self._amt, self._last = ids, cnt, amt, last
+        self._free.extend(range(capacity - 1, old - 1, -1))
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def _ensure_process(self):
+        # The snapshot thread does not survive fork, so every worker starts its own
+        self._pid = os.getpid()
+        if self.snapshot_path and self.snapshot_interval > 0:
+            threading.Thread(target=self._snapshot_loop, args=(self._pid,), name='velocity-snapshot',
+                             daemon=True).start()
+
+    def __len__(self):
+        return len(self._index)
+
+    def _row(self, key, now):
+        row = self._index.get(key)
+        if row is not None:
+            self._index.move_to_end(key)
+            return row
+        # Idle keys sit at the front, as long as they were seen in time order
+        while self._index:
+            oldest, oldest_row = next(iter(self._index.items()))
+            if self._last[oldest_row] >= now - self.idle_s:
+                break
+            del self._index[oldest]
+            self._free.append(oldest_row)
+            self.evicted_idle += 1
+        if not self._free:
+            if len(self._last) < self.max_keys:
+                self._allocate(min(len(self._last) * 2, self.max_keys))
+            else:
+                _, lru_row = self._index.popitem(last=False)
+                self._free.append(lru_row)
+                self.evicted_capacity += 1
+        row = self._free.pop()
+        self._ids[row] = -1
+        self._last[row] = now
+        self._index[key] = row
+        return row
+
+    def _windows(self, row, now):
+        """([count per window], [amount sum per window]) of the buckets still inside each window"""
+        valid = self._ids[row] > np.floor_divide(now, _WIDTHS) - _SPANS
+        counts = np.add.reduceat(np.where(valid, self._cnt[row], 0), _STARTS)
+        sums = np.add.reduceat(np.where(valid, self._amt[row], 0.0), _STARTS)
+        return counts.tolist(), sums.tolist()
+
+    def observe(self, key, amount, now=None):
+        """Record a transaction of amount for key; returns the windows as they were before it
+        ([count 1h, 24h, 7d], [amount sum 1h, 24h, 7d])"""
+        if self._pid != os.getpid():
+            self._ensure_process()
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._row(key, now)
+            now = max(now, self._last[row])  # a late clock never rewrites newer buckets
+            before = self._windows(row, now)
+            ids, cnt, amt = self._ids[row], self._cnt[row], self._amt[row]
+            for start, width, n in _RINGS:
+                bucket = int(now // width)
+                slot = start + bucket % n
+                if ids[slot] != bucket:
+                    ids[slot], cnt[slot], amt[slot] = bucket, 0, 0.0
+                cnt[slot] += 1
+                amt[slot] += amount
+            self._last[row] = now
+        return before
+
+    def windows(self, key, now=None):
+        """Counts and amount sums per window for key, without recording anything"""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._index.get(key)
+            if row is None:
+                return [0] * len(WINDOWS), [0.0] * len(WINDOWS)
+            return self._windows(row, now)
+
+    def metrics(self):
+        return {
+            'keys': len(self._index),
+            'max_keys': self.max_keys,
+            'allocated_bytes': len(self._last) * BYTES_PER_KEY,
+            'evicted_idle': self.evicted_idle,
+            'evicted_capacity': self.evicted_capacity,
+            'snapshot': self.snapshot_path,
+        }
+
+    def save(self, path=None):
+        """Write every key's buckets to path (default snapshot_path) via a temp file and rename"""
+        path = path or self.snapshot_path
+        with self._lock:
+            keys = np.array(list(self._index), dtype=str)
+            rows = np.fromiter(self._index.values(), dtype=np.intp, count=len(self._index))
+            arrays = {'ids': self._ids[rows], 'cnt': self._cnt[rows], 'amt': self._amt[rows],
+                      'last': self._last[rows]}
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, keys=keys, **arrays)
+        os.replace(tmp, path)
+        return len(keys)
+
+    def load(self, path=None, now=None):
+        """Replace the contents with a snapshot, dropping idle keys; returns the number of keys loaded"""
+        path = path or self.snapshot_path
+        if not path or not os.path.exists(path):
+            return 0
+        now = time.time() if now is None else now
+        try:
+            with np.load(path, allow_pickle=False) as snap:
+                keys, ids, cnt, amt, last = (snap[k] for k in ('keys', 'ids', 'cnt', 'amt', 'last'))
+            if ids.shape != (len(keys), N_BUCKETS):
+                raise ValueError(f"bucket layout {ids.shape[1:]} does not match {N_BUCKETS}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Velocity snapshot {path} ignored: {e}")
+            return 0
+        keep = np.flatnonzero(last >= now - self.idle_s)[-self.max_keys:]  # snapshot is in LRU order
+        self.clear()
+        with self._lock:
+            capacity = len(self._last)
+            while capacity < len(keep):
+                capacity = min(capacity * 2, self.max_keys)
+            if capacity > len(self._last):
+                self._allocate(capacity)
+            rows = [self._free.pop() for _ in range(len(keep))]
+            self._ids[rows], self._cnt[rows], self._amt[rows], self._last[rows] = \
+                ids[keep], cnt[keep], amt[keep], last[keep]
+            self._index.update(zip(keys[keep].tolist(), rows))
+        logger.info(f"Velocity store: {len(keep)} keys loaded from {path}")
+        return len(keep)
+
+    def _snapshot_loop(self, pid):
+        while self._pid == pid:
+            time.sleep(self.snapshot_interval)
+            try:
+                self.save()
+            except OSError as e:
+                logger.error(f"Velocity snapshot failed: {e}")
+
+    def _at_exit(self):
+        if self.snapshot_path and self._pid == os.getpid():
+            try:
+                self.save()
+            except OSError as e:
+                logger.error(f"Velocity snapshot failed: {e}")
@@ -0,0 +1,111 @@
+"""Binary request/response encodings for the scoring API: MessagePack and Arrow IPC.
+
+MessagePack bodies carry the same documents as JSON (a transaction, a list of them, or
+{"transactions": [...]}), plus a columnar form {"columns": {field: [values...]}} for bulk callers.
+Arrow IPC bodies (stream or file format) are always columnar: one record batch column per field.
+Columnar bodies become a ColumnBatch (a dict of NumPy arrays / lists) that features.build_matrix reads
+directly, so no per-transaction dict is ever built. Responses go back in the request's encoding.
+
+msgpack and pyarrow are optional: they are imported on first use, and a body in an encoding whose
+package is missing is refused with UnsupportedMediaType (415).
+"""
+import json
+import numpy as np
+
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+ARROW_FILE = 'application/vnd.apache.arrow.file'
+ARROW_TYPES = (ARROW_STREAM, ARROW_FILE)
+BINARY_TYPES = MSGPACK_TYPES + ARROW_TYPES
+JSON_TYPE = 'application/json'
+
+class UnsupportedMediaType(Exception):
+    pass
+
+def media_type(content_type):
+    """'application/msgpack' from a Content-Type header value (str or bytes)"""
+    if isinstance(content_type, bytes):
+        content_type = content_type.decode('latin-1')
+    return (content_type or '').split(';')[0].strip().lower()
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise UnsupportedMediaType("MessagePack bodies need the msgpack package (pip install msgpack)") from None
+    return msgpack
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise UnsupportedMediaType("Arrow IPC bodies need the pyarrow package (pip install pyarrow)") from None
+    return pyarrow
+
+class ColumnBatch(dict):
+    """Field name -> column (NumPy array or list) of a columnar body"""
+
+def decode_body(body, ctype):
+    """Parsed body of media type ctype; ValueError if it is malformed"""
+    if ctype in MSGPACK_TYPES:
+        msgpack = _msgpack()
+        try:
+            data = msgpack.unpackb(body, raw=False)
+        except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError, ValueError, TypeError) as e:
+            raise ValueError(f"Invalid MessagePack body: {e or type(e).__name__}") from None
+        if isinstance(data, dict) and isinstance(data.get('columns'), dict):
+            return ColumnBatch(data['columns'])
+        return data
+    if ctype in ARROW_TYPES:
+        return _decode_arrow(body, ctype)
+    raise UnsupportedMediaType(f"Unsupported content type {ctype!r}")
+
+def _decode_arrow(body, ctype):
+    pa = _pyarrow()
+    try:
+        reader = pa.ipc.open_stream(body) if ctype == ARROW_STREAM else pa.ipc.open_file(body)
+        table = reader.read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ValueError(f"Invalid Arrow IPC body: {e}") from None
+    columns = ColumnBatch()
+    for name, col in zip(table.column_names, table.columns):
+        if pa.types.is_dictionary(col.type):
+            col = col.cast(col.type.value_type)
+        if col.null_count:
+            # Nulls behave like JSON nulls: the row cannot be parsed and gets the fallback vector
+            columns[name] = col.to_pylist()
+        elif pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
+            columns[name] = np.asarray(col.to_numpy(zero_copy_only=False), dtype=str)
+        else:
+            columns[name] = col.to_numpy()
+    return columns
+
+def _plain(obj):
+    """msgpack default= hook for NumPy arrays and scalars"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+def encode_body(resp, ctype, status=200):
+    """(body bytes, content type) answering a ctype request. Arrow responses carry resp['columns'] as one
+    record batch and the other keys as schema metadata; Arrow error responses are JSON."""
+    if ctype in MSGPACK_TYPES:
+        return _msgpack().packb(resp, default=_plain, use_bin_type=True), ctype
+    if ctype in ARROW_TYPES and status == 200 and 'columns' in resp:
+        pa = _pyarrow()
+        meta = {k: json.dumps(v) for k, v in resp.items() if k != 'columns'}
+        table = pa.table(resp['columns'])
+        for i, field in enumerate(table.schema):
+            if pa.types.is_list(field.type) and pa.types.is_null(field.type.value_type):
+                # Only empty lists in this batch (e.g. no fraud rows): keep the column's type stable
+                table = table.set_column(i, field.name, table.column(i).cast(pa.list_(pa.string())))
+        table = table.replace_schema_metadata(meta)
+        sink = pa.BufferOutputStream()
+        writer = pa.ipc.new_stream(sink, table.schema) if ctype == ARROW_STREAM else pa.ipc.new_file(sink, table.schema)
+        with writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ctype
+    return json.dumps(resp, default=_plain).encode(), JSON_TYPE
@@ -0,0 +1,99 @@
+"""Anytime forest evaluation: latency vs accuracy against the full forest.
+
+Three sweeps over a synthetic traffic sample (models/calibrate_cascade.py), all on the served compiled forest:
+
+max_trees  a fixed tree budget: the accuracy you get from the first k trees
+bound      stopping once the remaining trees cannot flip the label, per block size (labels stay exact)
+deadline   a wall-clock budget per 1k-row batch, as `deadline_ms` sets it for a request
+
+Accuracy is label agreement with the full forest and mean |probability error|; latency is per single row
+(p50/p99) and per 1k-row batch. A single row is walked through the trees one at a time in Python, so it
+saves the trees the bound or a deadline skips; batches save one NumPy pass per skipped block.
+
+Usage: python benchmarks/bench_anytime.py [--rows 2000] [--repeats 300]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import warnings
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'models'))
+warnings.filterwarnings('ignore')
+
+from forest import Anytime
+
+def latency_us(fn, args_list, repeats):
+    samples = []
+    for i in range(repeats):
+        args = args_list[i % len(args_list)]
+        t0 = time.perf_counter_ns()
+        fn(*args)
+        samples.append(time.perf_counter_ns() - t0)
+    return np.percentile(np.array(samples) / 1e3, [50, 99])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000, help="accuracy sample size")
+    parser.add_argument('--repeats', type=int, default=300)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    import app
+    from calibrate_cascade import synthetic_transactions
+    from features import build_matrix
+    if not app.load_model(watch=False) or app.current.compiled is None:
+        sys.exit("Anytime evaluation needs the compiled forest")
+    forest = app.current.compiled
+    X = build_matrix(synthetic_transactions(args.rows, seed=3))
+    if not forest.scaler_folded:
+        X = app.current.scaler.transform(X)
+    full = forest.predict_proba(X)
+    full_label = full[:, 1] > full[:, 0]
+    singles = [(X[i:i + 1],) for i in range(min(len(X), 200))]
+    batch = X[:1000]
+
+    def accuracy(proba):
+        return ((proba[:, 1] > proba[:, 0]) == full_label).mean(), np.abs(proba[:, 1] - full[:, 1]).mean()
+
+    def row(name, make):
+        """make() -> fresh Anytime (or None for the full forest)"""
+        a = make()
+        proba = forest.predict_proba(X) if a is None else forest.predict_proba_anytime(X, a)
+        agree, err = accuracy(proba)
+        trees = forest.n_estimators if a is None else a.trees.mean()
+        score = (lambda x: forest.predict_proba(x)) if a is None else (lambda x: forest.predict_proba_anytime(x, make()))
+        p50, p99 = latency_us(score, singles, args.repeats)
+        b50, _ = latency_us(score, [(batch,)], max(args.repeats // 10, 5))
+        print(f"{name:<22}{trees:>9.1f}{agree:>10.2%}{err:>10.4f}{p50:>10.1f}{p99:>10.1f}{b50:>12.1f}")
+
+    print(f"{forest.n_estimators} trees, depth {forest.depth}, {len(X)} rows")
+    print(f"{'mode':<22}{'trees':>9}{'agree':>10}{'|dp|':>10}{'1r p50':>10}{'1r p99':>10}{'1k p50 us':>12}")
+    row('full forest', lambda: None)
+    for k in (1, 5, 10, 20, 50, 75):
+        row(f'max_trees={k}', lambda k=k: Anytime(bound=False, block=k, max_trees=k))
+    for block in (5, 10, 16, 25, 50):
+        row(f'bound, block={block}', lambda block=block: Anytime(block=block))
+
+    full_label, full = full_label[:len(batch)], full[:len(batch)]
+    print(f"\n{'1k-row batch budget':<22}{'trees':>9}{'agree':>10}{'|dp|':>10}{'p50 us':>10}{'p99 us':>10}")
+    for budget_us in (250, 500, 1000, 2000, 4000):
+        samples, trees, agree, err = [], [], [], []
+        for _ in range(max(args.repeats // 10, 5)):
+            t0 = time.perf_counter_ns()
+            a = Anytime(t0 + budget_us * 1000, block=10)
+            proba = forest.predict_proba_anytime(batch, a)
+            samples.append(time.perf_counter_ns() - t0)
+            trees.append(a.trees.mean())
+            agree_i, err_i = accuracy(proba)
+            agree.append(agree_i)
+            err.append(err_i)
+        p50, p99 = np.percentile(np.array(samples) / 1e3, [50, 99])
+        print(f"{f'deadline={budget_us}us':<22}{np.mean(trees):>9.1f}{np.mean(agree):>10.2%}{np.mean(err):>10.4f}"
+              f"{p50:>10.1f}{p99:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""Reproducible API benchmarks with JSON baselines and regression gating.
+
+inprocess  times the hot-path stages (preprocess, inference, fraud_reasons) and the full /api/predict
+           round trip through the Flask test client, without a network.
+http       drives a running server open-loop at a fixed request rate (each request has a scheduled send
+           time and latency is measured from it, so a slow server cannot hide queueing) for each
+           concurrency level in a sweep.
+
+Both modes use the transaction payloads from testcases.md, report throughput and p50/p99/p999 latency,
+can save the results as a baseline and exit non-zero when a later run regresses past --threshold.
+
+Usage:
+    python benchmarks/bench_api.py inprocess [--iterations 2000] [--save-baseline] [--check]
+    python benchmarks/bench_api.py http --url http://127.0.0.1:5000 --rps 200 --concurrency 1,4,16 --duration 10
+"""
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+import warnings
+from urllib.parse import urlsplit
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+sys.path.insert(0, BACKEND)
+BASELINE_DIR = os.path.join(ROOT, 'benchmarks', 'baselines')
+
+from workload import load_testcase_payloads, private_stats_db
+
+def summarize(samples_ns, elapsed_s):
+    """Latency percentiles (us) and throughput for one case"""
+    us = np.asarray(samples_ns, dtype=np.float64) / 1e3
+    p50, p99, p999 = np.percentile(us, [50, 99, 99.9]) if len(us) else (0.0, 0.0, 0.0)
+    return {'n': len(us), 'throughput_per_s': round(len(us) / elapsed_s, 1) if elapsed_s else 0.0,
+            'p50_us': round(p50, 1), 'p99_us': round(p99, 1), 'p999_us': round(p999, 1)}
+
+def timed_loop(fn, args_cycle, iterations):
+    samples = []
+    start = time.perf_counter_ns()
+    for args in itertools.islice(args_cycle, iterations):
+        t0 = time.perf_counter_ns()
+        fn(*args)
+        samples.append(time.perf_counter_ns() - t0)
+    return summarize(samples, (time.perf_counter_ns() - start) / 1e9)
+
+def run_inprocess(iterations):
+    logging.disable(logging.WARNING)
+    warnings.filterwarnings('ignore')
+    private_stats_db()
+    import app
+    app.load_model(watch=False, trainer=False)
+    payloads = load_testcase_payloads()
+    rows = [app.preprocess(p) for p in payloads]
+    for fn, args in ((app.preprocess, (payloads[0],)), (app.infer, (rows[0],))):
+        for _ in range(50):
+            fn(*args)  # warm-up
+    client = app.app.test_client()
+    cases = {
+        'preprocess': (app.preprocess, ((p,) for p in itertools.cycle(payloads))),
+        'adjust_features+infer': (lambda fv: app.infer(app.adjust_features(fv)), ((r,) for r in itertools.cycle(rows))),
+        'fraud_reasons': (app.fraud_reasons, ((r,) for r in itertools.cycle(rows))),
+        'POST /api/predict (test client)': (lambda p: client.post('/api/predict', json=p),
+                                            ((p,) for p in itertools.cycle(payloads))),
+    }
+    results = {}
+    for name, (fn, args) in cases.items():
+        results[name] = timed_loop(fn, args, iterations)
+        print_row(name, results[name])
+    return results
+
+class OpenLoopClient:
+    """Fixed-rate load: request i is due at start + i / rps; `concurrency` connections send them"""
+
+    def __init__(self, url, payloads, rps, concurrency, duration):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.path = (parts.path.rstrip('/') or '') + '/api/predict'
+        self.bodies = [json.dumps(p).encode() for p in payloads]
+        self.rps, self.concurrency, self.duration = rps, concurrency, duration
+        self.lock = threading.Lock()
+        self.samples, self.errors = [], 0
+
+    def _worker(self, counter, start_ns):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {'Content-Type': 'application/json'}
+        samples, errors = [], 0
+        total = int(self.rps * self.duration)
+        while True:
+            i = next(counter)
+            if i >= total:
+                break
+            due = start_ns + int(i * 1e9 / self.rps)
+            delay = (due - time.perf_counter_ns()) / 1e9
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                conn.request('POST', self.path, self.bodies[i % len(self.bodies)], headers)
+                resp = conn.getresponse()
+                resp.read()
+                ok = resp.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                ok = False
+            if ok:
+                samples.append(time.perf_counter_ns() - due)
+            else:
+                errors += 1
+        conn.close()
+        with self.lock:
+            self.samples += samples
+            self.errors += errors
+
+    def run(self):
+        counter = itertools.count()
+        start_ns = time.perf_counter_ns() + 50_000_000  # let every worker get ready
+        threads = [threading.Thread(target=self._worker, args=(counter, start_ns)) for _ in range(self.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        result = summarize(self.samples, (time.perf_counter_ns() - start_ns) / 1e9)
+        result.update(errors=self.errors, target_rps=self.rps)
+        return result
+
+def run_http(url, rps, concurrency_levels, duration):
+    payloads = load_testcase_payloads()
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    conn.request('GET', '/api/health')
+    health = json.loads(conn.getresponse().read())
+    conn.close()
+    if not health.get('model_loaded'):
+        print(f"warning: server reports model_loaded={health.get('model_loaded')}", file=sys.stderr)
+    # Short unrecorded warm-up so connection setup and first-request costs stay out of the numbers
+    OpenLoopClient(url, payloads, min(rps, 50), 1, 1).run()
+    results = {}
+    for c in concurrency_levels:
+        name = f'{rps:g} rps x {c} connections'
+        results[name] = OpenLoopClient(url, payloads, rps, c, duration).run()
+        print_row(name, results[name])
+    return results
+
+def print_row(name, r):
+    extra = f"  errors {r['errors']}" if r.get('errors') else ''
+    print(f"{name:<34}{r['throughput_per_s']:>12,.1f}{r['p50_us']:>12,.1f}{r['p99_us']:>12,.1f}"
+          f"{r['p999_us']:>12,.1f}{extra}")
+
+def compare(results, baseline, threshold):
+    """(regression messages, cases compared) for cases slower than baseline by more than threshold (fraction)"""
+    failures, compared = [], 0
+    for name, base in baseline['results'].items():
+        cur = results.get(name)
+        if cur is None:
+            continue
+        compared += 1
+        for key in ('p50_us', 'p99_us'):
+            if base[key] and cur[key] > base[key] * (1 + threshold):
+                failures.append(f"{name}: {key} {cur[key]:,.1f} vs baseline {base[key]:,.1f}")
+        if base['throughput_per_s'] and cur['throughput_per_s'] < base['throughput_per_s'] * (1 - threshold):
+            failures.append(f"{name}: throughput {cur['throughput_per_s']:,.1f}/s vs baseline "
+                            f"{base['throughput_per_s']:,.1f}/s")
+        if cur.get('errors', 0) > base.get('errors', 0):
+            failures.append(f"{name}: {cur['errors']} errors vs baseline {base.get('errors', 0)}")
+    return failures, compared
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='mode', required=True)
+    p_in = sub.add_parser('inprocess', help="stage and test-client benchmarks, no network")
+    p_in.add_argument('--iterations', type=int, default=2000)
+    p_http = sub.add_parser('http', help="open-loop fixed-rate load against a running server")
+    p_http.add_argument('--url', default='http://127.0.0.1:5000')
+    p_http.add_argument('--rps', type=float, default=200)
+    p_http.add_argument('--concurrency', default='1,4,16', help="comma-separated connection counts to sweep")
+    p_http.add_argument('--duration', type=float, default=10, help="seconds per concurrency level")
+    for p in (p_in, p_http):
+        p.add_argument('--baseline', help="baseline JSON path (default: benchmarks/baselines/<mode>.json)")
+        p.add_argument('--save-baseline', action='store_true', help="write these results as the baseline")
+        p.add_argument('--check', action='store_true', help="exit 1 if slower than the baseline by > threshold")
+        p.add_argument('--threshold', type=float, default=0.2, help="allowed regression as a fraction (0.2 = 20%%)")
+        p.add_argument('--output', help="also write the results JSON here")
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<34}{'req/s':>12}{'p50 us':>12}{'p99 us':>12}{'p999 us':>12}")
+    if args.mode == 'inprocess':
+        results = run_inprocess(args.iterations)
+        config = {'iterations': args.iterations}
+    else:
+        levels = [int(c) for c in args.concurrency.split(',')]
+        results = run_http(args.url, args.rps, levels, args.duration)
+        config = {'url': args.url, 'rps': args.rps, 'concurrency': levels, 'duration_s': args.duration}
+    report = {'mode': args.mode, 'config': config, 'results': results,
+              'host': {'machine': platform.machine(), 'python': platform.python_version(), 'cpus': os.cpu_count(),
+                       'node': platform.node()},
+              'created': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f'{args.mode}.json')
+    status = 0
+    if args.check:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline['config'] != config:
+            print(f"warning: baseline was recorded with {baseline['config']}", file=sys.stderr)
+        if baseline.get('host') != report['host']:
+            print(f"warning: baseline was recorded on {baseline.get('host')}", file=sys.stderr)
+        failures, compared = compare(results, baseline, args.threshold)
+        for msg in failures:
+            print(f"REGRESSION {msg}", file=sys.stderr)
+        print(f"{len(failures)} regressions in {compared} cases vs {baseline_path} (threshold {args.threshold:.0%})")
+        if not compared:
+            print("error: no case in common with the baseline", file=sys.stderr)
+        status = 1 if failures or not compared else 0
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
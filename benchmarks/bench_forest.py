@@ -0,0 +1,55 @@
+"""Compiled (and scaler-folded) forest vs sklearn: p50/p99 latency for single rows and 1k-row batches.
+
+Usage: python benchmarks/bench_forest.py [--repeats 500]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+import joblib
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+warnings.filterwarnings('ignore')
+
+from forest import compile_forest, fold_scaler
+
+def percentiles(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - t0)
+    samples = np.array(samples) / 1e3
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=500)
+    args = parser.parse_args()
+    model = joblib.load(os.path.join(ROOT, 'models', 'fraud_detection_model.pkl'))
+    scaler = joblib.load(os.path.join(ROOT, 'models', 'scaler.pkl'))
+    compiled = compile_forest(model)
+    folded = fold_scaler(compiled, scaler)
+    rng = np.random.default_rng(0)
+    # Raw (unscaled) feature rows, as preprocess produces them
+    cases = {n: scaler.inverse_transform(rng.normal(size=(k, 13))) for n, k in (('1 row', 1), ('1k rows', 1000))}
+    print(f"{'case':<10}{'engine':<44}{'p50 us':>12}{'p99 us':>12}")
+    for name, X in cases.items():
+        expected = model.predict_proba(scaler.transform(X))
+        assert np.array_equal(compiled.predict_proba(scaler.transform(X)), expected)
+        assert np.array_equal(folded.predict_proba(X), expected)
+        engines = {
+            'sklearn transform + predict + predict_proba':
+                lambda: (model.predict(scaler.transform(X)), model.predict_proba(scaler.transform(X))),
+            'transform + compiled score': lambda: compiled.score(scaler.transform(X)),
+            'folded score (no transform)': lambda: folded.score(X),
+        }
+        for engine, fn in engines.items():
+            p50, p99 = percentiles(fn, args.repeats)
+            print(f"{name:<10}{engine:<44}{p50:>12.1f}{p99:>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""IP risk index: build time, file size and ns per lookup on a synthetic reputation table.
+
+Builds an index of random, overlapping IPv4 and IPv6 networks, then times IpRiskIndex.lookup for addresses
+inside ranges and outside every range, against a plain bisect over Python lists with ipaddress parsing
+(what a straightforward in-process lookup would do). Also reports the cost of resolving ip_address for a
+1k-row batch in build_matrix.
+
+Usage: python benchmarks/bench_ip_index.py [--ranges 200000] [--lookups 200000]
+"""
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import time
+from bisect import bisect_right
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from features import build_matrix
+from ip_index import IpRiskIndex, flatten, write_index
+
+def ns_per_op(fn, args, ops):
+    t0 = time.perf_counter_ns()
+    for i in range(ops):
+        fn(args[i % len(args)])
+    return (time.perf_counter_ns() - t0) / ops
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ranges', type=int, default=200000, help="source networks (90%% IPv4)")
+    parser.add_argument('--lookups', type=int, default=200000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    ranges = {4: [], 6: []}
+    for version, bits, lo, share in ((4, 32, 12, 0.9), (6, 128, 24, 0.1)):
+        for _ in range(int(args.ranges * share)):
+            prefix = rng.randint(lo, bits)
+            first = rng.getrandbits(bits) >> (bits - prefix) << (bits - prefix)
+            ranges[version].append((first, first + 2**(bits - prefix) - 1, float(rng.randint(0, 10))))
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'ip_risk.idx')
+        t0 = time.perf_counter()
+        header = write_index(path, ranges)
+        print(f"build: {args.ranges} networks -> {header['ranges_v4']} IPv4 / {header['ranges_v6']} IPv6 ranges, "
+              f"{os.path.getsize(path) / 2**20:.1f} MiB, {time.perf_counter() - t0:.1f} s")
+        index = IpRiskIndex(path)
+        inside4 = [str(ipaddress.IPv4Address(rng.randint(a, b))) for a, b, _ in rng.sample(ranges[4], 1000)]
+        inside6 = [str(ipaddress.IPv6Address(rng.randint(a, b))) for a, b, _ in rng.sample(ranges[6], 1000)]
+        anywhere4 = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(1000)]
+        flat4 = flatten(ranges[4])
+        starts = [a for a, _, _ in flat4]
+
+        def naive(address):
+            n = int(ipaddress.ip_address(address))
+            i = bisect_right(starts, n) - 1
+            return flat4[i][2] if i >= 0 and n <= flat4[i][1] else 2.0
+
+        print(f"{'case':<28} {'ns/lookup':>10}")
+        for name, fn, addresses in (('IPv4 in a range', index.lookup, inside4),
+                                    ('IPv4 random', index.lookup, anywhere4),
+                                    ('IPv6 in a range', index.lookup, inside6),
+                                    ('IPv4, ipaddress + bisect', naive, inside4)):
+            print(f"{name:<28} {ns_per_op(fn, addresses, args.lookups):>10.0f}")
+        rows = [{'amount': 100, 'payment_method': 'credit_card', 'ip_address': a} for a in inside4]
+        for label, kwargs in (('ip_risk field', {}), ('ip_address -> index', {'ip_index': index})):
+            t0 = time.perf_counter_ns()
+            for _ in range(20):
+                build_matrix(rows, **kwargs)
+            print(f"build_matrix 1k rows, {label:<20} {(time.perf_counter_ns() - t0) / 20 / 1e6:.2f} ms")
+
+if __name__ == '__main__':
+    main()
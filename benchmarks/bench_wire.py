@@ -0,0 +1,85 @@
+"""Bulk scoring encodings: bytes on the wire and end-to-end rows/s for JSON, MessagePack and Arrow IPC.
+
+Batches cycle the testcases.md transactions. Every encoding posts the same batch to /api/predict/batch
+through the Flask test client (no network), so the timings cover request parsing, the scoring pass and
+response serialization, plus client-side encode/decode:
+
+json          a list of transaction objects, answered with a list of result objects
+msgpack       the same documents as MessagePack
+msgpack-cols  {"columns": {field: [...]}} as MessagePack, answered with result columns
+arrow         one Arrow IPC stream record batch (string columns dictionary-encoded), answered with one
+              record batch
+
+Usage: python benchmarks/bench_wire.py [--rows 100,1000,10000] [--repeats 20]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import warnings
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+warnings.filterwarnings('ignore')
+
+import msgpack
+import pyarrow as pa
+from workload import load_testcase_payloads, private_stats_db
+
+def arrow_stream(columns):
+    # Categorical strings dictionary-encoded, as Arrow producers usually send them
+    table = pa.table({k: pa.array(v).dictionary_encode() if isinstance(v[0], str) else v for k, v in columns.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+ENCODINGS = {
+    'json': ('application/json', lambda rows, cols: json.dumps(rows).encode(), json.loads),
+    'msgpack': ('application/msgpack', lambda rows, cols: msgpack.packb(rows), msgpack.unpackb),
+    'msgpack-cols': ('application/msgpack', lambda rows, cols: msgpack.packb({'columns': cols}), msgpack.unpackb),
+    'arrow': ('application/vnd.apache.arrow.stream', lambda rows, cols: arrow_stream(cols),
+              lambda body: pa.ipc.open_stream(body).read_all()),
+}
+
+def batch(n):
+    payloads = load_testcase_payloads()
+    rows = [payloads[i % len(payloads)] for i in range(n)]
+    fields = sorted({k for p in payloads for k in p})
+    return rows, {k: [r.get(k) for r in rows] for k in fields}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='100,1000,10000', help="comma-separated batch sizes")
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    private_stats_db()
+    import app
+    app.load_model(watch=False, trainer=False)
+    client = app.app.test_client()
+    print(f"{'rows':>6} {'encoding':<13} {'request B':>10} {'response B':>11} {'B/row':>6} "
+          f"{'p50 ms':>8} {'rows/s':>9} {'vs json':>8}")
+    for n in (int(x) for x in args.rows.split(',')):
+        rows, cols = batch(n)
+        base = None
+        for name, (ctype, encode, decode) in ENCODINGS.items():
+            samples = []
+            for _ in range(args.repeats):
+                t0 = time.perf_counter_ns()
+                body = encode(rows, cols)
+                resp = client.post('/api/predict/batch', data=body, content_type=ctype)
+                decode(resp.data)
+                samples.append(time.perf_counter_ns() - t0)
+                assert resp.status_code == 200, resp.data[:200]
+            p50 = np.percentile(samples, 50) / 1e6
+            rate = n / (p50 / 1e3)
+            base = base or rate
+            print(f"{n:>6} {name:<13} {len(body):>10} {len(resp.data):>11} {len(body) / n:>6.0f} "
+                  f"{p50:>8.2f} {rate:>9.0f} {rate / base:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""Shared benchmark setup: the testcases.md transaction payloads, and a private stats store for in-process runs"""
+import atexit
+import json
+import os
+import re
+import shutil
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_testcase_payloads():
+    """All JSON transaction payloads embedded in testcases.md"""
+    with open(os.path.join(ROOT, 'testcases.md'), encoding='utf-8') as f:
+        blocks = re.findall(r'```json\s*(\{.*?\})\s*```', f.read(), re.S)
+    # Some payloads carry // annotations, which are not valid JSON
+    return [json.loads(re.sub(r'\s+//[^\n]*', '', b)) for b in blocks]
+
+def private_stats_db():
+    """Point FRAUDCHECK_STATS_DB at a throwaway file (removed at exit); call before importing app, so a
+    benchmark never writes to, or resets, the statistics a running server shares"""
+    tmp = tempfile.mkdtemp(prefix='fraudcheck-bench-')
+    atexit.register(shutil.rmtree, tmp, True)
+    os.environ['FRAUDCHECK_STATS_DB'] = os.path.join(tmp, 'stats.sqlite3')
+    return os.environ['FRAUDCHECK_STATS_DB']
@@ -0,0 +1,46 @@
+"""Compile an IP reputation CSV into the memory-mapped range index the server reads (models/ip_risk.idx).
+
+CSV rows are "network,risk" (a CIDR or single IPv4/IPv6 address) or "start,end,risk" (an inclusive address
+range), risk on the same 0-10 scale as the ip_risk payload field; a header row and # comments are skipped.
+Overlapping networks resolve to the narrowest one. The file is written beside the target and renamed over
+it, so a running server (FRAUDCHECK_IP_INDEX) picks the new index up on its next watcher poll.
+
+Usage: python models/build_ip_index.py reputation.csv [-o models/ip_risk.idx] [--default 2]
+       python models/build_ip_index.py --check 203.0.113.9 2001:db8::1 [-o models/ip_risk.idx]
+"""
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend'))
+from ip_index import DEFAULT_RISK, IpRiskIndex, read_csv, write_index
+
+def build_ip_index(csv_path, out_path=os.path.join(HERE, 'ip_risk.idx'), default_risk=DEFAULT_RISK):
+    t0 = time.perf_counter()
+    ranges = read_csv(csv_path)
+    header = write_index(out_path, ranges, default_risk, source=os.path.basename(csv_path))
+    print(f"{len(ranges[4])} IPv4 / {len(ranges[6])} IPv6 rows -> {header['ranges_v4']} / {header['ranges_v6']} "
+          f"ranges ({os.path.getsize(out_path)/1024:.1f} KB, default risk {header['default_risk']}) "
+          f"in {time.perf_counter() - t0:.2f} s: {out_path}")
+    return header
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the IP risk range index")
+    parser.add_argument('csv', nargs='?', help="reputation CSV")
+    parser.add_argument('-o', '--output', default=os.path.join(HERE, 'ip_risk.idx'))
+    parser.add_argument('--default', type=float, default=DEFAULT_RISK, help="risk of addresses in no range")
+    parser.add_argument('--check', nargs='+', metavar='ADDRESS', help="look addresses up in the index instead")
+    args = parser.parse_args()
+    if args.check:
+        index = IpRiskIndex(args.output)
+        for address in args.check:
+            try:
+                print(f"{address}\t{index.lookup(address)}")
+            except ValueError as e:
+                print(f"{address}\t{e}")
+    elif args.csv:
+        build_ip_index(args.csv, args.output, args.default)
+    else:
+        parser.error("a CSV to build from, or --check ADDRESS")
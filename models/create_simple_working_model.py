@@ -1,105 +1,165 @@
+"""Train the fraud model on a synthetic dataset that is generated and processed out of core.
+
+The generator draws each chunk of transactions with vectorized NumPy (one RNG stream per chunk, so
+chunks are filled in parallel and the dataset only depends on --rows, --chunk-rows and --seed) and
+writes the 13-feature matrix straight into memory-mapped .npy files under --data-dir. The scaler is
+fitted chunk by chunk (partial_fit), the scaled matrix goes to another memmap, and the forest trains
+on that memmap with all cores (n_jobs), optionally bootstrapping --max-samples rows per tree so tens
+of millions of rows stay tractable. The last --test-size of the rows is the holdout; rows are i.i.d.
+by construction, so that is a random split.
+
+Each phase reports rows/s and the process's peak RSS (memory-mapped pages that were touched count
+towards RSS, but the kernel can drop them under pressure).
+
+Usage:
+    python models/create_simple_working_model.py [--rows 10000] [--chunk-rows 500000] [--n-jobs -1]
+        [--max-samples N] [--data-dir models/data] [--reuse-data] [--model-dir models]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
 import numpy as np
-import pandas as pd
+import joblib
+from joblib import Parallel, delayed
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
+from sklearn.metrics import classification_report, accuracy_score
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
-import joblib
-import os
-from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
-def create_simple_working_model():
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend'))
+from features import FEATURE_NAMES, N_FEATURES, assemble
+from export_compiled_model import export_compiled_model
+
+FRAUD_RATE = 0.2
+FRAUD_HOURS = np.array([0, 1, 2, 3, 4, 5, 22, 23])
+GENERATOR_VERSION = 1  # bump when generate_chunk changes, so --reuse-data regenerates
+EVAL_TRAIN_ROWS = 1_000_000  # training accuracy is measured on at most this many rows
+
+def generate_chunk(n, seed):
+    """(N x 13 float32 features, N uint8 labels) with clearly separated fraud / safe patterns"""
+    rng = np.random.default_rng(seed)
+    fraud = rng.random(n) < FRAUD_RATE
+
+    def uniform(fraud_range, safe_range):
+        low = np.where(fraud, fraud_range[0], safe_range[0])
+        high = np.where(fraud, fraud_range[1], safe_range[1])
+        return low + rng.random(n) * (high - low)
+
+    def flag(p_fraud, p_safe):
+        return rng.random(n) < np.where(fraud, p_fraud, p_safe)
+
+    X = assemble(
+        uniform((3000, 50000), (5, 2000)),                   # amount: fraud is large
+        np.where(fraud, FRAUD_HOURS[rng.integers(0, len(FRAUD_HOURS), n)], rng.integers(8, 20, n)),
+        uniform((0.5, 1.0), (0.0, 0.3)),                     # payment method risk
+        uniform((0.6, 1.0), (0.0, 0.3)),                     # location risk
+        uniform((0.4, 1.0), (0.0, 0.3)),                     # device risk
+        uniform((0.6, 1.0), (0.0, 0.4)),                     # IP risk
+        flag(0.7, 0.2),                                      # age risk
+        flag(0.8, 0.1),                                      # new account
+        flag(0.8, 0.1),                                      # high frequency
+        uniform((3, 10), (0, 2)),                            # amount deviation
+        uniform((0.5, 1.0), (0.0, 0.3)),                     # merchant risk
+        dtype=np.float32)
+    return X, fraud.astype(np.uint8)
+
+def write_dataset(data_dir, n_rows, chunk_rows, seed, n_jobs=-1):
+    """Generate n_rows into data_dir/{X,y}.npy chunk by chunk (in parallel threads); returns open_dataset()"""
+    os.makedirs(data_dir, exist_ok=True)
+    meta_path = os.path.join(data_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)  # meta.json is written last and marks a complete dataset
+    X = np.lib.format.open_memmap(os.path.join(data_dir, 'X.npy'), 'w+', np.float32, (n_rows, N_FEATURES))
+    y = np.lib.format.open_memmap(os.path.join(data_dir, 'y.npy'), 'w+', np.uint8, (n_rows,))
+
+    def fill(i):
+        start, stop = i * chunk_rows, min((i + 1) * chunk_rows, n_rows)
+        X[start:stop], y[start:stop] = generate_chunk(stop - start, [seed, i])
+
+    # NumPy releases the GIL in the heavy loops, and threads share the output maps
+    Parallel(n_jobs=n_jobs, prefer='threads')(delayed(fill)(i) for i in range(-(-n_rows // chunk_rows)))
+    X.flush()
+    y.flush()
+    del X, y
+    with open(meta_path, 'w') as f:
+        json.dump({'rows': n_rows, 'chunk_rows': chunk_rows, 'seed': seed, 'generator': GENERATOR_VERSION,
+                   'features': FEATURE_NAMES}, f, indent=2)
+    return open_dataset(data_dir)
+
+def open_dataset(data_dir):
+    """(X, y, meta) memory-mapped read-only, or None if data_dir holds no complete dataset"""
+    try:
+        with open(os.path.join(data_dir, 'meta.json')) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    return (np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r'),
+            np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r'), meta)
+
+def fit_scaler(X, chunk_rows):
+    scaler = StandardScaler()
+    for start in range(0, len(X), chunk_rows):
+        scaler.partial_fit(X[start:start + chunk_rows])
+    return scaler
+
+def scale_dataset(X, scaler, path, chunk_rows):
+    """scaler.transform(X) into a float32 memmap at path, chunk by chunk"""
+    out = np.lib.format.open_memmap(path, 'w+', np.float32, X.shape)
+    for start in range(0, len(X), chunk_rows):
+        out[start:start + chunk_rows] = scaler.transform(X[start:start + chunk_rows])
+    out.flush()
+    return out
+
+def predict_chunked(model, X, chunk_rows):
+    return np.concatenate([model.predict(X[start:start + chunk_rows]) for start in range(0, len(X), chunk_rows)])
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, None where the resource module is missing (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+def report(phase, rows, seconds):
+    rss = peak_rss_mb()
+    print(f"{phase:<18}{rows:>12,} rows {seconds:>9.2f} s {rows / max(seconds, 1e-9):>14,.0f} rows/s"
+          + (f"   peak RSS {rss:,.0f} MB" if rss is not None else ""))
+
+def create_simple_working_model(n_rows=10000, chunk_rows=500_000, seed=42, n_jobs=-1, max_samples=None,
+                                test_size=0.2, data_dir=os.path.join(HERE, 'data'), reuse_data=False,
+                                model_dir=HERE):
     """Create a simple but working fraud detection model"""
     print("=== Creating Simple Working Fraud Detection Model ===")
-    
-    # Generate realistic fraud data with clear patterns
-    np.random.seed(42)  # For reproducible results
-    n_samples = 10000
-    
-    # Generate features
-    data = []
-    
-    for i in range(n_samples):
-        # 20% fraud rate
-        is_fraud = np.random.choice([0, 1], p=[0.8, 0.2])
-        
-        if is_fraud == 1:
-            # FRAUD patterns - make them clearly distinguishable
-            amount = np.random.uniform(3000, 50000)  # Higher amounts
-            hour = np.random.choice([0, 1, 2, 3, 4, 5, 22, 23])  # Unusual hours
-            payment_method_risk = np.random.uniform(0.5, 1.0)  # High risk methods
-            location_risk = np.random.uniform(0.6, 1.0)  # High risk locations
-            device_risk = np.random.uniform(0.4, 1.0)  # Higher device risk
-            ip_risk = np.random.uniform(0.6, 1.0)  # High IP risk
-            age_risk = np.random.choice([0, 1], p=[0.3, 0.7])  # More age risk
-            account_age_risk = np.random.choice([0, 1], p=[0.2, 0.8])  # New accounts
-            frequency = np.random.choice([0, 1], p=[0.2, 0.8])  # High frequency
-            amount_deviation = np.random.uniform(3, 10)  # Large deviations
-            merchant_risk = np.random.uniform(0.5, 1.0)  # High merchant risk
-            
-        else:
-            # SAFE patterns - clearly normal
-            amount = np.random.uniform(5, 2000)  # Normal amounts
-            hour = np.random.choice(range(8, 20))  # Business hours
-            payment_method_risk = np.random.uniform(0.0, 0.3)  # Low risk methods
-            location_risk = np.random.uniform(0.0, 0.3)  # Low risk locations
-            device_risk = np.random.uniform(0.0, 0.3)  # Low device risk
-            ip_risk = np.random.uniform(0.0, 0.4)  # Low IP risk
-            age_risk = np.random.choice([0, 1], p=[0.8, 0.2])  # Less age risk
-            account_age_risk = np.random.choice([0, 1], p=[0.9, 0.1])  # Established accounts
-            frequency = np.random.choice([0, 1], p=[0.9, 0.1])  # Normal frequency
-            amount_deviation = np.random.uniform(0, 2)  # Small deviations
-            merchant_risk = np.random.uniform(0.0, 0.3)  # Low merchant risk
-        
-        # Create 13 features to match preprocessing
-        features = [
-            min(amount / 10000, 20),        # 0: normalized_amount
-            1 if amount > 5000 else 0,      # 1: high_amount_flag
-            hour,                          # 2: hour_of_day
-            1 if hour < 6 or hour > 22 else 0,  # 3: unusual_hour_flag
-            payment_method_risk,           # 4: payment_method_risk
-            location_risk,                 # 5: location_risk
-            device_risk,                   # 6: device_risk
-            ip_risk,                       # 7: ip_risk
-            age_risk,                      # 8: age_risk
-            account_age_risk,              # 9: account_age_risk
-            frequency,                     # 10: frequency
-            amount_deviation,              # 11: amount_deviation
-            merchant_risk                  # 12: merchant_risk
-        ]
-        
-        data.append(features + [is_fraud])
-    
-    # Create DataFrame
-    columns = [
-        'normalized_amount', 'high_amount_flag', 'hour_of_day', 'unusual_hour_flag',
-        'payment_method_risk', 'location_risk', 'device_risk', 'ip_risk',
-        'age_risk', 'account_age_risk', 'frequency', 'amount_deviation', 
-        'merchant_risk', 'is_fraud'
-    ]
-    
-    df = pd.DataFrame(data, columns=columns)
-    
-    print(f"Dataset created: {len(df)} samples")
-    print(f"Fraud rate: {df['is_fraud'].mean():.1%}")
-    
-    # Prepare data
-    X = df.drop('is_fraud', axis=1)
-    y = df['is_fraud']
-    
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
-    
-    # Scale features
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-    
-    # Train model
+    chunk_rows = min(chunk_rows, n_rows)
+
+    t0 = time.perf_counter()
+    dataset = open_dataset(data_dir) if reuse_data else None
+    wanted = {'rows': n_rows, 'chunk_rows': chunk_rows, 'seed': seed, 'generator': GENERATOR_VERSION}
+    if dataset is not None and all(dataset[2].get(k) == v for k, v in wanted.items()):
+        X, y, _ = dataset
+        report("reuse dataset", n_rows, time.perf_counter() - t0)
+    else:
+        X, y, _ = write_dataset(data_dir, n_rows, chunk_rows, seed, n_jobs)
+        report("generate", n_rows, time.perf_counter() - t0)
+    n_train = n_rows - max(int(n_rows * test_size), 1)
+    print(f"Dataset: {n_rows:,} samples in {data_dir} ({X.nbytes / 2**20:,.0f} MB), "
+          f"fraud rate {y.mean():.1%}, train/test {n_train:,}/{n_rows - n_train:,}")
+
+    t0 = time.perf_counter()
+    scaler = fit_scaler(X[:n_train], chunk_rows)
+    report("fit scaler", n_train, time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    scaled_path = os.path.join(data_dir, 'X_scaled.npy')
+    X_scaled = scale_dataset(X, scaler, scaled_path, chunk_rows)
+    report("scale", n_rows, time.perf_counter() - t0)
+
     print("Training model...")
     model = RandomForestClassifier(
         n_estimators=100,
@@ -107,54 +167,86 @@ def create_simple_working_model():
         min_samples_split=5,
         min_samples_leaf=2,
         random_state=42,
-        class_weight='balanced'
+        class_weight='balanced',
+        n_jobs=n_jobs,
+        max_samples=max_samples,
     )
-    
-    model.fit(X_train_scaled, y_train)
-    
+    t0 = time.perf_counter()
+    model.fit(X_scaled[:n_train], y[:n_train])
+    report("train", n_train, time.perf_counter() - t0)
+
     # Evaluate
-    train_pred = model.predict(X_train_scaled)
-    test_pred = model.predict(X_test_scaled)
-    
-    train_acc = accuracy_score(y_train, train_pred)
+    t0 = time.perf_counter()
+    n_eval = min(n_train, EVAL_TRAIN_ROWS)
+    train_acc = accuracy_score(y[:n_eval], predict_chunked(model, X_scaled[:n_eval], chunk_rows))
+    y_test = np.asarray(y[n_train:])
+    test_pred = predict_chunked(model, X_scaled[n_train:], chunk_rows)
     test_acc = accuracy_score(y_test, test_pred)
-    
+    report("evaluate", n_eval + len(y_test), time.perf_counter() - t0)
+    del X_scaled
+    os.remove(scaled_path)
+
     print(f"Training accuracy: {train_acc:.3f}")
     print(f"Testing accuracy: {test_acc:.3f}")
-    
+
     print("\nClassification Report:")
     print(classification_report(y_test, test_pred, target_names=['Safe', 'Fraud']))
-    
+
     # Test with extreme examples
     print("\n=== Testing Extreme Cases ===")
-    
+
     # Very high risk transaction
     high_risk = np.array([[20.0, 1, 2, 1, 0.9, 0.9, 0.8, 0.9, 1, 1, 1, 9.0, 0.9]])
     high_risk_scaled = scaler.transform(high_risk)
     high_pred = model.predict(high_risk_scaled)[0]
     high_prob = model.predict_proba(high_risk_scaled)[0][1]
     print(f"HIGH RISK: Prediction={high_pred} (1=Fraud), Probability={high_prob:.3f}")
-    
+
     # Very low risk transaction
     low_risk = np.array([[0.1, 0, 12, 0, 0.1, 0.1, 0.1, 0.1, 0, 0, 0, 0.5, 0.1]])
     low_risk_scaled = scaler.transform(low_risk)
     low_pred = model.predict(low_risk_scaled)[0]
     low_prob = model.predict_proba(low_risk_scaled)[0][1]
     print(f"LOW RISK: Prediction={low_pred} (0=Safe), Probability={low_prob:.3f}")
-    
+
     # Save model
-    joblib.dump(model, '../models/fraud_detection_model.pkl')
-    joblib.dump(scaler, '../models/scaler.pkl')
-    
+    os.makedirs(model_dir, exist_ok=True)
+    model_path = os.path.join(model_dir, 'fraud_detection_model.pkl')
+    scaler_path = os.path.join(model_dir, 'scaler.pkl')
+    joblib.dump(model, model_path)
+    joblib.dump(scaler, scaler_path)
+    export_compiled_model(model_path, scaler_path, os.path.join(model_dir, 'compiled'))
+    with open(os.path.join(model_dir, 'model_metadata.txt'), 'w') as f:
+        f.write(f"model_type: {type(model).__name__}\nfeatures: {FEATURE_NAMES}\n"
+                f"training_samples: {n_train}\ntest_samples: {n_rows - n_train}\n"
+                f"test_accuracy: {test_acc:.4f}\ncreated_at: {datetime.now().isoformat()}\n")
+
     print("\n✅ Model saved successfully!")
     print("Model should now properly detect fraud vs safe transactions")
-    
+
     return model, scaler
 
+def _max_samples(text):
+    """--max-samples: a row count, or a fraction of the training set when it contains a '.'"""
+    return float(text) if '.' in text else int(text)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset out of core and train the fraud model")
+    parser.add_argument('--rows', type=int, default=10000, help="transactions to generate")
+    parser.add_argument('--chunk-rows', type=int, default=500_000, help="rows generated / scaled / predicted at a time")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--n-jobs', type=int, default=-1, help="generation and training threads (-1: all cores)")
+    parser.add_argument('--max-samples', type=_max_samples, help="bootstrap rows per tree (count or fraction)")
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--data-dir', default=os.path.join(HERE, 'data'), help="where the memmapped dataset goes")
+    parser.add_argument('--reuse-data', action='store_true', help="keep an existing dataset with the same settings")
+    parser.add_argument('--model-dir', default=HERE, help="where the model, scaler and compiled export go")
+    args = parser.parse_args()
     try:
-        model, scaler = create_simple_working_model()
+        model, scaler = create_simple_working_model(args.rows, args.chunk_rows, args.seed, args.n_jobs,
+                                                    args.max_samples, args.test_size, args.data_dir,
+                                                    args.reuse_data, args.model_dir)
     except Exception as e:
         print(f"Error: {e}")
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
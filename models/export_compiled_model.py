@@ -0,0 +1,37 @@
+"""Export the trained forest as a memory-mappable compiled artifact (models/compiled/).
+
+Serving processes map the .npy node arrays read-only instead of unpickling the forest, so
+every pre-forked worker shares a single physical copy of the model pages.
+
+Usage: python models/export_compiled_model.py [--no-fold]
+"""
+import argparse
+import os
+import sys
+import warnings
+import joblib
+warnings.filterwarnings('ignore')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend'))
+from forest import export_artifact
+
+def export_compiled_model(model_path=os.path.join(HERE, 'fraud_detection_model.pkl'),
+                          scaler_path=os.path.join(HERE, 'scaler.pkl'),
+                          out_dir=os.path.join(HERE, 'compiled'), fold=True):
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    forest = export_artifact(model, scaler, out_dir, source_path=model_path, fold=fold, scaler_path=scaler_path)
+    if forest is None:
+        print(f"{type(model).__name__} cannot be compiled; serving will keep using the pickle")
+        return None
+    size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+    print(f"Exported {forest.n_estimators} trees / {len(forest.feature)} nodes "
+          f"({size/1024:.1f} KB, scaler folded: {forest.scaler_folded}) to {out_dir}")
+    return forest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export compiled forest artifact")
+    parser.add_argument('--no-fold', action='store_true', help="keep thresholds in scaled space")
+    args = parser.parse_args()
+    export_compiled_model(fold=not args.no_fold)
@@ -0,0 +1,47 @@
+"""Publish a trained model + scaler into the versioned registry (models/registry/) and manage CURRENT.
+
+Running servers watch CURRENT and hot-swap to the new version without a restart.
+
+Usage:
+    python models/publish_model.py [--model fraud_detection_model.pkl] [--scaler scaler.pkl] [--version V] [--no-activate]
+    python models/publish_model.py --list
+    python models/publish_model.py --activate V          # roll forward or back to an existing version
+"""
+import argparse
+import os
+import sys
+import warnings
+warnings.filterwarnings('ignore')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend'))
+from registry import current_version, list_versions, publish, set_current
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish a model version to the registry")
+    parser.add_argument('--model', default=os.path.join(HERE, 'fraud_detection_model.pkl'))
+    parser.add_argument('--scaler', default=os.path.join(HERE, 'scaler.pkl'))
+    parser.add_argument('--model-dir', default=os.environ.get('FRAUDCHECK_MODEL_DIR', HERE),
+                        help="directory holding registry/ (default: FRAUDCHECK_MODEL_DIR or models/)")
+    parser.add_argument('--version', help="version name (default: <timestamp>-<model digest>)")
+    parser.add_argument('--no-activate', action='store_true', help="publish without switching CURRENT")
+    parser.add_argument('--no-fold', action='store_true', help="keep compiled thresholds in scaled space")
+    parser.add_argument('--activate', metavar='VERSION', help="only point CURRENT at an existing version")
+    parser.add_argument('--list', action='store_true', help="list published versions")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        active = current_version(args.model_dir)
+        for v in list_versions(args.model_dir):
+            print(f"{'*' if v == active else ' '} {v}")
+        return
+    if args.activate:
+        set_current(args.model_dir, args.activate)
+        print(f"CURRENT -> {args.activate}")
+        return
+    version = publish(args.model, args.scaler, args.model_dir, args.version, activate=not args.no_activate,
+                      fold=not args.no_fold)
+    print(f"Published {version}{' (now CURRENT)' if not args.no_activate else ''}")
+
+if __name__ == "__main__":
+    main()
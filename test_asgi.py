@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import warnings
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+warnings.filterwarnings('ignore')
+
+import asgi
+
+TX = {'amount': 100, 'payment_method': 'credit_card'}
+
+
+async def _call(path, payload, method='POST', headers=()):
+    sent = []
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    messages = iter([{'type': 'http.request', 'body': body}])
+
+    async def receive():
+        return next(messages)
+
+    async def send(msg):
+        sent.append(msg)
+    scope = {'type': 'http', 'method': method, 'path': path, 'headers': list(headers)}
+    await asgi.app(scope, receive, send)
+    return sent[0]['status'], dict(sent[0]['headers']), json.loads(sent[1]['body'])
+
+
+def test_full_pool_answers_429_and_failures_are_not_completions():
+    assert asgi.core.load_model(watch=False)
+    pool, release = asgi.InferencePool(1, 1), threading.Event()
+    saved = asgi.pool, asgi.core.predict_payload
+
+    def slow(data, start=None):
+        assert release.wait(10)
+        if data.get('fail'):
+            raise RuntimeError("scoring blew up")
+        return saved[1](data, start)
+
+    async def scenario():
+        running = asyncio.ensure_future(_call('/api/predict', TX))
+        queued = asyncio.ensure_future(_call('/api/predict', {**TX, 'fail': True}))
+        while pool.pending < 2:  # one on the worker, one waiting for it
+            await asyncio.sleep(0.005)
+        rejected = await _call('/api/predict', TX)
+        release.set()
+        return rejected, await running, await queued
+    asgi.pool, asgi.core.predict_payload = pool, slow
+    try:
+        rejected, ok, failed = asyncio.run(scenario())
+    finally:
+        asgi.pool, asgi.core.predict_payload = saved
+        release.set()
+        pool.executor.shutdown(wait=True)
+    assert rejected[0] == 429 and rejected[1][b'retry-after'] == str(asgi.RETRY_AFTER_S).encode()
+    assert ok[0] == 200 and 'is_fraud' in ok[2]
+    assert failed[0] == 500
+    assert pool.metrics() == {'workers': 1, 'capacity': 2, 'in_flight': 0, 'completed': 1, 'failed': 1,
+                              'rejected': 1, 'max_pending': 2}
+
+
+def test_only_a_malformed_body_is_a_client_error(monkeypatch):
+    assert asgi.core.load_model(watch=False)
+    for body in (b'{"amount": ', b'\xff\xfe'):
+        status, _, resp = asyncio.run(_call('/api/predict', body))
+        assert status == 400 and resp == {'error': 'Invalid JSON body'}
+
+    def broken(data, start=None):
+        raise ValueError("Expected (n, 13) input, got (1, 12)")
+    monkeypatch.setattr(asgi.core, 'predict_payload', broken)
+    status, _, resp = asyncio.run(_call('/api/predict', TX))
+    assert status == 500 and resp['error'] == 'Internal server error'
+
+
+def test_profile_needs_the_admin_token(monkeypatch):
+    monkeypatch.setattr(asgi.core, 'ADMIN_TOKEN', 'secret')
+    assert asyncio.run(_call('/api/profile', {'requests': 1}))[0] == 401
+    assert asyncio.run(_call('/api/profile', None, 'GET', [(b'x-admin-token', b'wrong')]))[0] == 401
+    assert not asgi.core.profiler.active
+    status, _, body = asyncio.run(_call('/api/profile', None, 'GET', [(b'x-admin-token', b'secret')]))
+    assert status == 200 and body['active'] is False
+
+
+if __name__ == '__main__':
+    test_full_pool_answers_429_and_failures_are_not_completions()
+    print("ASGI inference pool OK")
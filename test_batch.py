@@ -0,0 +1,61 @@
+import os
+import sys
+import warnings
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+warnings.filterwarnings('ignore')
+
+import app
+from test_features import load_testcase_payloads
+
+FIELDS = ('is_fraud', 'fraud_probability', 'risk_level', 'decided_by', 'fallback_used', 'reason_codes')
+
+
+def _client():
+    assert app.load_model(watch=False)
+    return app.app.test_client()
+
+
+def test_batch_results_keep_input_order_and_match_single_predictions():
+    client = _client()
+    payloads = load_testcase_payloads()
+    items = payloads[::-1] + payloads
+    out = client.post('/api/predict/batch', json={'transactions': items}).get_json()
+    assert out['count'] == len(items) and out['errors'] == 0
+    assert [r['index'] for r in out['results']] == list(range(len(items)))
+    singles = [client.post('/api/predict', json=p).get_json() for p in items]
+    assert [{k: r.get(k) for k in FIELDS} for r in out['results']] == [{k: s.get(k) for k in FIELDS} for s in singles]
+    assert len({r['fraud_probability'] for r in out['results']}) > 1
+    # a bare list is the same request
+    bare = client.post('/api/predict/batch', json=items).get_json()
+    assert [r['fraud_probability'] for r in bare['results']] == [r['fraud_probability'] for r in out['results']]
+
+
+def test_invalid_items_fail_alone():
+    client = _client()
+    good = load_testcase_payloads()[:2]
+    items = [good[0], {'amount': 50}, 'not a transaction', None, {'payment_method': 'paypal'}, good[1]]
+    out = client.post('/api/predict/batch', json=items).get_json()
+    assert out['count'] == 6 and out['errors'] == 4
+    assert [r['index'] for r in out['results']] == list(range(6))
+    assert [r.get('error') for r in out['results'][1:5]] == ['Missing required fields'] * 4
+    assert 'is_fraud' in out['results'][0] and 'is_fraud' in out['results'][5]
+    assert out['results'][5]['fraud_probability'] == client.post('/api/predict', json=good[1]).get_json()['fraud_probability']
+    for body in ([], {'transactions': []}, {'transactions': 'x'}, {'amount': 5}):
+        assert client.post('/api/predict/batch', json=body).status_code == 400
+
+
+def test_batch_size_limit(monkeypatch):
+    client = _client()
+    monkeypatch.setattr(app, 'MAX_BATCH_SIZE', 5)
+    tx = load_testcase_payloads()[0]
+    assert client.post('/api/predict/batch', json=[tx] * 5).status_code == 200
+    resp = client.post('/api/predict/batch', json=[tx] * 6)
+    assert resp.status_code == 413 and resp.get_json()['error'] == 'Batch too large (max 5)'
+
+
+if __name__ == '__main__':
+    test_batch_results_keep_input_order_and_match_single_predictions()
+    test_invalid_items_fail_alone()
+    print("Batch endpoint OK")
@@ -0,0 +1,147 @@
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from batcher import MicroBatcher
+
+
+class Gate:
+    """score_fn that doubles column 0, records batch sizes and holds every flush until released"""
+
+    def __init__(self):
+        self.sizes, self.entered, self.open = [], threading.Event(), threading.Event()
+
+    def __call__(self, matrix):
+        self.sizes.append(len(matrix))
+        self.entered.set()
+        assert self.open.wait(10)
+        return matrix[:, 0] * 2, matrix[:, 0] + 1
+
+
+def _submit_all(batcher, values):
+    results = [None] * len(values)
+
+    def worker(i):
+        try:
+            results[i] = batcher.submit(np.array([[values[i], 0.0]]))
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(values))]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+def _wait_for(cond, timeout=5.0):
+    end = time.time() + timeout
+    while not cond():
+        assert time.time() < end, "timed out"
+        time.sleep(0.002)
+
+
+def test_rows_queued_behind_a_flush_are_coalesced_in_order():
+    gate = Gate()
+    batcher = MicroBatcher(gate, max_batch=8, max_wait_ms=2.0)
+    first, first_result = _submit_all(batcher, [100.0])
+    assert gate.entered.wait(5)
+    threads, results = _submit_all(batcher, list(range(16)))
+    _wait_for(lambda: batcher._queue.qsize() == 16)
+    gate.open.set()
+    for t in first + threads:
+        t.join(5)
+    assert gate.sizes == [1, 8, 8]
+    assert first_result == [(200.0, 101.0)] and results == [(2.0 * i, i + 1.0) for i in range(16)]
+    m = batcher.metrics()
+    assert m['requests'] == 17 and m['batches'] == 3 and m['max_batch_size'] == 8
+    batcher.close(5)
+
+
+def test_a_busy_window_flushes_a_partial_batch_on_timeout():
+    gate = Gate()
+    gate.open.set()
+    batcher = MicroBatcher(gate, max_batch=64, max_wait_ms=50.0)
+    batcher._gap_ewma = 0.01  # busy traffic: the window is the full 50 ms
+    start = time.perf_counter()
+    assert batcher.submit(np.array([[3.0, 0.0]])) == (6.0, 4.0)
+    waited = time.perf_counter() - start
+    assert gate.sizes == [1] and 0.045 <= waited < 2.0
+    m = batcher.metrics()
+    assert m['immediate_flushes'] == 0 and m['max_wait_ms'] >= 45
+    batcher._gap_ewma = float('inf')  # light traffic: a lone row goes at once
+    assert batcher.submit(np.array([[1.0, 0.0]])) == (2.0, 2.0)
+    assert batcher.metrics()['immediate_flushes'] == 1
+    batcher.close(5)
+
+
+def test_scoring_errors_reach_every_caller_of_the_batch():
+    calls = []
+
+    def score(matrix):
+        calls.append(len(matrix))
+        if len(calls) == 2:
+            raise ValueError("model exploded")
+        if len(calls) == 1:
+            _wait_for(lambda: batcher._queue.qsize() == 3)  # the next rows queue up behind this flush
+        return (matrix[:, 0],)
+    batcher = MicroBatcher(score, max_batch=8)
+    first, _ = _submit_all(batcher, [0.0])
+    _wait_for(lambda: calls)
+    threads, results = _submit_all(batcher, [1.0, 2.0, 3.0])
+    for t in first + threads:
+        t.join(5)
+    assert calls[1] == 3 and all(isinstance(r, ValueError) for r in results)
+    assert batcher.submit(np.array([[5.0, 0.0]])) == (5.0,)  # the flush thread survives
+    batcher.close(5)
+
+
+def test_close_scores_queued_rows_then_refuses_new_ones():
+    gate = Gate()
+    batcher = MicroBatcher(gate, max_batch=4)
+    first, _ = _submit_all(batcher, [0.0])
+    assert gate.entered.wait(5)
+    threads, results = _submit_all(batcher, list(range(6)))
+    _wait_for(lambda: batcher._queue.qsize() == 6)
+    closer = threading.Thread(target=batcher.close)
+    closer.start()
+    _wait_for(lambda: batcher._closed)
+    try:
+        batcher.submit(np.array([[9.0, 0.0]]))
+        assert False, "a closed batcher accepted a row"
+    except RuntimeError:
+        pass
+    gate.open.set()
+    closer.join(5)
+    for t in first + threads:
+        t.join(5)
+    assert results == [(2.0 * i, i + 1.0) for i in range(6)] and gate.sizes == [1, 4, 2]
+    assert not batcher._thread.is_alive()
+    batcher.close()  # idempotent
+
+
+def test_batched_scoring_holds_the_bundle_for_a_reload_drain(monkeypatch):
+    import app
+    assert app.load_model(watch=False)
+    bundle, seen = app.current, []
+    score_matrix = app.score_matrix
+
+    def spy(fv, b=None, anytime=None):
+        seen.append(bundle.in_flight())
+        return score_matrix(fv, b, anytime)
+    monkeypatch.setattr(app, 'score_matrix', spy)
+    batcher = MicroBatcher(app.score_versioned)
+    pred, prob, tier, version = batcher.submit(np.array([app.FALLBACK_VECTOR]))
+    assert seen == [1] and bundle.in_flight() == 0 and version == bundle.version
+    batcher.close(5)
+
+
+if __name__ == '__main__':
+    test_rows_queued_behind_a_flush_are_coalesced_in_order()
+    test_a_busy_window_flushes_a_partial_batch_on_timeout()
+    test_scoring_errors_reach_every_caller_of_the_batch()
+    test_close_scores_queued_rows_then_refuses_new_ones()
+    print("Micro-batcher OK")
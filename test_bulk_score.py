@@ -0,0 +1,117 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+import warnings
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+warnings.filterwarnings('ignore')
+
+import bulk_score
+from test_features import load_testcase_payloads
+
+FIELDS = ('transaction_id', 'amount', 'payment_method', 'country', 'device_info', 'ip_risk', 'customer_age',
+          'account_age', 'daily_transactions', 'avg_transaction', 'merchant_category', 'transaction_time')
+
+WORKER_PROBE = """
+import json, sys
+sys.path.insert(0, %r)
+import bulk_score
+bulk_score._init_worker()
+core = bulk_score._core
+print(json.dumps({'model': core.current is not None, 'trainer': core._trainer is not None,
+                  'velocity': core.velocity is not None, 'stats_db': core.stats.path,
+                  'watcher': core._watcher is not None}))
+""" % os.path.join(ROOT, 'backend')
+
+
+def _transactions():
+    rows = [{k: p[k] for k in FIELDS if k in p} for p in load_testcase_payloads()]
+    for i, row in enumerate(rows):
+        row['transaction_id'] = f'tx-{i}'
+    return rows
+
+
+def _read(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_jsonl_and_csv_score_alike_in_input_order(tmp_path):
+    rows = _transactions()
+    bad = {**rows[0], 'transaction_id': 'tx-bad', 'amount': 'lots'}
+    lines = [json.dumps(r) for r in rows[:3]] + ['{not json', '[1, 2]', json.dumps(bad),
+                                                 json.dumps({'transaction_id': 'tx-short', 'amount': 5})]
+    lines += [json.dumps(r) for r in rows[3:]]
+    jsonl = tmp_path / 'in.jsonl'
+    jsonl.write_text('\n'.join(lines) + '\n')
+    bulk_score.run(str(jsonl), str(tmp_path / 'out.jsonl'), chunk_size=4, workers=0)
+    out = _read(tmp_path / 'out.jsonl')
+    assert [o['row'] for o in out] == list(range(len(lines)))
+    assert [o.get('transaction_id') for o in out[:3] + out[7:]] == [r['transaction_id'] for r in rows]
+    assert [o['error'] for o in out[3:7]] == ['Invalid JSON', 'Expected a JSON object',
+                                              'Unparseable transaction fields', 'Missing required fields']
+    assert out[5]['transaction_id'] == 'tx-bad'
+    assert not any(o.get('fallback_used') for o in out[:3] + out[7:])
+
+    # CSV cells are strings, and a blank cell is a missing field rather than an unparseable ""
+    with open(tmp_path / 'in.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows(rows[:-1])
+        writer.writerow({**rows[-1], 'avg_transaction': ''})
+        writer.writerow({**rows[0], 'transaction_id': 'tx-blank', 'amount': ''})
+    bulk_score.run(str(tmp_path / 'in.csv'), str(tmp_path / 'out-csv.jsonl'), chunk_size=4, workers=0)
+    from_csv = _read(tmp_path / 'out-csv.jsonl')
+    assert [o['row'] for o in from_csv] == list(range(len(rows) + 1))
+    expected = out[:3] + out[7:]
+    del rows[-1]['avg_transaction']
+    last = bulk_score.score_chunk(len(rows) - 1, [rows[-1]])
+    expected[-1] = json.loads(last)
+    for got, want in zip(from_csv, expected):
+        assert {**got, 'row': None} == {**want, 'row': None}
+    assert from_csv[-1]['error'] == 'Missing required fields'
+
+
+def test_resume_continues_from_the_checkpoint(tmp_path, monkeypatch):
+    rows = _transactions()
+    src = tmp_path / 'in.jsonl'
+    src.write_text(''.join(json.dumps(r) + '\n' for r in rows * 5))
+    full, partial = str(tmp_path / 'full.jsonl'), str(tmp_path / 'partial.jsonl')
+    assert bulk_score.run(str(src), full, chunk_size=7, workers=0) == len(rows) * 5
+
+    save, saved = bulk_score._save_checkpoint, []
+
+    def crash_on_third(path, state):
+        if len(saved) == 2:
+            raise KeyboardInterrupt  # the third chunk is written out but never checkpointed
+        saved.append(dict(state))
+        save(path, state)
+    monkeypatch.setattr(bulk_score, '_save_checkpoint', crash_on_third)
+    try:
+        bulk_score.run(str(src), partial, chunk_size=7, workers=0)
+    except KeyboardInterrupt:
+        pass
+    assert saved[-1]['rows'] == 14 and len(_read(partial)) == 21
+    monkeypatch.setattr(bulk_score, '_save_checkpoint', save)
+    assert bulk_score.run(str(src), partial, chunk_size=7, workers=0, resume=True) == len(rows) * 5 - 14
+    assert _read(partial) == _read(full)
+
+
+def test_scoring_workers_start_no_server_side_state(tmp_path):
+    env = {**os.environ, 'FRAUDCHECK_TRAINER': '1', 'FRAUDCHECK_VELOCITY': '1',
+           'FRAUDCHECK_STATS_DB': str(tmp_path / 'shared.sqlite3')}
+    out = subprocess.run([sys.executable, '-c', WORKER_PROBE], cwd=tmp_path, capture_output=True, text=True,
+                         env=env, check=True).stdout
+    state = json.loads(out.strip().splitlines()[-1])
+    assert state == {'model': True, 'trainer': False, 'velocity': False, 'stats_db': None, 'watcher': False}
+    assert not (tmp_path / 'shared.sqlite3').exists()
+
+
+if __name__ == '__main__':
+    import tempfile, pathlib
+    with tempfile.TemporaryDirectory() as d:
+        test_jsonl_and_csv_score_alike_in_input_order(pathlib.Path(d))
+    print("Bulk scoring OK")
@@ -0,0 +1,80 @@
+import os
+import sys
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+import cache as cache_module
+from cache import PredictionCache
+
+TX = {'amount': 100, 'payment_method': 'credit_card'}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    c = PredictionCache(max_size=10, ttl_seconds=5.0, version='v1')
+    row = np.arange(13.0)
+    c.put(row, (1, 0.9, 'model'))
+    clock.now += 5.0
+    assert c.get(row) == (1, 0.9, 'model')  # still within the ttl
+    clock.now += 0.5
+    assert c.get(row) is None and c.get(row) is None
+    m = c.metrics()
+    assert m['hits'] == 1 and m['expirations'] == 1 and m['misses'] == 2 and m['size'] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    c = PredictionCache(max_size=2, ttl_seconds=60.0)
+    a, b, d = np.zeros(13), np.ones(13), np.full(13, 2.0)
+    c.put(a, 'a')
+    c.put(b, 'b')
+    assert c.get(a) == 'a'  # b is now the least recently used
+    c.put(d, 'd')
+    assert c.get(b) is None and c.get(a) == 'a' and c.get(d) == 'd'
+    assert c.metrics()['evictions'] == 1 and c.metrics()['size'] == 2
+    c.put(a, 'a2')  # an update refreshes the entry in place
+    assert c.metrics()['size'] == 2 and c.get(a) == 'a2'
+    assert c.get(a.astype(np.float32)) == 'a2'  # keyed on float64 values, whatever the input dtype
+
+
+def test_invalidate_switches_the_version():
+    c = PredictionCache(max_size=10, ttl_seconds=60.0, version='v1')
+    row = np.zeros(13)
+    c.put(row, 'old')
+    c.invalidate('v2')
+    assert c.version == 'v2' and c.get(row) is None and c.get(row, 'v1') is None
+    c.put(row, 'held', 'v1')  # a request still on v1 during the swap writes under its own version
+    assert c.get(row) is None and c.get(row, 'v1') == 'held'
+    assert c.metrics()['invalidations'] == 1
+
+
+def test_model_swap_never_serves_a_previous_models_result(monkeypatch):
+    import app
+    assert app.load_model(watch=False)
+    monkeypatch.setattr(app, 'cache', PredictionCache(max_size=100, ttl_seconds=60.0))
+    client = app.app.test_client()
+    first = client.post('/api/predict', json=TX).get_json()
+    assert client.post('/api/predict', json=TX).get_json()['fraud_probability'] == first['fraud_probability']
+    assert app.cache.metrics()['hits'] == 1
+    old = app.current
+    app.cache.put(app.preprocess(TX)[0], (1, 0.999, 'model'), old.cache_tag)
+    assert client.post('/api/predict', json=TX).get_json()['fraud_probability'] == 0.999
+    app._activate(app._load_bundle(old.version, old.directory))  # same version, new generation
+    assert app.current.cache_tag != old.cache_tag and app.cache.metrics()['size'] == 0
+    assert client.post('/api/predict', json=TX).get_json()['fraud_probability'] == first['fraud_probability']
+
+
+if __name__ == '__main__':
+    test_least_recently_used_entry_is_evicted()
+    test_invalidate_switches_the_version()
+    print("Prediction cache OK")
@@ -0,0 +1,73 @@
+import os
+import sys
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from cascade import CascadeBand, calibrate, heuristic_proba
+
+SAFE = {'amount': 12.5, 'payment_method': 'debit_card', 'country': 'US', 'device_info': 'desktop', 'ip_risk': 1,
+        'account_age': 900, 'merchant_category': 'grocery', 'transaction_time': '14:00'}
+RISKY = {'amount': 8500, 'payment_method': 'cryptocurrency', 'country': 'NG', 'device_info': 'mobile', 'ip_risk': 9,
+         'account_age': 5, 'daily_transactions': 14, 'avg_transaction': 120, 'merchant_category': 'gambling',
+         'transaction_time': '02:45'}
+
+
+def test_heuristic_matches_scalar_formula():
+    fv = np.random.default_rng(1).random((50, 13)) * 3
+    for row, prob in zip(fv, heuristic_proba(fv)):
+        amt_norm, high_amt, _, un_hour, pay, loc, dev, ip, age, acct, freq, deviat, merch = row
+        score = (high_amt*1.2 + un_hour*0.6 + pay*1.1 + loc*1.0 + dev*0.9 + ip*1.3 + acct*0.7 + freq*0.8 +
+                 deviat*0.15 + merch*1.0 + age*0.4 + amt_norm*0.05)
+        assert prob == 1/(1+np.exp(-score + 3.5))
+
+
+def test_calibrate_finds_narrowest_band_meeting_target():
+    rng = np.random.default_rng(0)
+    h = rng.random(3000)
+    y = rng.random(3000) < h ** 3  # the model mostly agrees with the heuristic at the extremes
+    band = calibrate(h, y, 0.97)
+    decided = np.where(band.needs_model(h), y, h > 0.5)
+    assert (decided == y).mean() >= 0.97
+    assert abs(band.calibration['model_share'] - band.needs_model(h).mean()) < 1e-6
+    # No band over the same candidate grid sends fewer rows to the model
+    cands = np.unique(np.quantile(h, np.linspace(0, 1, 512)))
+    for low in np.concatenate([[0.0, 0.5], cands[cands <= 0.5]])[::7]:
+        for high in np.concatenate([[0.5, 1.0], cands[cands >= 0.5]])[::7]:
+            need = (h >= low) & (h <= high)
+            if (np.where(need, y, h > 0.5) == y).mean() >= 0.97:
+                assert need.mean() >= band.calibration['model_share'] - 1e-6
+    assert calibrate(h, ~(h > 0.5), 0.99).low == 0.0  # heuristic always wrong: everything to the model
+    try:
+        CascadeBand(0.6, 0.9)
+        assert False, "band not straddling 0.5 accepted"
+    except ValueError:
+        pass
+
+
+def test_cascade_records_deciding_tier(monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'CASCADE', True)
+    monkeypatch.setattr(app, 'CASCADE_BAND', '0.2,0.995')
+    assert app.load_model(watch=False)
+    assert app.current.cascade.low == 0.2
+    app.reset_payload()
+    client = app.app.test_client()
+    safe = client.post('/api/predict', json=SAFE).get_json()
+    risky = client.post('/api/predict', json=RISKY).get_json()
+    assert safe['decided_by'] == 'heuristic' and not safe['is_fraud'] and not safe['fallback_used']
+    assert risky['decided_by'] == 'model' and risky['is_fraud']
+    batch = client.post('/api/predict/batch', json=[SAFE, RISKY, SAFE]).get_json()['results']
+    assert [r['decided_by'] for r in batch] == ['heuristic', 'model', 'heuristic']
+    assert batch[1]['fraud_probability'] == risky['fraud_probability']
+    assert client.get('/api/health').get_json()['cascade']['decisions'] == {'heuristic': 3, 'model': 2, 'fallback': 0}
+    assert 'fraudcheck_decisions_total{tier="heuristic"} 3' in client.get('/metrics').get_data(as_text=True)
+    monkeypatch.setattr(app, 'CASCADE', False)
+    assert client.post('/api/predict', json=SAFE).get_json()['decided_by'] == 'model'
+
+
+if __name__ == '__main__':
+    test_heuristic_matches_scalar_formula()
+    test_calibrate_finds_narrowest_band_meeting_target()
+    print("Cascade OK")
@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import sys
+import warnings
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'models'))
+warnings.filterwarnings('ignore')
+
+from distill_model import distill, select, soft_fit
+from registry import current_version
+
+
+def _model_dir(tmp_path):
+    model_dir = str(tmp_path / 'models')
+    os.makedirs(model_dir)
+    for name in ('fraud_detection_model.pkl', 'scaler.pkl'):
+        shutil.copyfile(os.path.join(ROOT, 'models', name), os.path.join(model_dir, name))
+    return model_dir
+
+
+def test_soft_labels_and_selection():
+    from sklearn.linear_model import LogisticRegression
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(4000, 2))
+    p = 1 / (1 + np.exp(-(2 * X[:, 0] - X[:, 1])))
+    model = soft_fit(LogisticRegression(C=100.0), X, p)
+    np.testing.assert_allclose(model.coef_[0], [2, -1], atol=0.1)  # recovers the teacher's probabilities
+    results = [{'name': 'teacher', 'agreement': 1.0, 'p50_us': 80, 'p99_us': 120, 'batch_us_per_row': 3.5},
+               {'name': 'small', 'agreement': 0.992, 'p50_us': 60, 'p99_us': 90, 'batch_us_per_row': 0.4},
+               {'name': 'smaller', 'agreement': 0.97, 'p50_us': 55, 'p99_us': 80, 'batch_us_per_row': 0.3},
+               {'name': 'bumpy', 'agreement': 0.999, 'p50_us': 70, 'p99_us': 900, 'batch_us_per_row': 0.35}]
+    assert select(results, 0.99)['name'] == 'bumpy'
+    assert select(results, 0.99, budget_us=200)['name'] == 'small'
+    assert select(results, 0.999, budget_us=200)['name'] == 'teacher'
+    assert select(results, 0.99, batch_budget_us=0.1) is None
+
+
+def test_distilled_model_is_a_drop_in(tmp_path):
+    import app
+    model_dir, output = _model_dir(tmp_path), str(tmp_path / 'distilled')
+    results, chosen = distill(model_dir, n_rows=4000, min_agreement=0.95, output=output,
+                              only=['teacher-10', 'forest-10x4', 'linear'])
+    assert [r['name'] for r in results] == ['teacher', 'teacher-10', 'forest-10x4', 'linear']
+    assert results[0]['agreement'] == 1.0 and results[0]['prob_mae'] == 0.0
+    assert not results[3]['compiled'] and all(r['compiled'] for r in results[:3])
+    assert chosen is not None and chosen['name'] != 'teacher' and chosen['agreement'] >= 0.95
+    with open(os.path.join(output, 'distill.json')) as f:
+        assert json.load(f)['selected']['name'] == chosen['name']
+    bundle = app._load_bundle('distilled', output)
+    probe = np.tile(app.FALLBACK_VECTOR, (4, 1))
+    assert app.infer(probe, bundle)[1].shape == (4,)
+
+    _, published = distill(model_dir, n_rows=4000, min_agreement=0.95, publish_to=model_dir, only=['teacher-10'])
+    assert published['name'] == 'teacher-10' and current_version(model_dir) == published['version']
+    with open(os.path.join(model_dir, 'registry', published['version'], 'version.json')) as f:
+        info = json.load(f)
+    assert info['distillation']['name'] == 'teacher-10' and info['compiled']
+    bundle = app._load_bundle(published['version'], os.path.join(model_dir, 'registry', published['version']))
+    assert bundle.compiled.scaler_folded and bundle.compiled.n_estimators == 10
+
+
+if __name__ == '__main__':
+    import tempfile, pathlib
+    test_soft_labels_and_selection()
+    with tempfile.TemporaryDirectory() as d:
+        test_distilled_model_is_a_drop_in(pathlib.Path(d))
+    print("Distillation OK")
@@ -0,0 +1,131 @@
+import os
+import sys
+import numpy as np
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from features import build_matrix
+from workload import load_testcase_payloads
+
+
+# Frozen copy of the original per-row preprocess, kept as the parity oracle
+def legacy_preprocess(transaction_data):
+    """Feature engineering producing 13-feature vector"""
+    try:
+        features = []
+        amount = float(transaction_data.get('amount', 0))
+        features.append(min(amount / 10000, 20))
+        features.append(1 if amount > 5000 else 0)
+        transaction_time = transaction_data.get('transaction_time', datetime.now().strftime('%H:%M'))
+        hour = int(transaction_time.split(':')[0])
+        features.append(hour)
+        features.append(1 if hour < 6 or hour > 22 else 0)
+        payment_method = transaction_data.get('payment_method', 'credit_card')
+        payment_risk_map = {
+            'credit_card': 0.10,'debit_card': 0.05,'prepaid_card': 0.30,'gift_card': 0.35,
+            'paypal': 0.15,'venmo': 0.20,'apple_pay': 0.12,'google_pay': 0.12,
+            'alipay': 0.25,'wechat_pay': 0.25,'bank_transfer': 0.08,'wire_transfer': 0.20,
+            'digital_wallet': 0.20,'cryptocurrency': 0.50,'cash': 0.02
+        }
+        payment_method_risk = payment_risk_map.get(payment_method, 0.15)
+        features.append(payment_method_risk)
+        country = transaction_data.get('country', 'US')
+        high_risk = {'NG','RO','RU','CN','TR','EG','GH','KE','PH','VN','ID'}
+        medium_risk = {'BR','MX','AR','IN','ZA','KR','SG','HK'}
+        if country in high_risk: location_risk = 0.85
+        elif country in medium_risk: location_risk = 0.45
+        else: location_risk = 0.12
+        features.append(location_risk)
+        device_info = transaction_data.get('device_info', 'desktop')
+        device_risk_map = {
+            'mobile':0.60,'tablet':0.30,'desktop':0.10,'laptop':0.15,'smartwatch':0.70,
+            'atm':0.05,'pos':0.08,'unknown':0.25
+        }
+        device_risk = device_risk_map.get(device_info, 0.20)
+        features.append(device_risk)
+        ip_risk = float(transaction_data.get('ip_risk', 2)) / 10
+        features.append(ip_risk)
+        customer_age = int(transaction_data.get('customer_age', 35))
+        features.append(1 if customer_age < 21 or customer_age > 65 else 0)
+        account_age = int(transaction_data.get('account_age', 365))
+        features.append(1 if account_age < 30 else 0)
+        daily_transactions = int(transaction_data.get('daily_transactions', 1))
+        high_freq_flag = 1 if daily_transactions > 10 else 0
+        features.append(high_freq_flag)
+        avg_transaction = float(transaction_data.get('avg_transaction', amount))
+        if avg_transaction > 0:
+            amount_deviation = abs(amount - avg_transaction) / avg_transaction
+        else:
+            amount_deviation = 0
+        features.append(min(amount_deviation, 5))
+        merchant_category = transaction_data.get('merchant_category', 'retail')
+        high_merch = {'gambling','adult_content','cryptocurrency','cryptocurrency_exchange','luxury_goods','financial_services'}
+        med_merch = {'travel','entertainment','online_shopping','ride_sharing','subscriptions','logistics','food_delivery','electronics'}
+        if merchant_category in high_merch: merchant_risk = 0.72
+        elif merchant_category in med_merch: merchant_risk = 0.32
+        else: merchant_risk = 0.12
+        features.append(merchant_risk)
+        # Synergistic boost
+        risk_flags = sum([
+            amount > 5000,
+            hour < 6 or hour > 22,
+            payment_method_risk >= 0.3,
+            location_risk >= 0.8,
+            device_risk >= 0.6,
+            high_freq_flag == 1
+        ])
+        if risk_flags >= 3:
+            features[11] = min(features[11] * (1 + (risk_flags * 0.05)), 10)
+        return np.array(features).reshape(1, -1)
+    except Exception:
+        return np.array([[0.1,0,12,0,0.1,0.1,0.1,0.2,0,0,0,0.1,0.1]])
+
+
+
+EDGE_CASES = [
+    {},
+    {'amount': 8500, 'payment_method': 'cryptocurrency', 'country': 'NG', 'device_info': 'mobile',
+     'daily_transactions': 14, 'transaction_time': '02:45', 'avg_transaction': 120},
+    {'amount': '150.00', 'payment_method': 'paypal', 'customer_age': '19', 'ip_risk': '7.5'},
+    {'amount': 100, 'payment_method': 'cash', 'customer_age': 65.9, 'account_age': 29.99},
+    {'amount': 100, 'payment_method': 'cash', 'customer_age': '35.5'},
+    {'amount': 'abc', 'payment_method': 'cash'},
+    {'amount': 100, 'payment_method': 'cash', 'transaction_time': 'noon'},
+    {'amount': 100, 'payment_method': 'cash', 'transaction_time': None},
+    {'amount': 100, 'payment_method': ['cash']},
+    {'amount': 100, 'payment_method': 'cash', 'avg_transaction': 0},
+    {'amount': 100, 'payment_method': 'cash', 'avg_transaction': -5},
+    {'amount': 250000, 'payment_method': 'gift_card', 'avg_transaction': 10, 'device_info': 'smartwatch',
+     'transaction_time': '23:59'},
+    {'amount': 100, 'payment_method': 'cash', 'daily_transactions': True},
+    {'amount': 100, 'payment_method': 'cash', 'account_age': float('nan')},
+]
+
+
+def test_build_matrix_matches_legacy_preprocess():
+    payloads = load_testcase_payloads() + EDGE_CASES
+    assert len(payloads) >= 12
+    expected = np.vstack([legacy_preprocess(p) for p in payloads])
+    np.testing.assert_array_equal(build_matrix(payloads), expected)
+    # Single rows take the scalar path, full batches the vectorized one
+    for p, row in zip(payloads, expected):
+        np.testing.assert_array_equal(build_matrix([p])[0], row)
+    np.testing.assert_array_equal(build_matrix(payloads * 10), np.vstack([expected] * 10))
+
+
+def test_build_matrix_accepts_columns():
+    payloads = load_testcase_payloads()
+    keys = sorted({k for p in payloads for k in p})
+    columns = {k: [p[k] for p in payloads] for k in keys}
+    np.testing.assert_array_equal(build_matrix(columns), build_matrix(payloads))
+    numeric = {k: np.asarray(v) for k, v in columns.items()}
+    np.testing.assert_array_equal(build_matrix(numeric), build_matrix(payloads))
+
+
+if __name__ == '__main__':
+    test_build_matrix_matches_legacy_preprocess()
+    test_build_matrix_accepts_columns()
+    print("Feature engine matches legacy preprocess")
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+import shutil
+import sys
+import warnings
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'models'))
+warnings.filterwarnings('ignore')
+
+from features import build_matrix
+from feedback import RECORD, FeedbackLog, read_segment, segments
+from registry import current_version, resolve
+from trainer import _lock, read_new, reservoir_add, run_once, trainer_status
+from calibrate_cascade import synthetic_transactions
+
+
+def _feedback(n, seed):
+    """Everyday transactions before 10:00 turn out to be fraud: a pattern the served model has never seen"""
+    X = build_matrix(synthetic_transactions(n, seed, risky_share=0))
+    y = (X[:, 2] < 10).astype(np.uint8)
+    return [f'tx-{seed}-{i}' for i in range(n)], X, y
+
+
+def test_log_rotates_and_reads_back(tmp_path):
+    log = FeedbackLog(str(tmp_path), segment_bytes=RECORD.itemsize * 50)
+    txids, X, y = _feedback(120, 0)
+    for i in range(0, 120, 30):
+        log.append(txids[i:i + 30], X[i:i + 30], y[i:i + 30])
+    log.close()
+    paths = segments(str(tmp_path))
+    assert len(paths) == 2  # 60 + 60 records: a write lands whole in the segment it starts in
+    records = np.concatenate([read_segment(p) for p in paths])
+    assert records['txid'].tolist() == [t.encode() for t in txids]
+    np.testing.assert_array_equal(records['x'], X)
+    np.testing.assert_array_equal(records['label'], y)
+    with open(paths[-1], 'ab') as f:
+        f.write(b'\0' * 17)  # a torn record is left out
+    new, offsets = read_new(str(tmp_path), {os.path.basename(paths[0]): 60})
+    assert len(new) == 60 and sum(offsets.values()) == 120
+
+
+def test_log_without_fork_hooks_and_single_trainer(tmp_path, monkeypatch):
+    monkeypatch.delattr(os, 'register_at_fork')  # as on Windows
+    log = FeedbackLog(str(tmp_path))
+    log.append(['tx-1'], np.zeros((1, 13)), [1])
+    assert len(read_segment(segments(str(tmp_path))[0])) == 1
+    held = _lock(str(tmp_path))
+    assert held is not None and _lock(str(tmp_path)) is None
+    held.close()
+    assert _lock(str(tmp_path)) is not None
+
+
+def test_reservoir_is_bounded_and_uniform():
+    rng = np.random.default_rng(0)
+    hits = np.zeros(10000)
+    for _ in range(200):
+        pool, seen = np.empty(0, dtype=RECORD), 0
+        for start in range(0, 10000, 1000):
+            chunk = np.zeros(1000, dtype=RECORD)
+            chunk['ts'] = np.arange(start, start + 1000)
+            pool, seen = reservoir_add(pool, chunk, seen, 500, rng)
+        hits[pool['ts'].astype(int)] += 1
+    assert len(pool) == 500 and seen == 10000 and len(np.unique(pool['ts'])) == 500
+    # every record is kept with probability 500 / 10000, whichever chunk it came in
+    assert hits.mean() == 10 and np.abs(hits.reshape(10, 1000).mean(axis=1) - 10).max() < 0.5
+
+
+def test_trainer_publishes_only_an_improvement(tmp_path):
+    model_dir, feedback_dir = str(tmp_path / 'models'), str(tmp_path / 'feedback')
+    os.makedirs(model_dir)
+    for name in ('fraud_detection_model.pkl', 'scaler.pkl'):
+        shutil.copyfile(os.path.join(ROOT, 'models', name), os.path.join(model_dir, name))
+    parent, _ = resolve(model_dir)
+    log = FeedbackLog(feedback_dir)
+    log.append(*_feedback(100, 1))
+    assert run_once(feedback_dir, model_dir)['status'] == 'skipped'  # too few new records: kept for later
+    log.append(*_feedback(1400, 2))
+    rejected = run_once(feedback_dir, str(tmp_path / 'empty'))
+    assert rejected['status'] == 'skipped' and 'no model' in rejected['reason']
+    shutil.rmtree(os.path.join(feedback_dir, 'trainer'))  # skipped rounds consumed nothing: start afresh
+
+    result = run_once(feedback_dir, model_dir, trees=10, max_trees=105)
+    assert result['status'] == 'published', result
+    assert result['new_records'] == 1500 and result['trees'] == 105
+    assert result['holdout']['candidate']['log_loss'] < result['holdout']['current']['log_loss']
+    version = current_version(model_dir)
+    assert version == result['version']
+    with open(os.path.join(model_dir, 'registry', version, 'version.json')) as f:
+        info = json.load(f)
+    assert info['parent'] == parent and info['trained_from'] == 'feedback' and info['compiled']
+    status = trainer_status(feedback_dir)
+    assert status['published'] == 1 and status['seen']['train'] + status['seen']['holdout'] == 1500
+
+    # the same pattern again: no longer an improvement worth min_gain, so nothing is published
+    log.append(*_feedback(600, 3))
+    result = run_once(feedback_dir, model_dir, trees=10, max_trees=105, min_gain=0.5)
+    assert result['status'] == 'rejected' and current_version(model_dir) == version
+    assert trainer_status(feedback_dir)['last_result']['status'] == 'rejected'
+
+
+def test_feedback_endpoint(tmp_path, monkeypatch):
+    import app
+    import asgi
+    monkeypatch.setattr(app, 'feedback_log', FeedbackLog(str(tmp_path)))
+    client = app.app.test_client()
+    txids, X, y = _feedback(3, 4)
+    items = [{'transaction_id': txids[0], 'label': int(y[0]), 'features': X[0].tolist()},
+             {'transaction_id': txids[1], 'label': 1, 'transaction': synthetic_transactions(1, 4)[0]},
+             {'transaction_id': 'x' * 48, 'label': 1, 'features': X[2].tolist()},
+             {'transaction_id': txids[2], 'label': 2, 'features': X[2].tolist()},
+             {'transaction_id': txids[2], 'label': 0, 'features': X[2].tolist()[:5]},
+             {'transaction_id': txids[2], 'label': 0, 'transaction': {'amount': 5}}]
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', None)
+    assert client.post('/api/feedback', json={'feedback': items}).status_code == 403
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', 'secret')
+    assert client.post('/api/feedback', json={'feedback': items}).status_code == 401
+    before = app.feedback_labels['fraud']
+    resp = client.post('/api/feedback', json={'feedback': items}, headers={'X-Admin-Token': 'secret'})
+    out = resp.get_json()
+    assert resp.status_code == 200 and out['accepted'] == 2
+    assert [e['index'] for e in out['errors']] == [2, 3, 4, 5]
+    assert app.feedback_labels['fraud'] == before + 1 + int(y[0])
+    records = read_segment(segments(str(tmp_path))[0])
+    assert records['txid'].tolist() == [t.encode() for t in txids[:2]]
+    np.testing.assert_array_equal(records['x'][1], build_matrix(synthetic_transactions(1, 4))[0])
+    assert 'fraudcheck_feedback_total{label="fraud"}' in app.metrics_text()
+
+    async def call(headers):
+        sent = []
+        body = json.dumps(items[0]).encode()
+        messages = iter([{'type': 'http.request', 'body': body}])
+
+        async def receive():
+            return next(messages)
+
+        async def send(msg):
+            sent.append(msg)
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/feedback', 'headers': headers}
+        await asgi.app(scope, receive, send)
+        return sent[0]['status'], json.loads(sent[1]['body'])
+    assert asyncio.run(call([]))[0] == 401
+    status, out = asyncio.run(call([(b'x-admin-token', b'secret')]))
+    assert status == 200 and out['accepted'] == 1
+
+
+if __name__ == '__main__':
+    import tempfile, pathlib
+    test_reservoir_is_bounded_and_uniform()
+    for test in (test_log_rotates_and_reads_back, test_trainer_publishes_only_an_improvement):
+        with tempfile.TemporaryDirectory() as d:
+            test(pathlib.Path(d))
+    print("Feedback log and trainer OK")
@@ -0,0 +1,152 @@
+import os
+import sys
+import warnings
+import joblib
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+warnings.filterwarnings('ignore')
+
+from sklearn.ensemble import RandomForestClassifier
+import forest
+from forest import Anytime, CompiledForest, boundary_probe, compile_forest, fold_scaler, export_artifact, load_artifact
+from test_features import load_testcase_payloads
+from features import build_matrix
+
+
+def _probe(n=2000):
+    X = np.random.default_rng(7).normal(size=(n, 13)) * 3
+    X[::11, 4] = np.nan
+    return X
+
+
+def test_compiled_forest_matches_sklearn_on_served_model():
+    model = joblib.load(os.path.join(ROOT, 'models', 'fraud_detection_model.pkl'))
+    compiled = compile_forest(model)
+    assert compiled is not None
+    X = _probe()
+    np.testing.assert_array_equal(compiled.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+
+
+def test_compiled_forest_matches_sklearn_on_deep_forest():
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(3000, 13))
+    y = (X[:, 0] + X[:, 5] * X[:, 7] + rng.normal(size=3000) > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=40, random_state=0).fit(X, y)
+    compiled = CompiledForest.from_sklearn(model)
+    X = _probe()
+    np.testing.assert_array_equal(compiled.predict_proba(X), model.predict_proba(X))
+
+
+def test_folded_scaler_matches_scaled_path():
+    model = joblib.load(os.path.join(ROOT, 'models', 'fraud_detection_model.pkl'))
+    scaler = joblib.load(os.path.join(ROOT, 'models', 'scaler.pkl'))
+    compiled = compile_forest(model)
+    folded = fold_scaler(compiled, scaler)
+    assert folded is not None and folded.scaler_folded
+    held_out = np.vstack([build_matrix(load_testcase_payloads()), boundary_probe(folded, scaler, 4000, seed=11)])
+    np.testing.assert_array_equal(folded.predict_proba(held_out), model.predict_proba(scaler.transform(held_out)))
+
+
+def test_exported_artifact_is_memory_mapped_and_exact(tmp_path):
+    model_path = os.path.join(ROOT, 'models', 'fraud_detection_model.pkl')
+    scaler_path = os.path.join(ROOT, 'models', 'scaler.pkl')
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    export_artifact(model, scaler, str(tmp_path), source_path=model_path, scaler_path=scaler_path)
+    loaded = load_artifact(str(tmp_path), model_path, scaler_path)
+    assert isinstance(loaded.threshold.base, np.memmap) and not loaded.threshold.flags.writeable
+    X = _probe()
+    np.testing.assert_array_equal(loaded.predict_proba(X), model.predict_proba(scaler.transform(X)))
+    stale = tmp_path / 'other.pkl'
+    stale.write_bytes(b'retrained')
+    assert load_artifact(str(tmp_path), str(stale)) is None
+    # The scaler is baked into a folded export, so a refitted scaler makes it stale too
+    assert load_artifact(str(tmp_path), model_path, str(stale)) is None
+
+
+def test_compile_forest_skips_non_tree_models():
+    from sklearn.linear_model import LogisticRegression
+    X = np.random.default_rng(0).normal(size=(100, 13))
+    assert compile_forest(LogisticRegression().fit(X, X[:, 0] > 0)) is None
+
+
+def test_anytime_bound_keeps_labels_and_full_rows_exact(monkeypatch):
+    model = joblib.load(os.path.join(ROOT, 'models', 'fraud_detection_model.pkl'))
+    compiled = compile_forest(model)
+    X = _probe(500)
+    full = compiled.predict_proba(X)
+    a = Anytime(block=10)  # block by block in NumPy
+    proba = compiled.predict_proba_anytime(X, a)
+    np.testing.assert_array_equal(proba.argmax(axis=1), full.argmax(axis=1))
+    ran = a.trees == compiled.n_estimators
+    assert 0 < ran.sum() < len(X) and set(a.stopped[~ran]) == {'bound'}
+    np.testing.assert_array_equal(proba[ran], full[ran])
+    assert np.all(a.trees % 10 == 0)
+    # walking each row through the trees in Python stops at the same tree with the same vote
+    monkeypatch.setattr(forest, 'ANYTIME_SCALAR_ROWS', len(X))
+    walked = Anytime(block=10)
+    np.testing.assert_array_equal(compiled.predict_proba_anytime(X, walked), proba)
+    np.testing.assert_array_equal(walked.trees, a.trees)
+    np.testing.assert_array_equal(walked.stopped, a.stopped)
+
+
+def test_anytime_stops_at_max_trees_and_deadline(monkeypatch):
+    model = joblib.load(os.path.join(ROOT, 'models', 'fraud_detection_model.pkl'))
+    compiled = compile_forest(model)
+    X = _probe(200)
+    X[::7, 3] = np.nan
+    first7 = np.add.reduce(np.take(compiled.value, compiled.apply(X, compiled.roots[:7]), axis=0), axis=0) / 7
+    first16 = np.add.reduce(np.take(compiled.value, compiled.apply(X, compiled.roots[:16]), axis=0), axis=0) / 16
+    for scalar_rows in (forest.ANYTIME_SCALAR_ROWS, len(X)):  # one row walked in Python; then all rows
+        monkeypatch.setattr(forest, 'ANYTIME_SCALAR_ROWS', scalar_rows)
+        for rows in (X[:1], X):
+            a = Anytime(bound=False, max_trees=7)
+            labels, probs = compiled.score(rows, a)
+            assert np.all(a.trees == 7) and set(a.stopped) == {'max_trees'}
+            np.testing.assert_allclose(probs, first7[:len(rows), 1])
+            a = Anytime(deadline_ns=0, block=16)  # already past: one block, then stop
+            proba = compiled.predict_proba_anytime(rows, a)
+            assert np.all(a.trees == 16) and set(a.stopped) == {'deadline'}
+            np.testing.assert_array_equal(proba, first16[:len(rows)])
+            a = Anytime(bound=False)
+            np.testing.assert_array_equal(compiled.predict_proba_anytime(rows, a), compiled.predict_proba(rows))
+            assert np.all(a.trees == compiled.n_estimators) and set(a.stopped) == {None}
+
+
+def test_predict_reports_anytime_evaluation(monkeypatch):
+    import app
+    assert app.load_model(watch=False)
+    monkeypatch.setattr(app, 'ANYTIME', True)
+    client = app.app.test_client()
+    payload = load_testcase_payloads()[0]
+    resp = client.post('/api/predict', json=payload).get_json()
+    assert resp['trees_total'] == app.current.compiled.n_estimators
+    assert 0 < resp['trees_evaluated'] <= resp['trees_total'] and resp['early_stop'] in (None, 'bound')
+    assert resp['is_fraud'] == client.post('/api/predict', json=payload).get_json()['is_fraud']
+    monkeypatch.setattr(app, 'ANYTIME', False)
+    assert 'trees_evaluated' not in client.post('/api/predict', json=payload).get_json()
+    assert 'trees_evaluated' in client.post('/api/predict', json={**payload, 'deadline_ms': 50}).get_json()
+    # a single row stops early too: on the bound, or after one block once the deadline has passed
+    monkeypatch.setattr(app, 'cache', None)
+    monkeypatch.setattr(app, 'ANYTIME', True)
+    total = app.current.compiled.n_estimators
+    stops = [client.post('/api/predict', json=p).get_json() for p in load_testcase_payloads()]
+    assert any(r['early_stop'] == 'bound' and r['trees_evaluated'] < total for r in stops)
+    fast = client.post('/api/predict', json={**payload, 'deadline_ms': 0.0001}).get_json()
+    assert fast['trees_evaluated'] == app.ANYTIME_BLOCK < total and fast['early_stop'] == 'deadline'
+    assert client.post('/api/predict', json={**payload, 'deadline_ms': 'soon'}).status_code == 400
+    assert 'fraudcheck_anytime_evaluations_total{stop="none"}' in client.get('/metrics').get_data(as_text=True)
+
+
+if __name__ == '__main__':
+    test_compiled_forest_matches_sklearn_on_served_model()
+    test_compiled_forest_matches_sklearn_on_deep_forest()
+    test_folded_scaler_matches_scaled_path()
+    import tempfile, pathlib
+    with tempfile.TemporaryDirectory() as d:
+        test_exported_artifact_is_memory_mapped_and_exact(pathlib.Path(d))
+    test_compile_forest_skips_non_tree_models()
+    print("Compiled forest matches sklearn")
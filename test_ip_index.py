@@ -0,0 +1,128 @@
+import ipaddress
+import os
+import random
+import sys
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from features import build_matrix
+from ip_index import IpRiskIndex, read_csv, write_index
+from test_features import load_testcase_payloads
+
+REPUTATION = """network,risk
+# ranges overlap: the narrowest one wins
+203.0.113.0/24,9
+203.0.113.128/25,4
+198.51.100.7,10
+10.0.0.0,10.0.3.255,0
+2001:db8::/32,8
+2001:db8:1::/48,1
+::ffff:192.0.2.0/120,7
+"""
+
+
+def _brute(ranges, n, default):
+    best = None
+    for i, (first, last, risk) in enumerate(ranges):
+        if first <= n <= last and (best is None or (last - first, -i) < best[0]):
+            best = (last - first, -i), risk
+    return best[1] if best else default
+
+
+def test_lookup_matches_brute_force(tmp_path):
+    rng = random.Random(1)
+    ranges = {4: [], 6: []}
+    for version, bits in ((4, 32), (6, 128)):
+        for _ in range(1500):
+            prefix = rng.randint(8, bits)
+            first = rng.getrandbits(bits) >> (bits - prefix) << (bits - prefix)
+            ranges[version].append((first, first + 2**(bits - prefix) - 1, float(rng.randint(0, 10))))
+    path = str(tmp_path / 'ip_risk.idx')
+    header = write_index(path, ranges, default_risk=2.5)
+    index = IpRiskIndex(path)
+    assert isinstance(index.arrays['v4_start'], np.memmap) and len(index) == header['ranges_v4'] + header['ranges_v6']
+    for _ in range(2000):
+        for version, bits, cls in ((4, 32, ipaddress.IPv4Address), (6, 128, ipaddress.IPv6Address)):
+            first, last, _ = rng.choice(ranges[version])
+            n = rng.choice([first, last, first - 1, last + 1, rng.randint(first, last), rng.getrandbits(bits)])
+            n %= 2**bits
+            if version == 6 and n >> 32 == 0xffff:
+                continue  # IPv4-mapped: looked up as IPv4
+            assert index.lookup(str(cls(n))) == _brute(ranges[version], n, 2.5)
+
+
+def test_csv_ranges_and_build_errors(tmp_path):
+    csv_path = tmp_path / 'reputation.csv'
+    csv_path.write_text(REPUTATION)
+    path = str(tmp_path / 'ip_risk.idx')
+    write_index(path, read_csv(str(csv_path)))
+    index = IpRiskIndex(path)
+    expected = {'203.0.113.9': 9, '203.0.113.200': 4, '198.51.100.7': 10, '10.0.2.1': 0, '10.0.4.0': 2,
+                '192.0.2.5': 7, '::ffff:203.0.113.1': 9, '2001:db8::1': 8, '2001:db8:1::5': 1, '8.8.8.8': 2}
+    assert {a: index.lookup(a) for a in expected} == expected
+    for bad in ('nope', '1.2.3', None):
+        try:
+            index.lookup(bad)
+            assert False, f"accepted {bad!r}"
+        except ValueError:
+            pass
+    for row in ('10.0.0.0/8,11', '10.0.0.9,10.0.0.1,3', 'not-a-network,3'):
+        csv_path.write_text(f"network,risk\n{row}\n")
+        try:
+            read_csv(str(csv_path))
+            assert False, f"accepted {row}"
+        except ValueError:
+            pass
+
+
+def test_features_resolve_ip_address(tmp_path):
+    csv_path = tmp_path / 'reputation.csv'
+    csv_path.write_text(REPUTATION)
+    path = str(tmp_path / 'ip_risk.idx')
+    write_index(path, read_csv(str(csv_path)))
+    index = IpRiskIndex(path)
+    rows = [{**p, 'ip_address': a} for p, a in zip(load_testcase_payloads() * 10, ['203.0.113.9', '8.8.8.8'] * 60)]
+    rows[3] = {k: v for k, v in rows[3].items() if k != 'ip_address'}  # keeps the client's ip_risk
+    rows[4] = {**rows[4], 'ip_address': 'bogus'}
+    fv = build_matrix(rows, ip_index=index)
+    assert fv[0, 7] == 0.9 and fv[1, 7] == 0.2 and fv[3, 7] == rows[3]['ip_risk'] / 10
+    assert fv[4].tolist() == build_matrix([{'amount': 'x'}])[0].tolist()  # fallback vector
+    for i in (0, 1, 3, 4):  # the scalar path agrees
+        assert build_matrix([rows[i]], ip_index=index)[0].tolist() == fv[i].tolist()
+    columns = {k: np.array([r.get(k, '') for r in rows[5:]]) for k in ('amount', 'payment_method', 'ip_address')}
+    np.testing.assert_array_equal(build_matrix(columns, ip_index=index)[:, 7], [0.2, 0.9] * 57 + [0.2])
+    np.testing.assert_array_equal(build_matrix(rows[5:])[:, 7], [r['ip_risk'] / 10 for r in rows[5:]])
+
+
+def test_server_swaps_in_rebuilt_index(tmp_path, monkeypatch):
+    import app
+    path = str(tmp_path / 'ip_risk.idx')
+    monkeypatch.setattr(app, 'IP_INDEX_PATH', path)
+    monkeypatch.setattr(app, 'ip_index', None)
+    monkeypatch.setattr(app, '_ip_index_signature', None)
+    monkeypatch.setattr(app, 'ip_index_status', {'path': path, 'loaded': False, 'error': None})
+    write_index(path, {4: [(0xcb007100, 0xcb0071ff, 9.0)], 6: []})
+    assert app.load_model(watch=False)
+    payload = {'amount': 250, 'payment_method': 'credit_card', 'ip_risk': 0, 'ip_address': '203.0.113.9'}
+    assert app.preprocess(payload)[0, 7] == 0.9
+    assert app.health_payload()['ip_index']['ranges_v4'] == 1
+    previous = app.ip_index
+    write_index(path, {4: [(0xcb007100, 0xcb0071ff, 3.0)], 6: []})
+    assert app.load_ip_index(changed_only=True) and app.ip_index is not previous
+    assert app.preprocess(payload)[0, 7] == 0.3 and previous.lookup('203.0.113.9') == 9.0
+    # Replaced by rename as the build command does: rewriting a mapped file in place would pull its pages away
+    with open(path + '.new', 'wb') as f:
+        f.write(b'garbage')
+    os.replace(path + '.new', path)
+    assert not app.load_ip_index(changed_only=True) and app.preprocess(payload)[0, 7] == 0.3
+    assert app.health_payload()['ip_index']['error']
+
+
+if __name__ == '__main__':
+    import tempfile, pathlib
+    for test in (test_lookup_matches_brute_force, test_csv_ranges_and_build_errors, test_features_resolve_ip_address):
+        with tempfile.TemporaryDirectory() as d:
+            test(pathlib.Path(d))
+    print("IP risk index OK")
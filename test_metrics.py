@@ -0,0 +1,110 @@
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from metrics import ShardedCounter, LatencyHistogram, prometheus_histogram, prometheus_metric
+from profiler import SamplingProfiler
+
+
+def test_sharded_counter_is_exact_under_threads():
+    counter = ShardedCounter()
+    def work():
+        for _ in range(5000):
+            counter.add('total')
+            counter.add(('2024-01-01', 'fraud'), 2)
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    work()  # a shard on the main thread alongside the retired ones
+    assert counter['total'] == 45000
+    assert counter.snapshot()[('2024-01-01', 'fraud')] == 90000
+    counter.clear()
+    assert counter['total'] == 0
+    counter.add('total')
+    assert counter['total'] == 1
+
+
+def test_histogram_quantiles_within_bucket_error():
+    samples = np.random.default_rng(0).lognormal(0, 1, 20000)
+    hist = LatencyHistogram()
+    for ms in samples:
+        hist.record(float(ms))
+    s = hist.summary()
+    assert s['count'] == len(samples)
+    assert abs(s['mean'] - samples.mean()) < 1e-3
+    assert s['max'] == round(samples.max(), 3)
+    for key, q in (('p50', 50), ('p95', 95), ('p99', 99)):
+        exact = np.percentile(samples, q)
+        assert abs(s[key] - exact) / exact < 0.05, (key, s[key], exact)
+    hist.clear()
+    assert hist.summary()['count'] == 0
+    hist.record(0.25)
+    assert hist.summary()['max'] == 0.25
+
+
+def test_prometheus_histogram_is_cumulative():
+    hist = LatencyHistogram()
+    for ms in (0.02, 0.3, 0.3, 4.0, 70.0):
+        hist.record(ms)
+    lines = prometheus_histogram('t_seconds', 'test', 'stage', {'model': hist})
+    buckets = {l.split('le="')[1].split('"')[0]: int(l.rsplit(' ', 1)[1]) for l in lines if '_bucket' in l}
+    assert buckets['2.5e-05'] == 1 and buckets['0.0005'] == 3 and buckets['0.005'] == 4
+    assert buckets['0.1'] == buckets['+Inf'] == 5
+    assert 't_seconds_count{stage="model"} 5' in lines
+
+
+def test_prometheus_label_values_are_escaped():
+    lines = prometheus_metric('hits_total', 'counter', 'test', [({'rule': 'A"B\\C\nD'}, 2)])
+    assert lines[-1] == 'hits_total{rule="A\\"B\\\\C\\nD"} 2'
+
+
+def test_sampling_profiler_writes_folded_stacks(tmp_path):
+    prof = SamplingProfiler(str(tmp_path))
+    def busy():
+        end = time.perf_counter() + 0.02
+        while time.perf_counter() < end:
+            pass
+    assert prof.start(3, interval_ms=1.0)
+    assert not prof.start(1)
+    for _ in range(4):  # the fourth call runs unprofiled
+        prof.run(busy)
+    deadline = time.time() + 2
+    while prof.status().get('last_output') is None and time.time() < deadline:
+        time.sleep(0.01)
+    status = prof.status()
+    assert not status['active'] and status['samples'] > 0
+    with open(status['last_output']) as f:
+        stacks = [line.rsplit(' ', 1) for line in f]
+    assert all(stack.startswith('busy (test_metrics.py') for stack, _ in stacks)
+    assert sum(int(n) for _, n in stacks) == status['samples']
+
+
+def test_profile_endpoint_needs_the_admin_token(monkeypatch):
+    import app
+    client = app.app.test_client()
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', None)
+    assert client.post('/api/profile', json={'requests': 1}).status_code == 403
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', 'secret')
+    assert client.post('/api/profile', json={'requests': 1}).status_code == 401
+    assert client.get('/api/profile', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+    assert not app.profiler.active
+    resp = client.get('/api/profile', headers={'X-Admin-Token': 'secret'})
+    assert resp.status_code == 200 and resp.get_json()['active'] is False
+
+
+if __name__ == '__main__':
+    test_sharded_counter_is_exact_under_threads()
+    test_histogram_quantiles_within_bucket_error()
+    test_prometheus_histogram_is_cumulative()
+    test_prometheus_label_values_are_escaped()
+    import tempfile, pathlib
+    with tempfile.TemporaryDirectory() as d:
+        test_sampling_profiler_writes_folded_stacks(pathlib.Path(d))
+    print("Metrics OK")
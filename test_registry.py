@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from registry import current_version, list_versions, publish, resolve, set_current, watch_token
+
+TX = {'amount': 100, 'payment_method': 'credit_card'}
+
+
+def _registry(tmp_path):
+    """Model dir with versions v1 (CURRENT) and v2 of the served model"""
+    model_dir = str(tmp_path / 'models')
+    publish(os.path.join(ROOT, 'models', 'fraud_detection_model.pkl'), os.path.join(ROOT, 'models', 'scaler.pkl'),
+            model_dir, 'v1')
+    shutil.copytree(os.path.join(model_dir, 'registry', 'v1'), os.path.join(model_dir, 'registry', 'v2'))
+    return model_dir
+
+
+def _wait_for(cond, timeout=10):
+    deadline = time.time() + timeout
+    while not cond():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_registry_resolves_current_and_flat_layout(tmp_path):
+    model_dir = _registry(tmp_path)
+    assert list_versions(model_dir) == ['v1', 'v2'] and current_version(model_dir) == 'v1'
+    token = watch_token(model_dir)
+    set_current(model_dir, 'v2')
+    assert resolve(model_dir) == ('v2', os.path.join(model_dir, 'registry', 'v2'))
+    assert watch_token(model_dir) != token
+    try:
+        set_current(model_dir, '../v1')
+        assert False, "unknown version accepted"
+    except FileNotFoundError:
+        pass
+    version, directory = resolve(os.path.join(ROOT, 'models'))
+    assert version.startswith('sha-') and directory == os.path.join(ROOT, 'models')
+    assert resolve(str(tmp_path / 'empty')) == (None, str(tmp_path / 'empty'))
+
+
+def test_reload_swaps_atomically_and_drains_in_flight(tmp_path, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'MODEL_DIR', _registry(tmp_path))
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', 'secret')
+    assert app.load_model(watch=False)
+    client = app.app.test_client()
+    assert client.post('/api/predict', json=TX).get_json()['model_version'] == 'v1'
+
+    held = app._acquire()  # a request still running on v1
+    set_current(app.MODEL_DIR, 'v2')
+    assert app.reload_model()
+    _wait_for(lambda: app.reload_status['state'] == 'draining')
+    assert held.version == 'v1' and held.in_flight() == 1
+    assert client.post('/api/predict', json=TX).get_json()['model_version'] == 'v2'
+    app._release(held)
+    _wait_for(lambda: app.reload_status['state'] == 'done')
+    assert app.reload_status['drained']
+
+    headers = {'X-Admin-Token': 'secret'}
+    assert client.post('/api/admin/reload', json={'version': 'v1'}).status_code == 401
+    assert client.post('/api/admin/reload', json={'version': 'nope'}, headers=headers).status_code == 404
+    resp = client.post('/api/admin/reload', json={'version': 'v1', 'wait': True}, headers=headers)
+    assert resp.status_code == 200 and resp.get_json()['serving']['version'] == 'v1'
+    assert current_version(app.MODEL_DIR) == 'v1'
+    batch = client.post('/api/predict/batch', json=[TX, TX]).get_json()
+    assert [r['model_version'] for r in batch['results']] == ['v1', 'v1']
+    assert 'fraudcheck_model_info{version="v1"} 1' in client.get('/metrics').get_data(as_text=True)
+
+    # A broken version fails its warm-up and the current model keeps serving
+    broken = os.path.join(app.MODEL_DIR, 'registry', 'v3')
+    os.makedirs(broken)
+    open(os.path.join(broken, 'fraud_detection_model.pkl'), 'wb').write(b'not a model')
+    assert not app.reload_model('v3', wait=True)
+    assert app.reload_status['state'] == 'failed' and app.current.version == 'v1'
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', None)
+    assert client.get('/api/admin/models').status_code == 403
+
+
+WATCH_PROBE = """
+import json, sys, time
+sys.path.insert(0, %r)
+from registry import set_current
+import app
+app.load_model()
+before = app.current.version
+set_current(app.MODEL_DIR, 'v2')
+deadline = time.time() + 10
+while app.current.version == before and time.time() < deadline:
+    time.sleep(0.02)
+print(json.dumps({'before': before, 'after': app.current.version, 'reload': app.reload_status['state']}))
+""" % os.path.join(ROOT, 'backend')
+
+
+def test_watcher_follows_current(tmp_path):
+    model_dir = _registry(tmp_path)
+    out = subprocess.run([sys.executable, '-c', WATCH_PROBE], cwd=tmp_path, capture_output=True, text=True, check=True,
+                         env={**os.environ, 'FRAUDCHECK_MODEL_DIR': model_dir, 'FRAUDCHECK_MODEL_WATCH_S': '0.05'}).stdout
+    res = json.loads(out.strip().splitlines()[-1])
+    assert res['before'] == 'v1' and res['after'] == 'v2'
+
+
+if __name__ == '__main__':
+    import tempfile, pathlib
+    with tempfile.TemporaryDirectory() as d:
+        test_registry_resolves_current_and_flat_layout(pathlib.Path(d))
+    with tempfile.TemporaryDirectory() as d:
+        test_watcher_follows_current(pathlib.Path(d))
+    print("Registry OK")
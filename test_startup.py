@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = """
+import json, sys
+sys.path.insert(0, %r)
+import app
+loaded = app.load_model()
+client = app.app.test_client()
+ready = client.get('/api/ready')
+pred = client.post('/api/predict', json={'amount': 100, 'payment_method': 'credit_card'}).get_json()
+print(json.dumps({'loaded': loaded, 'ready_status': ready.status_code, 'ready': ready.get_json(),
+                  'fallback_used': pred['fallback_used'], 'sklearn': 'sklearn' in sys.modules}))
+""" % os.path.join(ROOT, 'backend')
+
+
+def _start(tmp_path, **env):
+    # A fresh interpreter in an unrelated directory: paths must not depend on the working directory
+    out = subprocess.run([sys.executable, '-c', PROBE], cwd=tmp_path, capture_output=True, text=True,
+                         env={**os.environ, **env}, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_startup_is_ready_without_sklearn(tmp_path):
+    res = _start(tmp_path)
+    assert res['loaded'] and res['ready_status'] == 200 and res['ready']['ready']
+    assert res['ready']['time_to_ready_ms'] >= res['ready']['load_ms'] > 0
+    assert not res['fallback_used']
+    assert not res['sklearn']  # the scaler-folded artifact needs no unpickling
+
+
+def test_missing_model_is_not_ready_and_never_trains(tmp_path):
+    model_dir = tmp_path / 'models'
+    res = _start(tmp_path, FRAUDCHECK_MODEL_DIR=str(model_dir))
+    assert not res['loaded'] and res['ready_status'] == 503
+    assert res['fallback_used']
+    assert not model_dir.exists()
+
+
+if __name__ == '__main__':
+    import tempfile, pathlib
+    for test in (test_startup_is_ready_without_sklearn, test_missing_model_is_not_ready_and_never_trains):
+        with tempfile.TemporaryDirectory() as d:
+            test(pathlib.Path(d))
+    print("Startup OK")
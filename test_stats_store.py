@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+import stats_store
+from stats_store import StatsStore, RINGS, MINUTE, HOUR, DAY
+
+
+def _worker(path, n):
+    store = StatsStore(path, flush_interval=0.05)
+    for i in range(n):
+        store.record(i % 4 == 0, 10.0)
+    store.flush()
+
+
+def test_workers_aggregate_and_reset_clears_all(tmp_path):
+    path = str(tmp_path / 'stats.sqlite3')
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=_worker, args=(path, 1000)) for _ in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    reader = StatsStore(path)
+    assert reader.totals() == {'total': 3000, 'fraud': 750, 'amount_blocked': 7500.0}
+    assert reader.series(DAY, 7)[-1][1:] == (3000, 750)
+    assert sum(t for _, t, _ in reader.series(MINUTE, 60)) == 3000
+
+    writer = StatsStore(path)
+    writer.record(1, 5.0)  # buffered before the reset below; must not resurface
+    reader.reset()
+    writer.flush()
+    assert reader.totals() == {'total': 0, 'fraud': 0, 'amount_blocked': 0.0}
+    writer.record(0)
+    writer.flush()
+    assert reader.totals()['total'] == 1
+
+
+def test_rings_stay_bounded(monkeypatch):
+    store = StatsStore()
+    clock = [1_700_000_000.0]
+    monkeypatch.setattr(stats_store.time, 'time', lambda: clock[0])
+    for _ in range(3 * 24 * 60 // 7):  # three days at one transaction every 7 minutes
+        store.record(0)
+        clock[0] += 7 * 60
+    store.flush()
+    rows = store._db.execute('SELECT res, COUNT(*) FROM buckets GROUP BY res').fetchall()
+    assert all(count <= RINGS[res] for res, count in rows)
+    # Buckets still in the ring are intact after it wrapped: every full hour holds 8 or 9 of them
+    last = clock[0] - 7 * 60
+    hours = store.series(HOUR, 24, now=last)[:-1]
+    assert all(t in (8, 9) for _, t, _ in hours)
+    assert sum(t for _, t, _ in store.series(DAY, 5, now=last)) == 3 * 24 * 60 // 7
+    assert store.totals()['total'] == 3 * 24 * 60 // 7
+
+
+if __name__ == '__main__':
+    import tempfile, pathlib
+    with tempfile.TemporaryDirectory() as d:
+        test_workers_aggregate_and_reset_clears_all(pathlib.Path(d))
+    print("Stats store OK")
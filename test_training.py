@@ -0,0 +1,42 @@
+import os
+import sys
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'models'))
+
+from create_simple_working_model import fit_scaler, generate_chunk, open_dataset, write_dataset
+
+
+def test_dataset_is_chunked_and_reproducible(tmp_path):
+    X, y, meta = write_dataset(str(tmp_path / 'a'), 2500, 1000, seed=5, n_jobs=2)
+    assert isinstance(X, np.memmap) and X.shape == (2500, 13) and X.dtype == np.float32
+    assert meta['rows'] == 2500 and 0.15 < y.mean() < 0.25
+    chunk, labels = generate_chunk(500, [5, 2])
+    np.testing.assert_array_equal(X[2000:], chunk)
+    np.testing.assert_array_equal(y[2000:], labels)
+    X1, y1, _ = write_dataset(str(tmp_path / 'b'), 2500, 1000, seed=5, n_jobs=1)
+    np.testing.assert_array_equal(X, X1)
+    # Fraud rows keep their signature: large amounts at night
+    fraud = y.astype(bool)
+    assert X[fraud, 0].min() >= 0.3 and X[~fraud, 0].max() <= 0.2
+    assert np.isin(X[fraud, 2], [0, 1, 2, 3, 4, 5, 22, 23]).all() and not np.isin(X[~fraud, 2], [0, 22]).any()
+    assert open_dataset(str(tmp_path / 'missing')) is None
+
+
+def test_chunked_scaler_matches_full_fit():
+    from sklearn.preprocessing import StandardScaler
+    X, _ = generate_chunk(5000, 1)
+    chunked = fit_scaler(X, 700)
+    full = StandardScaler().fit(X)
+    np.testing.assert_allclose(chunked.mean_, full.mean_, rtol=1e-6)
+    np.testing.assert_allclose(chunked.scale_, full.scale_, rtol=1e-5)
+
+
+if __name__ == '__main__':
+    import tempfile, pathlib
+    with tempfile.TemporaryDirectory() as d:
+        test_dataset_is_chunked_and_reproducible(pathlib.Path(d))
+    test_chunked_scaler_matches_full_fit()
+    print("Training pipeline OK")
@@ -0,0 +1,66 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from velocity import BYTES_PER_KEY, IDLE_S, VelocityStore
+
+T = 1_700_000_000.0
+TX = {'amount': 100, 'payment_method': 'credit_card', 'card_id': 'c-1'}
+
+
+def test_windows_slide_and_expire():
+    store = VelocityStore()
+    assert store.observe('a', 10.0, T) == ([0, 0, 0], [0.0, 0.0, 0.0])
+    store.observe('a', 20.0, T + 60)
+    store.observe('b', 99.0, T + 60)
+    assert store.windows('a', T + 120) == ([2, 2, 2], [30.0, 30.0, 30.0])
+    assert store.windows('a', T + 2 * 3600) == ([0, 2, 2], [0.0, 30.0, 30.0])
+    assert store.windows('a', T + 2 * 86400) == ([0, 0, 2], [0.0, 0.0, 30.0])
+    assert store.windows('a', T + 8 * 86400) == ([0, 0, 0], [0.0, 0.0, 0.0])
+    # A ring that wrapped recycles the slot instead of adding to a week-old bucket
+    assert store.observe('a', 5.0, T + 7 * 86400)[0] == [0, 0, 0]
+    assert store.windows('a', T + 7 * 86400) == ([1, 1, 1], [5.0, 5.0, 5.0])
+
+
+def test_idle_eviction_memory_cap_and_snapshot(tmp_path):
+    store = VelocityStore(max_bytes=3 * BYTES_PER_KEY)
+    for i, key in enumerate('abcd'):
+        store.observe(key, 1.0, T + i)
+    assert len(store) == 3 and store.evicted_capacity == 1 and store.windows('a', T + 4)[0] == [0, 0, 0]
+    store.observe('e', 1.0, T + IDLE_S + 2.5)  # b and c have been idle for longer than a week
+    assert store.evicted_idle == 2 and len(store) == 2
+    path = str(tmp_path / 'velocity.npz')
+    assert store.save(path) == 2
+    warm = VelocityStore(snapshot_path=path)
+    assert warm.load(now=T + IDLE_S + 3) == 2
+    assert warm.windows('e', T + IDLE_S + 3) == ([1, 1, 1], [1.0, 1.0, 1.0])
+    assert warm.load(now=T + 3 * IDLE_S) == 0 and len(warm) == 0
+    (tmp_path / 'broken.npz').write_bytes(b'not a snapshot')
+    assert warm.load(str(tmp_path / 'broken.npz')) == 0
+
+
+def test_predict_fills_velocity_fields(monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'velocity', VelocityStore())
+    client = app.app.test_client()
+    assert app.with_velocity(dict(TX)) == {**TX, 'daily_transactions': 1, 'weekly_transactions': 1}
+    filled = app.with_velocity({**TX, 'amount': 300})
+    assert filled['daily_transactions'] == 2 and filled['avg_transaction'] == 100
+    assert app.with_velocity({**TX, 'avg_transaction': 5})['avg_transaction'] == 5
+    assert app.with_velocity({'amount': 1}) == {'amount': 1}
+    for _ in range(9):
+        assert client.post('/api/predict', json=TX).status_code == 200
+    assert app.preprocess(app.with_velocity(dict(TX)))[0, 10] == 1  # 12th today: frequency flag set
+    batch = client.post('/api/predict/batch', json=[{**TX, 'card_id': 'c-2'}] * 3).get_json()
+    assert len(batch['results']) == 3 and app.velocity.windows('card_id:c-2')[0][1] == 3
+    assert client.get('/api/health').get_json()['velocity']['keys'] == 2
+
+
+if __name__ == '__main__':
+    import tempfile, pathlib
+    test_windows_slide_and_expire()
+    with tempfile.TemporaryDirectory() as d:
+        test_idle_eviction_memory_cap_and_snapshot(pathlib.Path(d))
+    print("Velocity store OK")
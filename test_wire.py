@@ -0,0 +1,117 @@
+import asyncio
+import os
+import sys
+import warnings
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+warnings.filterwarnings('ignore')
+
+msgpack = pytest.importorskip('msgpack')  # optional, like the encodings they test
+pa = pytest.importorskip('pyarrow')
+import app
+from test_features import load_testcase_payloads
+
+FIELDS = ('amount', 'payment_method', 'country', 'device_info', 'ip_risk', 'customer_age', 'account_age',
+          'daily_transactions', 'avg_transaction', 'merchant_category', 'transaction_time')
+
+
+def _batch(n=100):
+    rows = [{k: p[k] for k in FIELDS if k in p} for p in load_testcase_payloads()]
+    return (rows * (n // len(rows) + 1))[:n]
+
+
+def _arrow(columns, stream=True):
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with (pa.ipc.new_stream if stream else pa.ipc.new_file)(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def test_binary_bodies_score_like_json():
+    assert app.load_model(watch=False)
+    client = app.app.test_client()
+    rows = _batch()
+    rows[5] = {**rows[5], 'amount': None}  # unparseable -> fallback vector, in every encoding
+    expected = client.post('/api/predict/batch', json=rows).get_json()['results']
+    probs = [r['fraud_probability'] for r in expected]
+    codes = [r.get('reason_codes', []) for r in expected]
+
+    resp = client.post('/api/predict/batch', data=msgpack.packb(rows), content_type='application/msgpack')
+    assert resp.status_code == 200 and resp.content_type == 'application/msgpack'
+    assert msgpack.unpackb(resp.data)['results'] == expected
+
+    columns = {k: [r.get(k) for r in rows] for k in FIELDS}
+    resp = client.post('/api/predict/batch', data=msgpack.packb({'columns': columns}),
+                       content_type='application/msgpack')
+    out = msgpack.unpackb(resp.data)
+    assert out['count'] == len(rows) and out['columns']['fraud_probability'] == probs
+    assert out['columns']['reason_codes'] == codes
+
+    for ctype, stream in (('application/vnd.apache.arrow.stream', True), ('application/vnd.apache.arrow.file', False)):
+        resp = client.post('/api/predict/batch', data=_arrow(columns, stream), content_type=ctype)
+        assert resp.status_code == 200 and resp.content_type == ctype
+        reader = pa.ipc.open_stream(resp.data) if stream else pa.ipc.open_file(resp.data)
+        table = reader.read_all()
+        assert table.column('fraud_probability').to_pylist() == probs
+        assert table.column('reason_codes').to_pylist() == codes
+        assert table.schema.metadata[b'count'] == b'100'
+
+    single = client.post('/api/predict', data=msgpack.packb(rows[0]), content_type='application/msgpack')
+    assert msgpack.unpackb(single.data)['fraud_probability'] == probs[0]
+
+
+def test_binary_bodies_are_validated():
+    assert app.load_model(watch=False)
+    client = app.app.test_client()
+    columns = {k: [r.get(k) for r in _batch(10)] for k in FIELDS}
+
+    def post(path, data, ctype):
+        resp = client.post(path, data=data, content_type=ctype)
+        return resp.status_code, resp.content_type
+
+    assert post('/api/predict/batch', b'\xc1', 'application/msgpack') == (400, 'application/msgpack')
+    assert post('/api/predict/batch', b'not arrow', 'application/vnd.apache.arrow.stream') == (400, 'application/json')
+    assert post('/api/predict', _arrow(columns), 'application/vnd.apache.arrow.stream')[0] == 415
+    assert post('/api/predict/batch', _arrow({k: v for k, v in columns.items() if k != 'amount'}),
+                'application/vnd.apache.arrow.stream')[0] == 400
+    uneven = {**columns, 'amount': columns['amount'][:3]}
+    assert post('/api/predict/batch', msgpack.packb({'columns': uneven}), 'application/msgpack')[0] == 400
+    too_big = {k: v * (app.MAX_BATCH_SIZE // 10 + 1) for k, v in columns.items()}
+    assert post('/api/predict/batch', _arrow(too_big), 'application/vnd.apache.arrow.stream')[0] == 413
+
+
+def test_asgi_answers_in_the_request_encoding():
+    import asgi
+    assert app.load_model(watch=False)
+    columns = {k: [r.get(k) for r in _batch(20)] for k in FIELDS}
+
+    async def call(body, ctype):
+        sent = []
+        messages = iter([{'type': 'http.request', 'body': body}])
+
+        async def receive():
+            return next(messages)
+
+        async def send(msg):
+            sent.append(msg)
+
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/predict/batch',
+                 'headers': [(b'content-type', ctype)]}
+        await asgi.app(scope, receive, send)
+        return sent[0]['status'], dict(sent[0]['headers'])[b'content-type'], sent[1]['body']
+
+    status, ctype, body = asyncio.run(call(_arrow(columns), b'application/vnd.apache.arrow.stream'))
+    assert status == 200 and ctype == b'application/vnd.apache.arrow.stream'
+    assert pa.ipc.open_stream(body).read_all().num_rows == 20
+    status, ctype, body = asyncio.run(call(msgpack.packb({'columns': columns}), b'application/msgpack; charset=x'))
+    assert status == 200 and len(msgpack.unpackb(body)['columns']['is_fraud']) == 20
+
+
+if __name__ == '__main__':
+    test_binary_bodies_score_like_json()
+    test_binary_bodies_are_validated()
+    test_asgi_answers_in_the_request_encoding()
+    print("Binary encodings OK")